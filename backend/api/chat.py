@@ -2,21 +2,22 @@ from fastapi import APIRouter, WebSocket, HTTPException
 from models.schemas import ChatMessage
 from db.crud import save_chat_message, get_conversation_context
 from services.rag import generate_response_with_rag
-
-# Optional: sentiment and embedding generators
-from utils.nlp import analyze_sentiment, compute_embedding
+from services.analytics import analytics
+from services.message_analysis import message_analysis
+import asyncio
+import time
 
 router = APIRouter()
 
 @router.post("/send")
 async def send_message(msg: ChatMessage):
+    started = time.perf_counter()
     try:
-        # ✨ Compute sentiment & embedding
-        sentiment = analyze_sentiment(msg.message)
-        embedding = compute_embedding(msg.message)
-
-        # ✨ Generate bot reply
-        reply = await generate_response_with_rag(msg.message)
+        # ✨ Sentiment + embedding (one shared tokenization) and bot reply run concurrently
+        (sentiment, embedding), reply = await asyncio.gather(
+            message_analysis.analyze(msg.message),
+            generate_response_with_rag(msg.message),
+        )
 
         # ✅ Save user message + bot reply in one MongoDB document
         save_chat_message(
@@ -29,9 +30,11 @@ async def send_message(msg: ChatMessage):
             bot_reply=reply
         )
 
+        analytics.record_chat((time.perf_counter() - started) * 1000, sentiment=sentiment)
         return {"reply": reply}
     except Exception as e:
         print("❌ Chat error:", str(e))
+        analytics.record_chat((time.perf_counter() - started) * 1000, resolved=False)
         raise HTTPException(status_code=500, detail="Chat processing failed.")
 
 
@@ -42,13 +45,13 @@ async def websocket_endpoint(websocket: WebSocket):
     while True:
         try:
             msg_text = await websocket.receive_text()
+            started = time.perf_counter()
 
-            # ✨ Compute sentiment & embedding
-            sentiment = analyze_sentiment(msg_text)
-            embedding = compute_embedding(msg_text)
-
-            # ✨ Generate bot reply
-            reply = await generate_response_with_rag(msg_text)
+            # ✨ Sentiment + embedding (one shared tokenization) and bot reply run concurrently
+            (sentiment, embedding), reply = await asyncio.gather(
+                message_analysis.analyze(msg_text),
+                generate_response_with_rag(msg_text),
+            )
 
             # ✅ Save user message + bot reply in one document
             save_chat_message(
@@ -61,6 +64,7 @@ async def websocket_endpoint(websocket: WebSocket):
                 bot_reply=reply
             )
 
+            analytics.record_chat((time.perf_counter() - started) * 1000, sentiment=sentiment)
             await websocket.send_text(reply)
 
         except Exception as e:
@@ -5,13 +5,18 @@
 # ==========================================
 # File: backend/api/files.py    
 # ==========================================
-from fastapi import APIRouter, UploadFile, File, HTTPException
+from fastapi import APIRouter, UploadFile, File, HTTPException, BackgroundTasks
 from fastapi.responses import JSONResponse
 from pathlib import Path
-from utils.embed_store import chunk_text, save_embeddings
+from utils.embed_store import get_embed_model, save_embeddings, index_exists
+from utils.blob_store import blob_store, blob_key, UploadTooLarge, UPLOADS_NAMESPACE
+from utils.chunker import chunk_parsed, chunk_pages, pack_units
+from utils.tabular import iter_table_chunks, rows_to_text
+from utils.pdf_extract import iter_pdf_pages
+from starlette.concurrency import run_in_threadpool
 import shutil
 import os
-from training.fine_tune import fine_tune
+from api.training import run_fine_tune
 from utils.file_parser import parse_file, clean_json
 from utils.email_notify import send_upload_notification
 
@@ -23,52 +28,90 @@ UPLOAD_DIR.mkdir(exist_ok=True)
 ALLOWED_EXTENSIONS = {".csv", ".json", ".xlsx" , ".txt", ".pdf", ".jpg", ".jpeg", ".png", ".gif", ".bmp"}
 MAX_FILE_SIZE_MB = 10
 
+def _is_indexed(key, known):
+    return known.get("indexed") and "preview" in known and (not known.get("chunks") or index_exists(key))
+
+
+def _chunk_upload(file_path, ext, digest, tokenizer):
+    if ext == ".pdf":
+        # Pages stream from the extraction pool (or text cache) into the chunker
+        return chunk_pages((text for _, text in iter_pdf_pages(file_path, digest=digest)), tokenizer=tokenizer)
+    if ext in (".csv", ".xlsx"):
+        # Chunked read; rows become text column-wise, one chunk of rows at a time
+        chunks = []
+        for df in iter_table_chunks(file_path):
+            chunks.extend(pack_units(rows_to_text(df).tolist(), tokenizer, overlap=0, separator="\n"))
+        return chunks
+    full_text = parse_file(file_path, limit=None)  # No limit here
+    return chunk_parsed(full_text, tokenizer=tokenizer)
+
+
 @router.post("/upload", summary="Upload training/WhatsApp file")
-async def upload_file(file: UploadFile = File(...)):
+async def upload_file(background_tasks: BackgroundTasks, file: UploadFile = File(...)):
     # Validate extension
     ext = Path(file.filename).suffix.lower()
     print(f"File extension===============>: {ext}")
     if ext not in ALLOWED_EXTENSIONS:
         raise HTTPException(status_code=400, detail=f"❌ Unsupported file type: {ext}")
 
-    # Validate size
-    contents = await file.read()
-    size_mb = len(contents) / (1024 * 1024)
-    if size_mb > MAX_FILE_SIZE_MB:
+    # Stream into the content-addressed store; size is enforced while hashing
+    filename = Path(file.filename).name
+    try:
+        digest, blob_path, size, _ = await blob_store.put_upload(file, max_bytes=MAX_FILE_SIZE_MB * 1024 * 1024)
+    except UploadTooLarge:
         raise HTTPException(status_code=400, detail=f"❌ File too large (max {MAX_FILE_SIZE_MB}MB)")
-
-    # Save file
-    file_path = UPLOAD_DIR / file.filename
-    print(f"File path===============>: {file_path}")
-    with open(file_path, "wb") as f:
-        f.write(contents)
+    # Catalog writes, file copies, parsing and embedding all block: they run
+    # in the threadpool so the event loop keeps serving other requests
+    key = blob_key(digest, ext)
+    await run_in_threadpool(blob_store.register, UPLOADS_NAMESPACE, filename, key, size)
+
+    # Keep the named copy under uploads/ (its own copy of the blob)
+    file_path = UPLOAD_DIR / filename
+    await run_in_threadpool(blob_store.materialize, blob_path, file_path)
+    print(f"File path===============>: {file_path} ({digest})")
+
+    # Known content: reuse its preview and index, skip parse/embed entirely
+    known = await run_in_threadpool(blob_store.blob_meta, UPLOADS_NAMESPACE, key)
+    if await run_in_threadpool(_is_indexed, key, known):
+        return JSONResponse(content={
+            "message": f"✅ File {filename} uploaded successfully (already indexed).",
+            "filename": filename,
+            "sha256": digest,
+            "deduplicated": True,
+            "preview": {**known["preview"], "filename": filename}
+        })
 
     # Optional: parse and preview first rows
     try:
-        preview = parse_file(file_path, limit=5)
+        preview = await run_in_threadpool(parse_file, file_path, 5)
         preview = clean_json(preview)  # Clean JSON data if needed
         print(f"Preview data===============>: {preview}")
     except Exception as e:
         raise HTTPException(status_code=500, detail=f"❌ Failed to parse file: {str(e)}")
+    await run_in_threadpool(blob_store.update_blob_meta, UPLOADS_NAMESPACE, key, preview=preview)
     
-     # 🔁 Embed full content for retrieval
+     # 🔁 Embed full content for retrieval, keyed by content hash + extension
     try:  
-
-        full_text = parse_file(file_path)  # No limit here
-        chunks = chunk_text(full_text)
-        save_embeddings(file_id=file.filename, chunks=chunks)
+        # First use loads the embedder; keep that load off the event loop
+        tokenizer = (await run_in_threadpool(get_embed_model)).tokenizer
+        chunks = await run_in_threadpool(_chunk_upload, file_path, ext, digest, tokenizer)
+        if chunks:
+            await run_in_threadpool(save_embeddings, key, chunks)
+        await run_in_threadpool(blob_store.update_blob_meta, UPLOADS_NAMESPACE, key, indexed=True, chunks=len(chunks))
     except Exception as e:
         print(f"[Embedding Error]: {e}")  # or raise a warning log
 
     # ✅ Start training automatically after embeddings
-    background_tasks.add_task(fine_tune)
+    background_tasks.add_task(run_fine_tune)
 
-    # Optional: send email/slack alert to admin
-    send_upload_notification("vastavshivam@gmai.com", "uploaded successfully.", body="File uploaded ...")
+    # Optional: send email/slack alert to admin (SMTP blocks, so after the response)
+    background_tasks.add_task(send_upload_notification, "vastavshivam@gmai.com", "uploaded successfully.", body="File uploaded ...")
 
     return JSONResponse(content={
-        "message": f"✅ File {file.filename} uploaded successfully.",
-        "filename": file.filename,
+        "message": f"✅ File {filename} uploaded successfully.",
+        "filename": filename,
+        "sha256": digest,
+        "deduplicated": False,
         "preview": preview  # Optional: parsed preview from CSV/JSON/XLSX
     })
 
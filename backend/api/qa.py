@@ -1,39 +1,35 @@
 # api/qa.py
 from fastapi import APIRouter, HTTPException
 from models.schemas import AskRequest, AskResponse
-from utils.embed_store import load_index, embed_question, query_embeddings
-from transformers import AutoTokenizer, AutoModelForCausalLM
-import torch
+from utils.embed_store import load_index, query_embeddings, index_exists
+from services.inference_client import embed_texts, generate_text
+import asyncio
 import os
 
 from utils.embed_store import VECTOR_DIR
 
 router = APIRouter()
 
-LLM_MODEL = "tiiuae/falcon-rw-1b"
-tokenizer = AutoTokenizer.from_pretrained(LLM_MODEL)
-model = AutoModelForCausalLM.from_pretrained(LLM_MODEL)
+# falcon-rw-1b (QA_LLM_MODEL) runs in the inference daemon when INFERENCE_SOCKET
+# is set, otherwise in-process off the event loop (services/inference_client.py)
 
 @router.post("/ask", response_model=AskResponse)
 async def ask_question(data: AskRequest):
     file_id = data.file_id
     question = data.question
 
-    vector_path = os.path.join(VECTOR_DIR, f"{file_id}.index")
-    if not os.path.exists(vector_path):
+    if not index_exists(file_id):
         raise HTTPException(status_code=404, detail="Vector index not found for this file")
 
     index, chunks = load_index(file_id)
-    q_embedding = embed_question(question)
+    q_embedding = await embed_texts([question])
     D, I = index.search(q_embedding, k=3)
 
     retrieved = [chunks[i] for i in I[0]]
     joined_context = "\n".join(retrieved)
     prompt = f"Context:\n{joined_context}\n\nUser: {question}\nAI:"
 
-    inputs = tokenizer(prompt, return_tensors="pt")
-    output = model.generate(**inputs, max_new_tokens=150)
-    answer = tokenizer.decode(output[0], skip_special_tokens=True)
+    answer = await generate_text(prompt, model="qa_llm", max_new_tokens=150)
 
     clean_answer = answer.split("AI:")[-1].lstrip().strip()
     # return AskResponse(answer=answer.split("AI:")[-1].strip())
@@ -43,13 +39,12 @@ async def ask_question(data: AskRequest):
 @router.post("/v1/ask", response_model=AskResponse)
 async def ask_question(request: AskRequest):
     try:
-        top_chunks = query_embeddings(request.file_id, request.question, top_k=5)
+        # Loads the embedder on first use and runs FAISS search: keep both off the event loop
+        top_chunks = await asyncio.to_thread(query_embeddings, request.file_id, request.question, top_k=5)
         context = "\n".join(top_chunks)
         prompt = f"Context:\n{context}\n\nUser: {request.question}\n\nAI:"
 
-        inputs = tokenizer(prompt, return_tensors="pt")
-        outputs = model.generate(**inputs, max_new_tokens=150, do_sample=True)
-        answer = tokenizer.decode(outputs[0], skip_special_tokens=True)
+        answer = await generate_text(prompt, model="qa_llm", max_new_tokens=150, do_sample=True)
 
         clean_answer = answer.split("AI:")[-1].lstrip().strip()
         return {"answer": clean_answer}
@@ -1,12 +1,17 @@
 from fastapi import APIRouter, BackgroundTasks
-from training.fine_tune import fine_tune
 from utils.email_notify import notify_training_complete
 
 router = APIRouter()
 
+
+def run_fine_tune():
+    # training.fine_tune pulls in torch/transformers/datasets; import it only when training starts
+    from training.fine_tune import fine_tune
+    return fine_tune()
+
 @router.post("/start-training/")
 async def start_training(background_tasks: BackgroundTasks):
-    background_tasks.add_task(fine_tune)
+    background_tasks.add_task(run_fine_tune)
     return {"status": "Training started"}
 
 @router.get("/status/")
@@ -1,4 +1,4 @@
-from fastapi import FastAPI, APIRouter
+from fastapi import FastAPI, APIRouter, BackgroundTasks
 from pydantic import BaseModel
 from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
 from sentence_transformers import SentenceTransformer
@@ -6,12 +6,15 @@ import faiss, pickle, json, os
 import logging
 from transformers import TextStreamer
 import torch
+from utils.versioned_index import VersionedIndex
+from services.llm_loader import load_causal_lm, resolve_precision
 
 # --- CONFIGURATION ---
 MODEL_PATH = os.path.abspath("checkpoints/fine-tuned-output")  # Path to your fine-tuned model
 VECTOR_MODEL_NAME = "all-MiniLM-L6-v2"
-INDEX_PATH = "kb.index"
-DOCS_PATH = "kb_docs.pkl"
+KB_INDEX_DIR = os.getenv("KB_INDEX_DIR", "vector_stores/kb")  # versioned, see utils/versioned_index.py
+LEGACY_INDEX_PATH = "kb.index"
+LEGACY_DOCS_PATH = "kb_docs.pkl"
 TRAINING_DATA_PATH = os.path.abspath("training/data/tune.jsonl")
 
 # --- LOGGING ---
@@ -23,15 +26,18 @@ router = APIRouter()
 
 # --- Load Fine-Tuned Mistral Model ---
 logger.info("📦 Loading fine-tuned Mistral model...")
-tokenizer = AutoTokenizer.from_pretrained(MODEL_PATH)
-model = AutoModelForCausalLM.from_pretrained(MODEL_PATH)
+# Precision follows LLM_PRECISION (fp32 / int8 / bf16), see services/llm_loader.py
+LLM_PRECISION = resolve_precision()
+tokenizer, model = load_causal_lm(MODEL_PATH, LLM_PRECISION)
 chatbot = pipeline("text-generation", model=model, tokenizer=tokenizer)
 
 # --- Load Embedding Model ---
 embedder = SentenceTransformer(VECTOR_MODEL_NAME)
 
 # --- Vector DB Initialization ---
-print(f"🔄 Loading vector DB from: {INDEX_PATH}======={TRAINING_DATA_PATH}")
+print(f"🔄 Loading vector DB from: {KB_INDEX_DIR}======={TRAINING_DATA_PATH}")
+kb_index = VersionedIndex(KB_INDEX_DIR)
+
 def build_vector_index_from_jsonl(jsonl_path=TRAINING_DATA_PATH):
     logger.info("📖 Building vector index from JSONL...")
     with open(jsonl_path, "r", encoding="utf-8") as f:
@@ -46,19 +52,22 @@ def build_vector_index_from_jsonl(jsonl_path=TRAINING_DATA_PATH):
     index = faiss.IndexFlatL2(vectors.shape[1])
     index.add(vectors)
 
-    faiss.write_index(index, INDEX_PATH)
-    with open(DOCS_PATH, "wb") as f:
-        pickle.dump(documents, f)
-    logger.info("✅ Vector index and document store saved.")
+    # Published as a new version; running queries finish on the old one
+    version = kb_index.publish(index, documents)
+    logger.info(f"✅ Vector index and document store saved as version {version}.")
+    return version
 
 # --- Load or Build Vector DB ---
-if not os.path.exists(INDEX_PATH) or not os.path.exists(DOCS_PATH):
-    build_vector_index_from_jsonl()
+if kb_index.current_version() is None:
+    if os.path.exists(LEGACY_INDEX_PATH) and os.path.exists(LEGACY_DOCS_PATH):
+        # Adopt an index built before versioning
+        with open(LEGACY_DOCS_PATH, "rb") as f:
+            kb_index.publish(faiss.read_index(LEGACY_INDEX_PATH), pickle.load(f))
+    else:
+        build_vector_index_from_jsonl()
 
 logger.info("📂 Loading vector DB...")
-index = faiss.read_index(INDEX_PATH)
-with open(DOCS_PATH, "rb") as f:
-    documents = pickle.load(f)
+kb_index.reload()
 
 # --- API MODEL ---
 class ChatRequest(BaseModel):
@@ -67,8 +76,8 @@ class ChatRequest(BaseModel):
 def generate_clean_response(prompt, model, tokenizer):
     input_ids = tokenizer(prompt, return_tensors="pt").input_ids
 
-    # Move to GPU if available
-    if torch.cuda.is_available():
+    # Move to GPU if available (int8/bf16 modes are CPU-only)
+    if torch.cuda.is_available() and LLM_PRECISION == "fp32":
         input_ids = input_ids.cuda()
         model = model.cuda()
 
@@ -94,10 +103,11 @@ def chat(request: ChatRequest):
     query = request.query
     logger.info(f"🟢 Received query: {query}")
 
-    # Vector search
+    # Vector search against one pinned index version
     query_vec = embedder.encode([query])
-    distances, indices = index.search(query_vec, k=1)
-    context = documents[indices[0][0]]
+    with kb_index.acquire() as kb:
+        distances, indices = kb.index.search(query_vec, k=1)
+        context = kb.documents[indices[0][0]]
     logger.info(f"📄 Retrieved context: {context}")
 
     # Build prompt
@@ -107,4 +117,11 @@ def chat(request: ChatRequest):
     response = generate_clean_response(prompt, model, tokenizer)
     logger.info(f"💬 Generated response: {response}")
 
-    return {"response": response}
\ No newline at end of file
+    return {"response": response}
+
+
+@router.post("/vchat/reindex")
+def reindex(background_tasks: BackgroundTasks):
+    # Rebuild from the training data without blocking or pausing queries
+    background_tasks.add_task(build_vector_index_from_jsonl)
+    return {"status": "rebuilding", "current_version": kb_index.current_version()}
@@ -6,6 +6,7 @@ from database.database import async_session
 from models.db_models import User
 from mongo.models import save_chat_log_mongo, save_ticket_log_mongo, save_feedback_mongo, chat_logs_col
 from sqlalchemy.ext.asyncio import AsyncSession
+from services.analytics import analytics
 # 💬 Save Chat Message
 from datetime import datetime
 
@@ -33,6 +34,7 @@ def get_conversation_context(session_id: str, limit: int = 10):
 
 # 🎟️ Create Support Ticket
 def create_ticket(ticket_data):
+    analytics.record_outcome("ticket")
     return save_ticket_log_mongo(ticket_data)
 
 # 🎟️ Get Ticket by ID
@@ -1,11 +1,17 @@
+from utils.startup_profile import startup_profile
+startup_profile.start()  # per-module import times when STARTUP_PROFILE=1
+
 from fastapi import FastAPI
 from fastapi.middleware.cors import CORSMiddleware
 from fastapi.staticfiles import StaticFiles
+from middleware.static_cache import CachedStaticFiles
 from sqlalchemy.ext.declarative import declarative_base
 from api.qa import router as qa_router
 from api.auth import router as auth_router
 from fastapi.responses import JSONResponse
 import logging
+import asyncio
+import os
 
 from database import database  # Assuming you have a database module for initialization
 
@@ -13,6 +19,9 @@ from db import *
 from api import chat, auth, files, training, websocket
 from utils.email_notify import setup_email_notifications
 from routes import whatsapp_routes as whatsapp, chat as chat_routes
+from routes.admin import admin_router
+from services.model_registry import model_registry, warmup_names
+startup_profile.stop()
 Base = declarative_base()
 
 app = FastAPI(
@@ -45,18 +54,51 @@ app.include_router(training.router, prefix="/api/training", tags=["Training"])
 app.include_router(websocket.router, tags=["WebSocket"])
 app.include_router(whatsapp.router, prefix="/whatsapp")
 app.include_router(auth_router, prefix="/api/auth", tags=["Auth"])
+app.include_router(admin_router, prefix="/api/admin", tags=["Admin"])
 
 # ✅ Static file serving (for uploaded images, previews, etc.)
-app.mount("/uploads", StaticFiles(directory="uploads"), name="uploads")
+app.mount("/uploads", CachedStaticFiles(directory="uploads"), name="uploads")
 
 # ✅ Startup/shutdown tasks
+def _log_index_setup_failure(task):
+    if not task.cancelled() and task.exception():
+        print(f"Warning: Mongo index setup failed: {task.exception()}")
+
 @app.on_event("startup")
 async def startup():
+    profile = startup_profile.report()
+    print(f"[⏱️] Startup imports took {profile['import_seconds']}s")
+    for entry in profile["modules"]:
+        print(f"[⏱️]   {entry['module']}: {entry['self_ms']} ms self, {entry['inclusive_ms']} ms total")
+    # Models load on first use; MODEL_WARMUP loads them up front without holding up startup
+    names = warmup_names()
+    if names:
+        app.state.model_warmup = asyncio.get_running_loop().run_in_executor(None, model_registry.warm_up, names)
+        if os.getenv("MODEL_WARMUP_WAIT", "0") == "1":
+            await app.state.model_warmup
     try:
         await database.init_db()
     except Exception as e:
         print(f"Warning: Database initialization failed: {e}")
         print("Continuing with MongoDB-only authentication...")
+    # Index setup runs in the background: with Mongo down it would otherwise
+    # hold startup for the whole server-selection timeout
+    from mongo.indexes import setup_indexes
+    app.state.index_setup = asyncio.create_task(asyncio.to_thread(setup_indexes))
+    app.state.index_setup.add_done_callback(_log_index_setup_failure)
+    try:
+        from mongo.models import migrate_legacy_session_contexts
+        migrated = await asyncio.to_thread(migrate_legacy_session_contexts)
+        if migrated:
+            print(f"[🔁] Migrated {migrated} legacy Redis session contexts")
+    except Exception as e:
+        print(f"Warning: Session context migration failed: {e}")
+    try:
+        from services.analytics import run_analytics_flusher
+        app.state.analytics_stop = asyncio.Event()
+        app.state.analytics_flusher = asyncio.create_task(run_analytics_flusher(stop=app.state.analytics_stop))
+    except Exception as e:
+        print(f"Warning: Analytics flusher failed to start: {e}")
     try:
         setup_email_notifications()
     except Exception as e:
@@ -65,13 +107,22 @@ async def startup():
 
 @app.on_event("shutdown")
 async def shutdown():
-    pass  # Cleanup tasks (if any)
+    flusher = getattr(app.state, "analytics_flusher", None)
+    if flusher:
+        # The flusher finishes any flush in progress, then writes the final
+        # deltas off the event loop and exits
+        app.state.analytics_stop.set()
+        await flusher
 
 # ✅ Health check
 @app.get("/", tags=["Health"])
 def root():
     return {"message": "✅ Support Assistant API is live."}
 
+@app.get("/health/models", tags=["Health"])
+def model_health():
+    return {"models": model_registry.metrics(), "startup": startup_profile.report()}
+
 # Exception handling
 logging.basicConfig(level=logging.ERROR)
 
@@ -0,0 +1,20 @@
+from fastapi.staticfiles import StaticFiles
+
+# Content-addressed files never change under the same name
+IMMUTABLE_PREFIXES = ("thumbnails/",)
+IMMUTABLE_CACHE_CONTROL = "public, max-age=31536000, immutable"
+DEFAULT_CACHE_CONTROL = "public, max-age=300"
+
+
+class CachedStaticFiles(StaticFiles):
+    """
+    StaticFiles that adds Cache-Control headers: long-lived and immutable for
+    content-addressed paths, short-lived for everything else.
+    """
+
+    def file_response(self, full_path, stat_result, scope, status_code=200):
+        response = super().file_response(full_path, stat_result, scope, status_code)
+        path = self.get_path(scope).replace("\\", "/")
+        immutable = any(path.startswith(prefix) for prefix in IMMUTABLE_PREFIXES)
+        response.headers["Cache-Control"] = IMMUTABLE_CACHE_CONTROL if immutable else DEFAULT_CACHE_CONTROL
+        return response
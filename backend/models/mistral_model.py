@@ -1,7 +1,6 @@
-from transformers import AutoTokenizer, AutoModelForCausalLM, pipeline
-from config import MODEL_NAME, OUTPUT_DIR
-import torch
-import os
+import asyncio
+
+from services.model_registry import model_registry
 
 # Load the tokenizer and model
 # tokenizer = AutoTokenizer.from_pretrained(OUTPUT_DIR or MODEL_NAME)
@@ -13,19 +12,13 @@ import os
 # model.save_pretrained("uploaded_kbs/falcon-rw-1b")
 # tokenizer.save_pretrained("uploaded_kbs/falcon-rw-1b")
 
-# Use local directory only
-model_path = OUTPUT_DIR if os.path.exists(OUTPUT_DIR) else MODEL_NAME
-
-tokenizer = AutoTokenizer.from_pretrained(model_path)
-model = AutoModelForCausalLM.from_pretrained(model_path)
-
-device = torch.device("cuda" if torch.cuda.is_available() else "cpu")
-model = model.to(device)
-
-classifier = pipeline("sentiment-analysis", model="distilbert-base-uncased-finetuned-sst-2-english")
+# Model (local OUTPUT_DIR, else MODEL_NAME) and the sentiment classifier are
+# loaded through the model registry on first use
 
 
 def get_mistral_response(prompt: str, max_new_tokens: int = 100) -> str:
+    import torch
+    tokenizer, model, device = model_registry.get("mistral")
     inputs = tokenizer.encode(prompt, return_tensors="pt").to(device)
     with torch.no_grad():
         outputs = model.generate(
@@ -40,11 +33,20 @@ def get_mistral_response(prompt: str, max_new_tokens: int = 100) -> str:
     return decoded[len(prompt):].strip()
 
 
+async def generate_mistral_response(prompt: str, max_new_tokens: int = 100) -> str:
+    """
+    get_mistral_response for async callers: the first call's model load and
+    every generation run in a worker thread, off the event loop.
+    """
+    await model_registry.aget("mistral")
+    return await asyncio.to_thread(get_mistral_response, prompt, max_new_tokens)
+
+
 def classify_sentiment(text: str) -> str:
     """
     Returns 'positive' or 'negative'
     """
-    result = classifier(text)[0]
+    result = model_registry.get("sentiment_classifier")(text)[0]
     label = result["label"].lower()  # 'positive' or 'negative'
     return label
 
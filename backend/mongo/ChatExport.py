@@ -1,16 +1,45 @@
 from pymongo import MongoClient
+from bson import ObjectId
+from concurrent.futures import ProcessPoolExecutor
+from collections import deque
+from datetime import datetime
+import argparse
+import gzip
 import json
-from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+import os
+import sys
 
-mongo_client = MongoClient("mongodb://localhost:27017")
-db = mongo_client["chat_support"]
-logs = list(db["chat_logs"].find())
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from training.incremental import load_watermark, save_watermark
 
-analyzer = SentimentIntensityAnalyzer()
-output_file = "training/data/fine_tune_reward.jsonl"
+MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017")
+# Same database save_chat_log_mongo (mongo/models.py) writes chat_logs to
+MONGO_DB = os.getenv("CHAT_EXPORT_DB", "chat_db")
+OUTPUT_FILE = "training/data/fine_tune_reward.jsonl"
+BATCH_SIZE = 1000
+PROJECTION = {"user_message": 1, "prompt": 1, "bot_reply": 1, "response": 1}
+EXPORT_JOB = "chat_export"
 
-with open(output_file, "w") as f:
-    for doc in logs:
+_analyzer = None
+
+
+def _get_analyzer():
+    # One VADER analyzer per worker process
+    global _analyzer
+    if _analyzer is None:
+        from vaderSentiment.vaderSentiment import SentimentIntensityAnalyzer
+        _analyzer = SentimentIntensityAnalyzer()
+    return _analyzer
+
+
+def score_batch(docs):
+    """
+    Turn a batch of chat log documents into reward records.
+    Runs inside a worker process.
+    """
+    analyzer = _get_analyzer()
+    records = []
+    for doc in docs:
         prompt = doc.get("user_message") or doc.get("prompt")
         response = doc.get("bot_reply") or doc.get("response")
         if not prompt or not response:
@@ -24,15 +53,164 @@ with open(output_file, "w") as f:
         else:
             reward = 0.0
 
-        record = {"prompt": prompt, "response": response, "reward": reward}
-        json.dump(record, f)
-        f.write("\n")
+        records.append({"prompt": prompt, "response": response, "reward": reward})
+    return records
+
+
+def iter_batches(collection, after_id=None, since=None, batch_size=BATCH_SIZE, until=None):
+    """
+    Stream the collection in _id order, yielding (last_id, docs) batches.
+    `since` / `until` bound the timestamp as [since, until).
+    """
+    query = {}
+    if after_id:
+        query["_id"] = {"$gt": ObjectId(after_id)}
+    if since or until:
+        query["timestamp"] = {}
+        if since:
+            query["timestamp"]["$gte"] = since
+        if until:
+            query["timestamp"]["$lt"] = until
+
+    cursor = collection.find(query, PROJECTION).sort("_id", 1).batch_size(batch_size)
+    batch = []
+    for doc in cursor:
+        doc["_id"] = str(doc["_id"])
+        batch.append(doc)
+        if len(batch) == batch_size:
+            yield batch[-1]["_id"], batch
+            batch = []
+    if batch:
+        yield batch[-1]["_id"], batch
+
+
+def _load_checkpoint(path):
+    if os.path.exists(path):
+        with open(path, "r") as f:
+            return json.load(f)
+    return {}
+
+
+def _save_checkpoint(path, state):
+    tmp_path = f"{path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump(state, f)
+    os.replace(tmp_path, path)
+
+
+def _iso(value):
+    return value.isoformat() if value else None
+
+
+def _from_iso(value):
+    return datetime.fromisoformat(value) if value else None
+
+
+def export_chat_logs(output_file=OUTPUT_FILE, compress=False, batch_size=BATCH_SIZE,
+                     workers=None, resume=False, since=None, db_name=MONGO_DB, incremental=False):
+    """
+    Export chat logs as reward-labelled JSONL in constant memory.
+    Batches are scored in worker processes with a bounded number in flight,
+    written in _id order, and checkpointed so an interrupted run can resume.
+
+    With `incremental`, only logs newer than the stored watermark are
+    exported and appended to `output_file`; the watermark moves to the run
+    start once the run completes. An explicit `since` takes precedence over
+    the watermark.
+    """
+    if compress and not output_file.endswith(".gz"):
+        output_file += ".gz"
+    checkpoint_path = f"{output_file}.checkpoint"
+    db = MongoClient(MONGO_URI)[db_name]
+
+    state = _load_checkpoint(checkpoint_path) if resume else {}
+    if state:
+        # A resumed run keeps the window (and append point) it started with
+        since, until = _from_iso(state.get("since")), _from_iso(state.get("until"))
+        incremental = state.get("incremental", False)
+        start_offset = state.get("offset", 0)
+    else:
+        until = None
+        start_offset = 0
+        if incremental:
+            until = datetime.utcnow()
+            if since:
+                print(f"[⏱️] Incremental export from explicit --since {since} (stored watermark ignored)")
+            else:
+                since = load_watermark(db, EXPORT_JOB)
+                print(f"[⏱️] Incremental export from stored watermark {since or '(none: full export)'}")
+            if since and os.path.exists(output_file):
+                start_offset = os.path.getsize(output_file)
+    after_id = state.get("last_id")
+    exported = state.get("exported", 0)
+    window = {"since": _iso(since), "until": _iso(until), "incremental": incremental}
+    if since:
+        print(f"[⏱️] Exporting logs since {since}")
+
+    # Anything past the last checkpoint (or the append point) is from an
+    # interrupted run and gets cut off. Each batch is written as a complete
+    # gzip member, so a checkpointed offset is always a valid end of file.
+    mode = "r+b" if start_offset and os.path.exists(output_file) else "wb"
+    workers = workers or os.cpu_count() or 1
 
-print("✅ JSONL exported from MongoDB")
+    with open(output_file, mode) as f, ProcessPoolExecutor(max_workers=workers) as pool:
+        f.truncate(start_offset)
+        f.seek(start_offset)
+        _save_checkpoint(checkpoint_path, {"last_id": after_id, "exported": exported, "offset": start_offset, **window})
+        pending = deque()
 
+        def drain_one():
+            nonlocal exported
+            last_id, future = pending.popleft()
+            records = future.result()
+            data = "".join(json.dumps(record) + "\n" for record in records).encode("utf-8")
+            if compress and data:
+                data = gzip.compress(data)
+            f.write(data)
+            f.flush()
+            exported += len(records)
+            _save_checkpoint(checkpoint_path, {"last_id": last_id, "exported": exported, "offset": f.tell(), **window})
 
+        for last_id, docs in iter_batches(collection=db["chat_logs"], after_id=after_id, since=since,
+                                          batch_size=batch_size, until=until):
+            pending.append((last_id, pool.submit(score_batch, docs)))
+            if len(pending) >= workers * 2:
+                drain_one()
+        while pending:
+            drain_one()
 
+    if incremental:
+        save_watermark(db, EXPORT_JOB, until)
+    os.remove(checkpoint_path)
+    return exported
 
 
+def _parse_args():
+    parser = argparse.ArgumentParser(description="Export chat logs to reward-labelled JSONL")
+    parser.add_argument("--output", default=OUTPUT_FILE)
+    parser.add_argument("--gzip", action="store_true", help="Write gzip-compressed JSONL")
+    parser.add_argument("--batch-size", type=int, default=BATCH_SIZE)
+    parser.add_argument("--workers", type=int, default=None)
+    parser.add_argument("--resume", action="store_true", help="Continue after the last checkpointed _id")
+    parser.add_argument("--db", default=MONGO_DB, help="Database holding chat_logs")
+    window = parser.add_mutually_exclusive_group()
+    window.add_argument("--since", type=datetime.fromisoformat, default=None,
+                        help="Only export logs with timestamp >= this ISO datetime")
+    window.add_argument("--incremental", action="store_true",
+                        help="Append only logs newer than the last incremental export (stored watermark)")
+    return parser.parse_args()
 
 
+if __name__ == "__main__":
+    args = _parse_args()
+    total = export_chat_logs(
+        output_file=args.output,
+        compress=args.gzip,
+        batch_size=args.batch_size,
+        workers=args.workers,
+        resume=args.resume,
+        since=args.since,
+        db_name=args.db,
+        incremental=args.incremental,
+    )
+    print(f"✅ JSONL exported from MongoDB ({total} records)")
@@ -1,11 +1,21 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, ASCENDING, DESCENDING, ReturnDocument
 from uuid import uuid4
 from datetime import datetime
+import os
 
 # MongoDB connection
 client = MongoClient('mongodb://localhost:27017/')
 db = client['chat_db']
 sessions = db['sessions']
+# Messages live in fixed-size bucket documents so no session document grows without bound
+session_messages = db['session_messages']
+
+BUCKET_SIZE = int(os.getenv("CHAT_BUCKET_SIZE", 100))  # messages per bucket document
+
+# Indexes for bucket lookups and time-range reads are registered in mongo/indexes.py
+
+def _bucket_for(seq):
+    return (seq - 1) // BUCKET_SIZE
 
 # Generate a new chat session ID and create a session document
 def create_chat_session(user_id):
@@ -14,26 +24,124 @@ def create_chat_session(user_id):
         'session_id': session_id,
         'user_id': user_id,
         'created_at': datetime.utcnow(),
-        'messages': []
+        'message_count': 0
     }
     sessions.insert_one(session_doc)
     return session_id
 
+# Sessions written before bucketing kept their messages inline in `messages`
+# and have no message_count. Their messages count as seq 1..n: the first new
+# write moves them into buckets and seeds message_count from len(messages);
+# until then the readers merge them in.
+def _inline_messages(session_id):
+    session = sessions.find_one({'session_id': session_id, 'messages.0': {'$exists': True}}, {'messages': 1})
+    if not session:
+        return []
+    return [{**msg, 'seq': i} for i, msg in enumerate(session['messages'], start=1)]
+
+def _push_to_buckets(session_id, messages):
+    by_bucket = {}
+    for msg in messages:
+        by_bucket.setdefault(_bucket_for(msg['seq']), []).append(msg)
+    for bucket, msgs in by_bucket.items():
+        update = {
+            # $sort keeps each bucket ordered even when concurrent writers push out of seq order
+            '$push': {'messages': {'$each': msgs, '$sort': {'seq': 1}}},
+            '$inc': {'count': len(msgs)},
+        }
+        stamps = [m['timestamp'] for m in msgs if m.get('timestamp')]
+        if stamps:
+            update['$min'] = {'start_ts': min(stamps)}
+            update['$max'] = {'end_ts': max(stamps)}
+        session_messages.update_one({'session_id': session_id, 'bucket': bucket}, update, upsert=True)
+
+def _migrate_inline_messages(session_id):
+    """Returns False if the session does not exist."""
+    session = sessions.find_one({'session_id': session_id}, {'messages': 1, 'message_count': 1})
+    if session is None:
+        return False
+    if 'message_count' in session:
+        return True
+    inline = session.get('messages', [])
+    # Only the writer that seeds the counter copies the messages
+    claimed = sessions.update_one(
+        {'session_id': session_id, 'message_count': {'$exists': False}},
+        {'$set': {'message_count': len(inline)}}
+    )
+    if claimed.modified_count:
+        _push_to_buckets(session_id, [{**msg, 'seq': i} for i, msg in enumerate(inline, start=1)])
+        sessions.update_one({'session_id': session_id}, {'$unset': {'messages': ''}})
+    return True
+
+def _reserve_seq(session_id):
+    session = sessions.find_one_and_update(
+        {'session_id': session_id, 'message_count': {'$exists': True}},
+        {'$inc': {'message_count': 1}},
+        projection={'message_count': 1},
+        return_document=ReturnDocument.AFTER
+    )
+    return session['message_count'] if session else None
+
 # Store a message in a chat session
 def store_message(session_id, sender, message):
+    # Reserve a sequence number; it decides which bucket the message lands in
+    seq = _reserve_seq(session_id)
+    if seq is None:
+        if not _migrate_inline_messages(session_id):
+            return None
+        seq = _reserve_seq(session_id)
+
     msg = {
+        'seq': seq,
         'sender': sender,
         'message': message,
         'timestamp': datetime.utcnow()
     }
-    sessions.update_one(
-        {'session_id': session_id},
-        {'$push': {'messages': msg}}
-    )
+    _push_to_buckets(session_id, [msg])
+    return seq
+
+def _merge(bucket_docs, inline):
+    # Keyed by seq: a migration caught half-way must not show messages twice
+    by_seq = {msg['seq']: msg for msg in inline}
+    for bucket in bucket_docs:
+        for msg in bucket.get('messages', []):
+            by_seq[msg['seq']] = msg
+    return by_seq
+
+# Get one page of chat history, newest page first
+def get_chat_history_page(session_id, limit=50, cursor=None):
+    """
+    Returns up to `limit` messages older than `cursor` (a message seq), in
+    chronological order, plus the cursor for the next (older) page.
+    Only the buckets covering the page are read, so the cost does not depend
+    on how long the session is.
+    """
+    if cursor is not None and cursor <= 1:
+        return {'messages': [], 'next_cursor': None}
+
+    query = {'session_id': session_id}
+    if cursor is not None:
+        query['bucket'] = {'$lte': _bucket_for(cursor - 1)}
+
+    buckets = session_messages.find(
+        query,
+        {'_id': 0, 'messages': 1}
+    ).sort('bucket', DESCENDING).limit(limit // BUCKET_SIZE + 2)
+
+    by_seq = _merge(buckets, _inline_messages(session_id))
+    seqs = sorted(seq for seq in by_seq if cursor is None or seq < cursor)[-limit:]
+    page = [by_seq[seq] for seq in seqs]
+    next_cursor = page[0]['seq'] if page and page[0]['seq'] > 1 else None
+    return {'messages': page, 'next_cursor': next_cursor}
 
 # Get chat history for a session
-def get_chat_history(session_id):
-    session = sessions.find_one({'session_id': session_id})
-    if session:
-        return session.get('messages', [])
-    return []
+def get_chat_history(session_id, limit=None):
+    if limit is not None:
+        return get_chat_history_page(session_id, limit=limit)['messages']
+
+    buckets = session_messages.find(
+        {'session_id': session_id},
+        {'_id': 0, 'messages': 1}
+    ).sort('bucket', ASCENDING)
+    by_seq = _merge(buckets, _inline_messages(session_id))
+    return [by_seq[seq] for seq in sorted(by_seq)]
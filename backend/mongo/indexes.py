@@ -0,0 +1,189 @@
+# mongo/indexes.py
+
+from pymongo import ASCENDING, DESCENDING
+from pymongo.errors import PyMongoError, OperationFailure, ConnectionFailure
+import logging
+import os
+from datetime import datetime
+
+from mongo.models import mongo_client
+
+# TTL windows for ephemeral data; 0 disables the TTL index
+SESSION_MESSAGES_TTL_DAYS = int(os.getenv("SESSION_MESSAGES_TTL_DAYS", 0))
+FEEDBACK_TTL_DAYS = int(os.getenv("FEEDBACK_TTL_DAYS", 0))
+
+DAY_SECONDS = 60 * 60 * 24
+INDEX_OPTIONS_CONFLICT = 85  # server error code when an index exists with other options
+
+# ------------------------------
+# Index registry
+# (database, collection, keys, options)
+# ------------------------------
+INDEXES = [
+    # chat_logs: conversation context (session_id + timestamp sort) and the
+    # time-range scans of the sentiment rollup backfill (mongo/sentiment_trend.py)
+    ("chat_db", "chat_logs", [("session_id", ASCENDING), ("timestamp", DESCENDING)], {}),
+    ("chat_db", "chat_logs", [("timestamp", ASCENDING), ("sentiment", ASCENDING)], {}),
+
+    # sentiment rollups (mongo/sentiment_trend.py)
+    ("chat_db", "sentiment_daily", [("tenant_id", ASCENDING), ("date", ASCENDING)], {"unique": True}),
+    ("chat_db", "sentiment_daily", [("date", ASCENDING)], {}),
+    ("chat_db", "sentiment_hourly", [("tenant_id", ASCENDING), ("hour", ASCENDING)], {"unique": True}),
+    ("chat_db", "sentiment_hourly", [("hour", ASCENDING)], {}),
+
+    # sessions + bucketed messages (mongo/chat_sessions.py)
+    ("chat_db", "sessions", [("session_id", ASCENDING)], {"unique": True}),
+    ("chat_db", "sessions", [("user_id", ASCENDING), ("created_at", DESCENDING)], {}),
+    ("chat_db", "session_messages", [("session_id", ASCENDING), ("bucket", DESCENDING)], {"unique": True}),
+    ("chat_db", "session_messages", [("session_id", ASCENDING), ("end_ts", DESCENDING)], {}),
+
+    # tickets and feedback
+    ("chat_db", "ticket_logs", [("created_at", DESCENDING)], {}),
+    ("chat_db", "feedback_logs", [("message_id", ASCENDING)], {}),
+
+    # users (also created in mongo/users.py)
+    ("chat_db", "users", [("email", ASCENDING)], {"unique": True}),
+    ("chat_db", "users", [("user_id", ASCENDING)], {"unique": True}),
+]
+
+if SESSION_MESSAGES_TTL_DAYS:
+    INDEXES.append(("chat_db", "session_messages", [("end_ts", ASCENDING)],
+                    {"expireAfterSeconds": SESSION_MESSAGES_TTL_DAYS * DAY_SECONDS}))
+if FEEDBACK_TTL_DAYS:
+    INDEXES.append(("chat_db", "feedback_logs", [("timestamp", ASCENDING)],
+                    {"expireAfterSeconds": FEEDBACK_TTL_DAYS * DAY_SECONDS}))
+
+# Representative queries used to check that the hot paths are served by an index
+# (database, collection, filter, sort)
+ACCESS_PATTERNS = [
+    ("chat_db", "chat_logs", {"session_id": "probe"}, [("timestamp", DESCENDING)]),
+    ("chat_db", "sessions", {"session_id": "probe"}, None),
+    ("chat_db", "session_messages", {"session_id": "probe"}, [("bucket", DESCENDING)]),
+    ("chat_db", "feedback_logs", {"message_id": "probe"}, None),
+    ("chat_db", "chat_logs", {"timestamp": {"$lt": datetime(1970, 1, 1)}}, None),
+    ("chat_db", "chat_logs", {"timestamp": {"$gte": datetime(1970, 1, 1)}}, None),
+]
+
+
+def _collection(db_name, coll_name):
+    return mongo_client[db_name][coll_name]
+
+
+def ensure_indexes():
+    """
+    Create every registered index. create_index is a no-op when the index
+    already exists, so this is safe to call on every startup. Each index is
+    applied on its own: one failure is reported and the rest still run
+    (an unreachable server still aborts the whole pass).
+    Returns (applied, failed): created index names and failure descriptions.
+    """
+    applied, failed = [], []
+    for db_name, coll_name, keys, options in INDEXES:
+        label = f"{db_name}.{coll_name}: {keys}"
+        try:
+            name = _apply_index(db_name, coll_name, keys, options)
+            applied.append(f"{db_name}.{coll_name}.{name}")
+        except ConnectionFailure:
+            raise
+        except PyMongoError as e:
+            failed.append(f"{label} ({e})")
+    return applied, failed
+
+
+def _apply_index(db_name, coll_name, keys, options):
+    collection = _collection(db_name, coll_name)
+    try:
+        return collection.create_index(keys, **options)
+    except OperationFailure as e:
+        if e.code != INDEX_OPTIONS_CONFLICT or "expireAfterSeconds" not in options:
+            raise
+    # Same keys, different TTL: change the window in place instead of rebuilding
+    mongo_client[db_name].command(
+        "collMod", coll_name,
+        index={"keyPattern": dict(keys), "expireAfterSeconds": options["expireAfterSeconds"]},
+    )
+    return next(name for name, info in collection.index_information().items() if list(info["key"]) == list(keys))
+
+
+def find_missing_indexes():
+    """
+    Compare the registry against what the server actually has.
+    Returns a list of "db.collection: keys" strings for indexes that are absent.
+    """
+    missing = []
+    for db_name, coll_name, keys, _ in INDEXES:
+        existing = [list(info["key"]) for info in _collection(db_name, coll_name).index_information().values()]
+        if [tuple(k) for k in keys] not in [[tuple(k) for k in e] for e in existing]:
+            missing.append(f"{db_name}.{coll_name}: {keys}")
+    return missing
+
+
+def _plan_stages(plan):
+    stages = [plan.get("stage")]
+    if "inputStage" in plan:
+        stages += _plan_stages(plan["inputStage"])
+    for child in plan.get("inputStages", []):
+        stages += _plan_stages(child)
+    return stages
+
+
+def find_collection_scans():
+    """
+    Run explain() on each registered access pattern and report the ones whose
+    winning plan contains a COLLSCAN stage.
+    """
+    scans = []
+    for db_name, coll_name, query, sort in ACCESS_PATTERNS:
+        cursor = _collection(db_name, coll_name).find(query)
+        if sort:
+            cursor = cursor.sort(sort)
+        plan = cursor.explain().get("queryPlanner", {}).get("winningPlan", {})
+        if "COLLSCAN" in _plan_stages(plan):
+            scans.append(f"{db_name}.{coll_name}: {query} sort={sort}")
+    return scans
+
+
+def index_report():
+    """
+    Summarise index health: missing registry entries and collection scans.
+    """
+    report = {"missing": [], "collection_scans": []}
+    try:
+        report["missing"] = find_missing_indexes()
+        report["collection_scans"] = find_collection_scans()
+    except PyMongoError as e:
+        report["error"] = str(e)
+    return report
+
+
+def setup_indexes():
+    """
+    Startup hook: apply the registry and log what is still missing or
+    scanning. Blocking (pymongo); run it off the event loop.
+    """
+    applied, failed = ensure_indexes()
+    for line in failed:
+        logging.warning(f"Mongo index not applied: {line}")
+    report = index_report()
+    for line in report["missing"]:
+        logging.warning(f"Missing Mongo index: {line}")
+    for line in report["collection_scans"]:
+        logging.warning(f"Mongo collection scan: {line}")
+    if report.get("error"):
+        logging.warning(f"Mongo index report failed: {report['error']}")
+    return report
+
+
+if __name__ == "__main__":
+    applied, failed = ensure_indexes()
+    for name in applied:
+        print(f"✅ {name}")
+    for line in failed:
+        print(f"❌ Index not applied: {line}")
+    report = index_report()
+    for line in report["missing"]:
+        print(f"⚠️ Missing index: {line}")
+    for line in report["collection_scans"]:
+        print(f"⚠️ Collection scan: {line}")
+    if report.get("error"):
+        print(f"❌ {report['error']}")
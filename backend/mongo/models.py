@@ -5,8 +5,9 @@ import redis
 import json
 
 # LangChain imports
-from langchain_community.chat_message_histories import RedisChatMessageHistory
-from langchain.memory import ConversationBufferMemory
+from langchain_core.messages import HumanMessage, AIMessage
+from mongo.session_memory import SessionMemoryManager
+from mongo.sentiment_trend import record_sentiment
 
 # MongoDB setup
 MONGO_URI = os.getenv("MONGO_URI", "mongodb://localhost:27017/")
@@ -19,8 +20,14 @@ chat_logs_col = mongo_db["chat_logs"]
 ticket_logs_col = mongo_db["ticket_logs"]
 feedback_logs_col = mongo_db["feedback_logs"]
 
-# Redis setup (plain Redis)
-redis_client = redis.Redis(host="localhost", port=6379, db=0)
+# Redis setup (plain Redis, one connection pool shared by context and LangChain memory)
+REDIS_URL = os.getenv("REDIS_URL", "redis://localhost:6379/0")
+redis_pool = redis.ConnectionPool.from_url(REDIS_URL)
+redis_client = redis.Redis(connection_pool=redis_pool)
+
+# Session context is kept as a capped Redis list (RPUSH + LTRIM) instead of one JSON blob
+SESSION_CONTEXT_WINDOW = int(os.getenv("SESSION_CONTEXT_WINDOW", 50))      # lines kept per session
+SESSION_CONTEXT_TTL = int(os.getenv("SESSION_CONTEXT_TTL", 60 * 60 * 24))  # seconds of inactivity
 
 
 def save_chat_log_mongo(**record):
@@ -34,22 +41,22 @@ def save_chat_log_mongo(**record):
 
     # 2. Save to MongoDB
     chat_logs_col.insert_one(record)
+    record_sentiment(record.get("sentiment"), record["timestamp"], record.get("tenant_id"))
 
     # 3. Update Redis context
     session_id = record.get("session_id")
     sender = record.get("sender")
     message = record.get("message")
 
-    context = get_session_context(session_id)
     role_prefix = "User" if sender == "user" else "Bot"
-    context.append(f"{role_prefix}: {message}")
-    save_session_context(session_id, context)
-
-    # 4. Update LangChain memory
-    memory = get_langchain_memory(session_id)
+    pipe = redis_client.pipeline(transaction=True)
+    _queue_context_append(pipe, session_id, [f"{role_prefix}: {message}"])
 
+    # 4. Update LangChain memory (same round trip as the context)
     if sender == "user":
-        memory.save_context({"input": message}, {"output": record.get("bot_reply", "")})
+        history = get_langchain_memory(session_id).chat_memory
+        history.queue_messages(pipe, [HumanMessage(content=message), AIMessage(content=record.get("bot_reply") or "")])
+    _finish_context_append(session_id, pipe.execute())
 
     return record  # Optionally return record or inserted ID
 
@@ -75,39 +82,116 @@ def save_feedback_mongo(message_id, feedback):
     })
 
 
+def _session_context_key(session_id):
+    return f"session_ctx:{session_id}"
+
+
+def _legacy_context_key(session_id):
+    # Pre-list format: the whole context as one JSON string
+    return f"session:{session_id}"
+
+
 def get_session_context(session_id):
     """
     Load recent session context from Redis (manual).
-    Returns a list of strings.
+    Returns a list of strings, oldest first, at most SESSION_CONTEXT_WINDOW long.
+    """
+    pipe = redis_client.pipeline(transaction=False)
+    pipe.lrange(_session_context_key(session_id), 0, -1)
+    pipe.get(_legacy_context_key(session_id))
+    items, legacy = pipe.execute()
+    lines = [item.decode("utf-8") for item in items]
+    if legacy:
+        # Not yet migrated (no message since the upgrade); the next append converts it
+        lines = json.loads(legacy) + lines
+    return lines[-SESSION_CONTEXT_WINDOW:]
+
+
+def append_session_context(session_id, *lines):
     """
-    redis_key = f"session:{session_id}"
-    if redis_client.exists(redis_key):
-        return json.loads(redis_client.get(redis_key))
-    return []
+    Append lines to the session context in a single round trip.
+    Only the list tail is written; the window is enforced with LTRIM and
+    the key expires after SESSION_CONTEXT_TTL seconds of inactivity.
+    """
+    if not lines:
+        return
+    pipe = redis_client.pipeline(transaction=True)
+    _queue_context_append(pipe, session_id, lines)
+    _finish_context_append(session_id, pipe.execute())
+
+
+def _queue_context_append(pipe, session_id, lines):
+    # Must be the first commands on `pipe`; see _finish_context_append
+    redis_key = _session_context_key(session_id)
+    legacy_key = _legacy_context_key(session_id)
+    # Old JSON blobs are taken out in the same transaction and moved below
+    pipe.get(legacy_key)
+    pipe.delete(legacy_key)
+    pipe.rpush(redis_key, *lines)
+    pipe.ltrim(redis_key, -SESSION_CONTEXT_WINDOW, -1)
+    pipe.expire(redis_key, SESSION_CONTEXT_TTL)
+
+
+def _finish_context_append(session_id, results):
+    legacy = results[0]
+    if legacy:
+        _prepend_legacy_context(_session_context_key(session_id), json.loads(legacy))
+
+
+def _prepend_legacy_context(redis_key, legacy_lines):
+    legacy_lines = legacy_lines[-SESSION_CONTEXT_WINDOW:]
+    if not legacy_lines:
+        return
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.lpush(redis_key, *reversed(legacy_lines))
+    pipe.ltrim(redis_key, -SESSION_CONTEXT_WINDOW, -1)
+    pipe.expire(redis_key, SESSION_CONTEXT_TTL)
+    pipe.execute()
+
+
+def migrate_legacy_session_contexts(scan_count=500):
+    """
+    Convert every remaining session:<id> JSON blob into the capped list
+    format (with the usual TTL), so sessions that never write again do not
+    keep their old keys forever. Safe to run repeatedly; returns the number
+    of sessions migrated.
+    """
+    migrated = 0
+    for key in redis_client.scan_iter(match=_legacy_context_key("*"), count=scan_count):
+        if redis_client.type(key) != b"string":
+            continue
+        session_id = key.decode("utf-8").split(":", 1)[1]
+        pipe = redis_client.pipeline(transaction=True)
+        pipe.get(key)
+        pipe.delete(key)
+        legacy = pipe.execute()[0]
+        if legacy:
+            _prepend_legacy_context(_session_context_key(session_id), json.loads(legacy))
+            migrated += 1
+    return migrated
 
 
 def save_session_context(session_id, context_list):
     """
-    Save updated context back to Redis (manual).
+    Replace the whole session context (manual).
+    Kept for callers that rebuild context; per-message writes should use append_session_context.
     """
-    redis_key = f"session:{session_id}"
-    redis_client.set(redis_key, json.dumps(context_list))
+    redis_key = _session_context_key(session_id)
+    pipe = redis_client.pipeline(transaction=True)
+    pipe.delete(redis_key, _legacy_context_key(session_id))
+    if context_list:
+        pipe.rpush(redis_key, *context_list[-SESSION_CONTEXT_WINDOW:])
+        pipe.expire(redis_key, SESSION_CONTEXT_TTL)
+    pipe.execute()
+
+
+session_memory = SessionMemoryManager(redis_client)
 
 
 def get_langchain_memory(session_id):
     """
     Returns a LangChain ConversationBufferMemory object backed by Redis.
-    This automatically handles message appending, retrieval, and formatting.
-    """
-    # Create Redis-backed chat history
-    chat_history = RedisChatMessageHistory(
-        url="redis://localhost:6379",
-        session_id=session_id
-    )
-    
-    # Wrap in LangChain memory
-    memory = ConversationBufferMemory(
-        chat_memory=chat_history,
-        return_messages=False
-    )
-    return memory
+    Memories are cached per session and share the pooled redis_client,
+    so no connection is opened per message.
+    """
+    return session_memory.get(session_id)
@@ -1,45 +1,215 @@
 # scripts/sentiment_trend.py
 
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
+from pymongo.errors import BulkWriteError
 from datetime import datetime
+import sys
+import threading
 
 MONGO_URI = "mongodb://localhost:27017"
 mongo_client = MongoClient(MONGO_URI)
-db = mongo_client["chat_support"]
+# Same database save_chat_log_mongo (mongo/models.py) writes, so live
+# counters and backfills describe the same chat_logs
+db = mongo_client["chat_db"]
 chat_logs_col = db["chat_logs"]
 
-def get_daily_sentiment_trends():
+# Pre-aggregated counters, one document per tenant per day / hour
+sentiment_daily_col = db["sentiment_daily"]
+sentiment_hourly_col = db["sentiment_hourly"]
+
+DEFAULT_TENANT = "default"
+
+
+def _sentiment_key(sentiment):
+    # Field names cannot contain "." or start with "$"
+    return str(sentiment or "unknown").replace(".", "_").lstrip("$")
+
+
+class SentimentRollupBuffer:
+    """
+    Per-message counts are collected in memory and written as one bulk $inc
+    per rollup collection on flush(), so the chat write path does no extra
+    Mongo round trips. Deltas that fail to write are merged back and retried
+    on the next flush.
+    """
+
+    def __init__(self, hourly_col=sentiment_hourly_col, daily_col=sentiment_daily_col):
+        self.targets = ((hourly_col, "hour", "%Y-%m-%dT%H"), (daily_col, "date", "%Y-%m-%d"))
+        self._lock = threading.Lock()
+        self._pending = [{} for _ in self.targets]   # per target: {(tenant_id, bucket): {sentiment: n}}
+
+    def add(self, sentiment, timestamp=None, tenant_id=None):
+        timestamp = timestamp or datetime.utcnow()
+        key = _sentiment_key(sentiment)
+        with self._lock:
+            for pending, (_, _, fmt) in zip(self._pending, self.targets):
+                counts = pending.setdefault((tenant_id or DEFAULT_TENANT, timestamp.strftime(fmt)), {})
+                counts[key] = counts.get(key, 0) + 1
+
+    def _merge_back(self, index, deltas):
+        with self._lock:
+            pending = self._pending[index]
+            for bucket_key, counts in deltas:
+                merged = pending.setdefault(bucket_key, {})
+                for sentiment, count in counts.items():
+                    merged[sentiment] = merged.get(sentiment, 0) + count
+
+    def flush(self):
+        """Returns the number of rollup documents updated."""
+        with self._lock:
+            batches, self._pending = self._pending, [{} for _ in self.targets]
+
+        written, error = 0, None
+        for index, ((collection, field, _), batch) in enumerate(zip(self.targets, batches)):
+            deltas = list(batch.items())
+            if not deltas:
+                continue
+            ops = [
+                UpdateOne(
+                    {"tenant_id": tenant_id, field: bucket},
+                    {"$inc": {**{f"counts.{s}": n for s, n in counts.items()}, "total": sum(counts.values())}},
+                    upsert=True
+                )
+                for (tenant_id, bucket), counts in deltas
+            ]
+            try:
+                collection.bulk_write(ops, ordered=False)
+                written += len(ops)
+            except BulkWriteError as e:
+                failed = {err["index"] for err in e.details.get("writeErrors", [])}
+                self._merge_back(index, [d for i, d in enumerate(deltas) if i in failed])
+                written += len(ops) - len(failed)
+                error = e
+            except Exception as e:
+                self._merge_back(index, deltas)
+                error = e
+        if error:
+            raise error
+        return written
+
+
+    def oldest_pending(self):
+        """
+        Start of the oldest hour that still has unwritten deltas, or None.
+        """
+        with self._lock:
+            hours = [bucket for _, bucket in self._pending[0]]
+        return datetime.strptime(min(hours), self.targets[0][2]) if hours else None
+
+
+sentiment_rollups = SentimentRollupBuffer()
+
+
+def record_sentiment(sentiment, timestamp=None, tenant_id=None):
+    """
+    Count one chat message towards the daily and hourly rollups.
+    Buffered in memory; flush_sentiment_rollups() writes the counts.
+    """
+    sentiment_rollups.add(sentiment, timestamp, tenant_id)
+
+
+def flush_sentiment_rollups():
+    return sentiment_rollups.flush()
+
+
+def _read_rollups(collection, field, tenant_id=None, start=None, end=None):
+    query = {}
+    if tenant_id:
+        query["tenant_id"] = tenant_id
+    if start or end:
+        query[field] = {}
+        if start:
+            query[field]["$gte"] = start
+        if end:
+            query[field]["$lte"] = end
+
+    trends = {}
+    for doc in collection.find(query, {"_id": 0, field: 1, "counts": 1}).sort(field, 1):
+        bucket = trends.setdefault(doc[field], {})
+        # Without a tenant filter, several tenants share a bucket; sum them
+        for sentiment, count in doc.get("counts", {}).items():
+            bucket[sentiment] = bucket.get(sentiment, 0) + count
+    return trends
+
+
+def get_daily_sentiment_trends(tenant_id=None, start=None, end=None):
+    """
+    Returns {"YYYY-MM-DD": {sentiment: count}} read from the daily rollups.
+    `start` / `end` are inclusive "YYYY-MM-DD" strings.
+    """
+    return _read_rollups(sentiment_daily_col, "date", tenant_id, start, end)
+
+
+def get_hourly_sentiment_trends(tenant_id=None, start=None, end=None):
+    """
+    Returns {"YYYY-MM-DDTHH": {sentiment: count}} read from the hourly rollups.
+    """
+    return _read_rollups(sentiment_hourly_col, "hour", tenant_id, start, end)
+
+
+def backfill_sentiment_rollups(until=None):
+    """
+    Rebuild the rollups from chat_logs for every bucket before `until`
+    (default: start of the current UTC day). Those buckets are recomputed
+    from the logs, which already include live-counted messages, so their
+    counters are overwritten and the job is safe to re-run. `until` is
+    rounded down to midnight, so no daily or hourly bucket that live
+    counting is still writing to is touched.
+
+    Buffered deltas are flushed first: a bucket rebuilt while its deltas were
+    still pending would get them $inc'd on top of a total that already counts
+    them. If some stay pending (the flush failed), `until` is capped at the
+    day of the oldest one.
+    """
+    try:
+        sentiment_rollups.flush()
+    except Exception as e:
+        print(f"[⚠️] Sentiment rollup flush before backfill failed: {e}")
+    oldest = sentiment_rollups.oldest_pending()
+    until = min(until or datetime.utcnow(), oldest) if oldest else (until or datetime.utcnow())
+    until = until.replace(hour=0, minute=0, second=0, microsecond=0)
     pipeline = [
+        {"$match": {"timestamp": {"$lt": until}}},
         {
             "$group": {
                 "_id": {
-                    "date": {
-                        "$dateToString": {"format": "%Y-%m-%d", "date": "$timestamp"}
-                    },
+                    "tenant_id": {"$ifNull": ["$tenant_id", DEFAULT_TENANT]},
+                    "hour": {"$dateToString": {"format": "%Y-%m-%dT%H", "date": "$timestamp"}},
                     "sentiment": "$sentiment"
                 },
                 "count": {"$sum": 1}
             }
-        },
-        {
-            "$sort": {"_id.date": 1}
         }
     ]
 
-    results = chat_logs_col.aggregate(pipeline)
+    hourly, daily = {}, {}
+    for doc in chat_logs_col.aggregate(pipeline, allowDiskUse=True):
+        tenant_id = doc["_id"]["tenant_id"]
+        hour = doc["_id"]["hour"]
+        sentiment = _sentiment_key(doc["_id"]["sentiment"])
+        for rollup, key in ((hourly, (tenant_id, hour)), (daily, (tenant_id, hour[:10]))):
+            counts = rollup.setdefault(key, {})
+            counts[sentiment] = counts.get(sentiment, 0) + doc["count"]
 
-    trends = {}
-    for doc in results:
-        date = doc["_id"]["date"]
-        sentiment = doc["_id"]["sentiment"]
-        count = doc["count"]
-        if date not in trends:
-            trends[date] = {}
-        trends[date][sentiment] = count
+    for collection, field, rollup in ((sentiment_hourly_col, "hour", hourly), (sentiment_daily_col, "date", daily)):
+        ops = [
+            UpdateOne(
+                {"tenant_id": tenant_id, field: bucket},
+                {"$set": {"counts": counts, "total": sum(counts.values())}},
+                upsert=True
+            )
+            for (tenant_id, bucket), counts in rollup.items()
+        ]
+        if ops:
+            collection.bulk_write(ops, ordered=False)
+
+    return {"until": until.isoformat(), "days": len(daily), "hours": len(hourly)}
 
-    return trends
 
 if __name__ == "__main__":
-    trends = get_daily_sentiment_trends()
-    for date, sentiment_counts in trends.items():
-        print(f"{date}: {sentiment_counts}")
+    if len(sys.argv) > 1 and sys.argv[1] == "backfill":
+        print(f"✅ Rollups rebuilt: {backfill_sentiment_rollups()}")
+    else:
+        trends = get_daily_sentiment_trends()
+        for date, sentiment_counts in trends.items():
+            print(f"{date}: {sentiment_counts}")
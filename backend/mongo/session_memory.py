@@ -0,0 +1,85 @@
+# mongo/session_memory.py
+
+import json
+import os
+import threading
+from collections import OrderedDict
+
+from langchain_community.chat_message_histories import RedisChatMessageHistory
+from langchain.memory import ConversationBufferMemory
+from langchain_core.messages import message_to_dict
+
+SESSION_MEMORY_CACHE_SIZE = int(os.getenv("SESSION_MEMORY_CACHE_SIZE", 1024))  # sessions kept in-process
+
+
+class PooledRedisChatMessageHistory(RedisChatMessageHistory):
+    """
+    RedisChatMessageHistory that borrows a shared Redis client instead of
+    opening its own connection, and writes a turn's messages in one round
+    trip. Reads always go to Redis, so every worker process sees the same
+    history.
+    """
+
+    def __init__(self, session_id, redis_client, key_prefix="message_store:", ttl=None):
+        # The parent builds a client from its URL; redis-py connects lazily,
+        # so swapping in the pooled client before first use opens nothing
+        super().__init__(session_id=session_id, key_prefix=key_prefix, ttl=ttl)
+        self.redis_client = redis_client
+
+    def queue_messages(self, pipe, messages):
+        """Add the writes for `messages` to an existing pipeline."""
+        for message in messages:
+            pipe.lpush(self.key, json.dumps(message_to_dict(message)))
+        if messages and self.ttl:
+            pipe.expire(self.key, self.ttl)
+
+    def add_messages(self, messages):
+        """Write several messages with one pipelined round trip."""
+        if not messages:
+            return
+        pipe = self.redis_client.pipeline(transaction=False)
+        self.queue_messages(pipe, messages)
+        pipe.execute()
+
+    def add_message(self, message):
+        self.add_messages([message])
+
+
+class SessionMemoryManager:
+    """
+    Hands out one ConversationBufferMemory per session, all backed by the same
+    pooled Redis client. Least recently used sessions are evicted once
+    `max_sessions` is reached; evicted sessions simply reload from Redis.
+    """
+
+    def __init__(self, redis_client, max_sessions=SESSION_MEMORY_CACHE_SIZE, ttl=None):
+        self.redis_client = redis_client
+        self.max_sessions = max_sessions
+        self.ttl = ttl
+        self._memories = OrderedDict()
+        self._lock = threading.Lock()
+
+    def get(self, session_id):
+        with self._lock:
+            memory = self._memories.get(session_id)
+            if memory is not None:
+                self._memories.move_to_end(session_id)
+                return memory
+
+            chat_history = PooledRedisChatMessageHistory(
+                session_id=session_id,
+                redis_client=self.redis_client,
+                ttl=self.ttl
+            )
+            memory = ConversationBufferMemory(chat_memory=chat_history, return_messages=False)
+            self._memories[session_id] = memory
+            if len(self._memories) > self.max_sessions:
+                self._memories.popitem(last=False)
+            return memory
+
+    def evict(self, session_id):
+        with self._lock:
+            self._memories.pop(session_id, None)
+
+    def __len__(self):
+        return len(self._memories)
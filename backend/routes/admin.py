@@ -1,9 +1,12 @@
 # backend/routes/admin.py
 
-from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status
+from fastapi import APIRouter, UploadFile, File, Depends, HTTPException, status, Query
 from fastapi.responses import JSONResponse
+from starlette.concurrency import run_in_threadpool
 import os
-from shutil import copyfileobj
+from pathlib import Path
+from services.analytics import analytics, ANALYTICS_WINDOW_HOURS
+from utils.blob_store import blob_store, blob_key, KB_NAMESPACE
 
 admin_router = APIRouter()
 
@@ -12,20 +15,22 @@ os.makedirs(UPLOAD_DIR, exist_ok=True)
 
 @admin_router.post("/upload-kb")
 async def upload_kb(file: UploadFile = File(...)):
-    file_path = os.path.join(UPLOAD_DIR, file.filename)
-    with open(file_path, "wb") as buffer:
-        copyfileobj(file.file, buffer)
-    return {"status": "success", "filename": file.filename}
+    filename = Path(file.filename).name
+    # Catalog calls and the file copy block; they run in the threadpool
+    previous = await run_in_threadpool(blob_store.resolve, KB_NAMESPACE, filename)
+    digest, blob_path, size, _ = await blob_store.put_upload(file)
+    key = blob_key(digest, Path(filename).suffix)
+    await run_in_threadpool(blob_store.register, KB_NAMESPACE, filename, key, size)
+    # Unchanged content keeps the existing file (and the cached KB matrix keyed on it)
+    if previous != key or not os.path.exists(os.path.join(UPLOAD_DIR, filename)):
+        await run_in_threadpool(blob_store.materialize, blob_path, Path(UPLOAD_DIR) / filename)
+    return {"status": "success", "filename": filename, "sha256": digest, "unchanged": previous == key}
 
 
 
 @admin_router.get("/analytics")
-def get_analytics():
-    return {
-        "response_time": 450,
-        "unresolved_count": 8,
-        "sentiment_avg": "positive"
-    }
+def get_analytics(hours: int = Query(ANALYTICS_WINDOW_HOURS, ge=1, le=24 * 31)):
+    return analytics.snapshot(hours)
 
 
 
@@ -1,6 +1,7 @@
-from fastapi import APIRouter, HTTPException, Body
+from fastapi import APIRouter, HTTPException, Body, Query
 from pydantic import BaseModel
-from mongo.chat_sessions import create_chat_session, store_message, get_chat_history
+from typing import Optional
+from mongo.chat_sessions import create_chat_session, store_message, get_chat_history, get_chat_history_page
 import json
 from datetime import datetime
 
@@ -31,16 +32,10 @@ def add_message(request: ChatMessageRequest):
     return {"status": "success"}
 
 @router.get('/chat/history/{session_id}')
-def get_history(session_id: str):
+def get_history(session_id: str, limit: int = Query(50, ge=1, le=500), cursor: Optional[int] = Query(None, ge=1)):
     try:
-        # Return simple test data for now to ensure endpoint works
-        return {
-            "history": [
-                {"sender": "bot", "message": "Welcome to AppGallop! ✨", "timestamp": "2025-07-23T11:00:00"},
-                {"sender": "user", "message": "Hello", "timestamp": "2025-07-23T11:01:00"},
-                {"sender": "bot", "message": "Hi there! How can I help you?", "timestamp": "2025-07-23T11:01:30"}
-            ]
-        }
+        page = get_chat_history_page(session_id, limit=limit, cursor=cursor)
+        return {"history": page["messages"], "next_cursor": page["next_cursor"]}
     except Exception as e:
         print(f"Error getting chat history: {e}")
-        return {"history": []}
+        return {"history": [], "next_cursor": None}
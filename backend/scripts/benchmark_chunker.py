@@ -0,0 +1,92 @@
+import os
+import sys
+import time
+import random
+import argparse
+
+import faiss
+import numpy as np
+from nltk.tokenize import sent_tokenize
+from sentence_transformers import SentenceTransformer
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from utils.chunker import chunk_text, MAX_TOKENS
+
+# Compare the token-aware chunker with the old character-count splitter:
+#   python scripts/benchmark_chunker.py path/to/manual.txt --queries 200
+
+
+def legacy_chunk_text(text, chunk_size=500):
+    # Previous utils/embed_store.chunk_text, kept here as the baseline
+    sentences = sent_tokenize(text)
+    chunks = []
+    current = ""
+    for sentence in sentences:
+        if len(current) + len(sentence) <= chunk_size:
+            current += sentence + " "
+        else:
+            chunks.append(current.strip())
+            current = sentence + " "
+    if current:
+        chunks.append(current.strip())
+    return chunks
+
+
+def time_chunker(name, fn, text, repeats):
+    start = time.perf_counter()
+    for _ in range(repeats):
+        chunks = fn(text)
+    elapsed = (time.perf_counter() - start) / repeats
+    mb = len(text.encode("utf-8")) / (1024 * 1024)
+    print(f"[⏱️] {name:<8} {len(chunks):>6} chunks  {elapsed * 1000:8.1f} ms  {mb / elapsed:8.2f} MB/s")
+    return chunks
+
+
+def truncation_stats(name, chunks, tokenizer):
+    lengths = [len(ids) for ids in tokenizer(chunks, add_special_tokens=False)["input_ids"]]
+    over = [l for l in lengths if l > MAX_TOKENS]
+    lost = sum(l - MAX_TOKENS for l in over)
+    print(f"[✂️] {name:<8} {len(over)} chunks over {MAX_TOKENS} tokens, {lost} tokens silently truncated "
+          f"({lost / max(sum(lengths), 1):.1%})")
+
+
+def recall_at_k(name, chunks, queries, model, k):
+    vectors = model.encode(chunks, batch_size=64, normalize_embeddings=True, convert_to_numpy=True)
+    index = faiss.IndexFlatIP(vectors.shape[1])
+    index.add(vectors.astype(np.float32))
+    query_vectors = model.encode(queries, batch_size=64, normalize_embeddings=True, convert_to_numpy=True)
+    _, ids = index.search(query_vectors.astype(np.float32), k)
+    hits = sum(any(q in chunks[i] for i in row if i >= 0) for q, row in zip(queries, ids))
+    print(f"[🎯] {name:<8} recall@{k}: {hits / len(queries):.3f}")
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Benchmark chunking throughput and retrieval quality")
+    parser.add_argument("path", help="Plain-text document to chunk")
+    parser.add_argument("--queries", type=int, default=100, help="Sentences sampled as queries")
+    parser.add_argument("--k", type=int, default=3)
+    parser.add_argument("--repeats", type=int, default=3)
+    args = parser.parse_args()
+
+    with open(args.path, "r", encoding="utf-8") as f:
+        text = f.read()
+
+    model = SentenceTransformer("all-MiniLM-L6-v2")
+    tokenizer = model.tokenizer
+
+    legacy = time_chunker("legacy", legacy_chunk_text, text, args.repeats)
+    token = time_chunker("token", lambda t: chunk_text(t, tokenizer), text, args.repeats)
+
+    truncation_stats("legacy", legacy, tokenizer)
+    truncation_stats("token", token, tokenizer)
+
+    # Queries are real sentences; a hit means a retrieved chunk contains it
+    sentences = [s for s in sent_tokenize(text) if len(s.split()) >= 5]
+    random.seed(0)
+    queries = random.sample(sentences, min(args.queries, len(sentences)))
+    recall_at_k("legacy", legacy, queries, model, args.k)
+    recall_at_k("token", token, queries, model, args.k)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,117 @@
+import os
+import sys
+import time
+import json
+import argparse
+import multiprocessing as mp
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+
+# fp32 vs int8 vs bf16 for a causal LM on CPU: load time, memory, tokens/sec
+# and drift of greedy answers / perplexity against fp32:
+#   python scripts/benchmark_quantization.py --model vector_stores/falcon-rw-1b
+
+PROMPTS = [
+    "Context:\nOrders can be cancelled within 24 hours from the Orders page.\n\nUser: How do I cancel my order?\nAI:",
+    "Context:\nPasswords are reset from Settings > Security > Reset password.\n\nUser: I forgot my password\nAI:",
+    "Context:\nRefunds are issued to the original payment method within 5-7 business days.\n\nUser: When will I get my refund?\nAI:",
+    "<s>Customer: My smart plug does not connect to wifi\nAgent:",
+]
+
+REFERENCE_TEXT = (
+    "Thank you for contacting support. To update your billing details, open the account menu, "
+    "choose Billing, and select Edit payment method. Changes apply to your next invoice."
+)
+
+
+def rss_mb():
+    with open("/proc/self/status") as f:
+        for line in f:
+            if line.startswith("VmRSS:"):
+                return int(line.split()[1]) / 1024
+    return None
+
+
+def run_mode(model_path, precision, max_new_tokens, threads, out):
+    # One process per mode so memory numbers are not polluted by the others
+    import torch
+    from services.llm_loader import load_causal_lm
+
+    if threads:
+        torch.set_num_threads(threads)
+    base_rss = rss_mb()
+    start = time.perf_counter()
+    tokenizer, model = load_causal_lm(model_path, precision)
+    load_s = time.perf_counter() - start
+    model_rss = rss_mb() - base_rss
+
+    answers, new_tokens, gen_s = [], 0, 0.0
+    with torch.no_grad():
+        for prompt in PROMPTS:
+            inputs = tokenizer(prompt, return_tensors="pt")
+            start = time.perf_counter()
+            output = model.generate(**inputs, max_new_tokens=max_new_tokens, do_sample=False,
+                                    pad_token_id=tokenizer.eos_token_id)
+            gen_s += time.perf_counter() - start
+            generated = output[0][inputs["input_ids"].shape[1]:]
+            new_tokens += len(generated)
+            answers.append(generated.tolist())
+
+        ids = tokenizer(REFERENCE_TEXT, return_tensors="pt")["input_ids"]
+        loss = model(input_ids=ids, labels=ids).loss.float().item()
+
+    out.put({
+        "precision": precision,
+        "load_s": round(load_s, 2),
+        "model_rss_mb": round(model_rss, 1),
+        "peak_rss_mb": round(rss_mb(), 1),
+        "tokens_per_s": round(new_tokens / gen_s, 2) if gen_s else None,
+        "perplexity": round(float(torch.exp(torch.tensor(loss))), 3),
+        "answers": answers,
+    })
+
+
+def token_agreement(reference, candidate):
+    # Share of reference tokens matched before the first divergence
+    matched = 0
+    for a, b in zip(reference, candidate):
+        if a != b:
+            break
+        matched += 1
+    return matched / max(len(reference), 1)
+
+
+def main():
+    from config import OUTPUT_DIR
+    parser = argparse.ArgumentParser(description="Benchmark quantized causal LM inference")
+    parser.add_argument("--model", default=OUTPUT_DIR if os.path.exists(OUTPUT_DIR) else "tiiuae/falcon-rw-1b")
+    parser.add_argument("--modes", default="fp32,int8,bf16")
+    parser.add_argument("--max-new-tokens", type=int, default=48)
+    parser.add_argument("--threads", type=int, default=0)
+    args = parser.parse_args()
+
+    ctx = mp.get_context("spawn")
+    results = []
+    for precision in args.modes.split(","):
+        out = ctx.Queue()
+        proc = ctx.Process(target=run_mode, args=(args.model, precision, args.max_new_tokens, args.threads, out))
+        proc.start()
+        result = out.get()
+        proc.join()
+        results.append(result)
+        print(f"[⏱️] {result['precision']} done")
+
+    baseline = next((r for r in results if r["precision"] == "fp32"), results[0])
+    print(f"\n[📄] {args.model}, {len(PROMPTS)} prompts, {args.max_new_tokens} new tokens, greedy")
+    print(f"{'mode':<6} {'load s':>7} {'model MB':>9} {'tok/s':>7} {'ppl':>8} {'exact':>6} {'prefix':>7}")
+    for r in results:
+        # "bf16" may have fallen back to fp32 on CPUs without bf16 support
+        exact = sum(a == b for a, b in zip(baseline["answers"], r["answers"])) / len(PROMPTS)
+        prefix = sum(token_agreement(a, b) for a, b in zip(baseline["answers"], r["answers"])) / len(PROMPTS)
+        print(f"{r['precision']:<6} {r['load_s']:>7} {r['model_rss_mb']:>9} {r['tokens_per_s']:>7} "
+              f"{r['perplexity']:>8} {exact:>6.0%} {prefix:>7.0%}")
+    print(json.dumps([{k: v for k, v in r.items() if k != "answers"} for r in results], indent=2))
+
+
+if __name__ == "__main__":
+    main()
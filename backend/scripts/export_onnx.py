@@ -0,0 +1,176 @@
+import os
+import sys
+import json
+import time
+import argparse
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from services.onnx_backend import (
+    MODEL_FILE, QUANTIZED_MODEL_FILE, META_FILE,
+    onnx_dir_for, OnnxSentenceEncoder, OnnxTextClassifier,
+)
+from services.model_registry import EMBED_MODEL_NAME, SENTIMENT_MODEL_NAME
+
+# Export the embedder and the sentiment classifier to ONNX, optionally add
+# int8-quantized copies, then check parity and latency against PyTorch:
+#   python scripts/export_onnx.py --quantize
+#   ENCODER_BACKEND=onnx uvicorn main:app
+
+PARITY_TEXTS = [
+    "How do I reset my password?",
+    "The app keeps crashing every time I open the billing page, this is unacceptable.",
+    "Thanks, that fixed it!",
+    "I was charged twice for the same order and nobody answers my emails.",
+    "Can I change the delivery address after the order has shipped?",
+    "ok",
+    "The smart plug connects to wifi but drops off after a few minutes, I've tried resetting it three times "
+    "and updating the firmware, still the same problem.",
+]
+
+OPSET = 17
+# fp32 export should match PyTorch to float precision; int8 is allowed more drift
+TOLERANCE = {"fp32": {"cosine": 0.9999, "prob": 1e-3}, "int8": {"cosine": 0.98, "prob": 0.05}}
+
+
+def export_model(model, dummy, output_path, output_name):
+    import torch
+    input_names = list(dummy.keys())
+    dynamic_axes = {name: {0: "batch", 1: "sequence"} for name in input_names}
+    dynamic_axes[output_name] = {0: "batch"} if output_name == "logits" else {0: "batch", 1: "sequence"}
+    model.eval()
+    with torch.no_grad():
+        torch.onnx.export(
+            model, (dict(dummy),), str(output_path),
+            input_names=input_names, output_names=[output_name],
+            dynamic_axes=dynamic_axes, opset_version=OPSET, do_constant_folding=True,
+        )
+
+
+def quantize(model_dir):
+    from onnxruntime.quantization import quantize_dynamic, QuantType
+    quantize_dynamic(str(model_dir / MODEL_FILE), str(model_dir / QUANTIZED_MODEL_FILE), weight_type=QuantType.QInt8)
+
+
+def export_embedder(name):
+    from sentence_transformers import SentenceTransformer
+    st = SentenceTransformer(name)
+    transformer = st[0].auto_model
+    pooling = st[1].get_pooling_mode_str() if len(st) > 1 and hasattr(st[1], "get_pooling_mode_str") else "mean"
+    if pooling not in ("mean", "cls"):
+        raise ValueError(f"Unsupported pooling mode for ONNX export: {pooling}")
+
+    model_dir = onnx_dir_for(name)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    dummy = st.tokenizer(["export"], return_tensors="pt")
+    export_model(transformer, dummy, model_dir / MODEL_FILE, "last_hidden_state")
+    st.tokenizer.save_pretrained(model_dir)
+    with open(model_dir / META_FILE, "w") as f:
+        json.dump({
+            "source": name,
+            "kind": "sentence_encoder",
+            "pooling": pooling,
+            "normalize": any(type(m).__name__ == "Normalize" for m in st),
+            "max_length": st.max_seq_length,
+            "dim": st.get_sentence_embedding_dimension(),
+        }, f, indent=2)
+    return st, model_dir
+
+
+def export_classifier(name):
+    from transformers import AutoTokenizer, AutoModelForSequenceClassification
+    tokenizer = AutoTokenizer.from_pretrained(name)
+    model = AutoModelForSequenceClassification.from_pretrained(name)
+
+    model_dir = onnx_dir_for(name)
+    model_dir.mkdir(parents=True, exist_ok=True)
+    dummy = tokenizer(["export"], return_tensors="pt")
+    export_model(model, dummy, model_dir / MODEL_FILE, "logits")
+    tokenizer.save_pretrained(model_dir)
+    with open(model_dir / META_FILE, "w") as f:
+        json.dump({
+            "source": name,
+            "kind": "text_classifier",
+            "id2label": {str(k): v for k, v in model.config.id2label.items()},
+            "max_length": tokenizer.model_max_length if tokenizer.model_max_length < 100_000 else 512,
+        }, f, indent=2)
+    return (tokenizer, model), model_dir
+
+
+def timed(fn, repeats):
+    fn()  # warm-up
+    start = time.perf_counter()
+    for _ in range(repeats):
+        fn()
+    return (time.perf_counter() - start) / repeats * 1000
+
+
+def check_embedder(st, model_dir, variant, repeats):
+    onnx_model = OnnxSentenceEncoder(model_dir, quantized=(variant == "int8"))
+    reference = st.encode(PARITY_TEXTS, convert_to_numpy=True)
+    candidate = onnx_model.encode(PARITY_TEXTS)
+    cosine = np.sum(reference * candidate, axis=1) / (
+        np.linalg.norm(reference, axis=1) * np.linalg.norm(candidate, axis=1))
+    torch_ms = timed(lambda: st.encode(PARITY_TEXTS), repeats)
+    onnx_ms = timed(lambda: onnx_model.encode(PARITY_TEXTS), repeats)
+    ok = cosine.min() >= TOLERANCE[variant]["cosine"]
+    print(f"[{'✅' if ok else '❌'}] embedder {variant}: min cosine {cosine.min():.5f}, "
+          f"max |diff| {np.abs(reference - candidate).max():.2e}, "
+          f"{torch_ms:.1f} ms torch vs {onnx_ms:.1f} ms onnx ({torch_ms / onnx_ms:.1f}x)")
+    return ok
+
+
+def check_classifier(hf, model_dir, variant, repeats):
+    import torch
+    tokenizer, model = hf
+    onnx_model = OnnxTextClassifier(model_dir, quantized=(variant == "int8"))
+
+    def torch_classify():
+        with torch.no_grad():
+            encoded = tokenizer(PARITY_TEXTS, padding=True, truncation=True, return_tensors="pt")
+            return torch.softmax(model(**encoded).logits, dim=-1).numpy()
+
+    reference = torch_classify()
+    candidate = onnx_model(PARITY_TEXTS)
+    labels = [model.config.id2label[int(i)] for i in reference.argmax(axis=1)]
+    agree = sum(a == c["label"] for a, c in zip(labels, candidate)) / len(labels)
+    prob_diff = max(abs(float(reference[i].max()) - c["score"]) for i, c in enumerate(candidate))
+    torch_ms = timed(torch_classify, repeats)
+    onnx_ms = timed(lambda: onnx_model(PARITY_TEXTS), repeats)
+    ok = agree == 1.0 and prob_diff <= TOLERANCE[variant]["prob"]
+    print(f"[{'✅' if ok else '❌'}] sentiment {variant}: label agreement {agree:.0%}, max prob diff {prob_diff:.2e}, "
+          f"{torch_ms:.1f} ms torch vs {onnx_ms:.1f} ms onnx ({torch_ms / onnx_ms:.1f}x)")
+    return ok
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Export MiniLM and the sentiment model to ONNX")
+    parser.add_argument("--embedder", default=EMBED_MODEL_NAME)
+    parser.add_argument("--classifier", default=SENTIMENT_MODEL_NAME)
+    parser.add_argument("--quantize", action="store_true", help="Also write int8 dynamic-quantized models")
+    parser.add_argument("--skip-check", action="store_true")
+    parser.add_argument("--repeats", type=int, default=20)
+    args = parser.parse_args()
+
+    st, embedder_dir = export_embedder(args.embedder)
+    hf, classifier_dir = export_classifier(args.classifier)
+    variants = ["fp32"]
+    if args.quantize:
+        quantize(embedder_dir)
+        quantize(classifier_dir)
+        variants.append("int8")
+    print(f"[📦] Exported to {embedder_dir} and {classifier_dir}")
+
+    if args.skip_check:
+        return
+    ok = True
+    for variant in variants:
+        ok &= check_embedder(st, embedder_dir, variant, args.repeats)
+        ok &= check_classifier(hf, classifier_dir, variant, args.repeats)
+    if not ok:
+        sys.exit("❌ ONNX outputs drifted beyond tolerance from PyTorch")
+
+
+if __name__ == "__main__":
+    main()
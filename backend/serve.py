@@ -0,0 +1,187 @@
+# serve.py
+#
+# Preforking server: model weights are loaded once in the parent, then worker
+# processes are forked and share them copy-on-write. With plain
+# `uvicorn --workers N` each worker loads its own copy instead.
+#
+# Only fork-safe state is built before the fork. The parent loads with one
+# intra-op thread, so no OpenMP pool exists to be inherited (int8 quantisation
+# and bf16 casts run torch kernels); ONNX Runtime sessions, which start their
+# own thread pools, and the app with its Mongo clients are created in each
+# worker after the fork.
+#
+#   MODEL_WARMUP=all python serve.py --workers 4 --port 8000
+#
+# Linux/macOS only (needs os.fork).
+
+import argparse
+import gc
+import os
+import signal
+import socket
+import sys
+import time
+
+import uvicorn
+
+from services.model_registry import model_registry, warmup_names, ENCODER_BACKEND
+
+# Models whose ONNX Runtime sessions must not cross a fork
+ONNX_MODELS = ("embedder", "sentiment_classifier")
+# Pause before replacing a dead worker, so one that fails at import does not spin
+RESTART_DELAY_SECONDS = 1
+
+
+def bind_socket(host, port, backlog=2048):
+    sock = socket.socket(socket.AF_INET6 if ":" in host else socket.AF_INET, socket.SOCK_STREAM)
+    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
+    sock.bind((host, port))
+    sock.listen(backlog)
+    sock.set_inheritable(True)
+    return sock
+
+
+def memory_breakdown(pid):
+    """
+    Shared vs private resident memory (MB) of a process, from smaps_rollup.
+    Model weights inherited from the parent show up as shared.
+    """
+    fields = {}
+    try:
+        with open(f"/proc/{pid}/smaps_rollup") as f:
+            for line in f:
+                parts = line.split()
+                if len(parts) >= 2 and parts[1].isdigit():
+                    fields[parts[0].rstrip(":")] = int(parts[1]) / 1024
+    except OSError:
+        return None
+    return {
+        "rss_mb": round(fields.get("Rss", 0), 1),
+        "pss_mb": round(fields.get("Pss", 0), 1),
+        "shared_mb": round(fields.get("Shared_Clean", 0) + fields.get("Shared_Dirty", 0), 1),
+        "private_mb": round(fields.get("Private_Clean", 0) + fields.get("Private_Dirty", 0), 1),
+    }
+
+
+def split_preload(names):
+    """
+    (parent, worker) model names: with ENCODER_BACKEND=onnx the encoders are
+    loaded in each worker, since an ORT session starts its thread pools as
+    soon as it is created.
+    """
+    deferred = ONNX_MODELS if ENCODER_BACKEND == "onnx" else ()
+    return [n for n in names if n not in deferred], [n for n in names if n in deferred]
+
+
+def preload_single_threaded(names):
+    """
+    Load models in the parent with torch limited to one intra-op thread, so
+    the kernels loading runs (quantize_dynamic, dtype casts) never start the
+    OpenMP pool that would deadlock in a forked child. Returns the thread
+    count to restore in the workers.
+    """
+    try:
+        import torch
+    except ImportError:
+        model_registry.warm_up(names)
+        return None
+    threads = torch.get_num_threads()
+    torch.set_num_threads(1)
+    model_registry.warm_up(names)
+    return threads
+
+
+def run_worker(sock, args, worker_models, torch_threads):
+    # The parent loaded with one thread and never started a pool; each worker
+    # sizes and starts its own
+    threads = args.torch_threads or torch_threads
+    if threads:
+        import torch
+        torch.set_num_threads(threads)
+    signal.signal(signal.SIGINT, signal.SIG_DFL)
+    signal.signal(signal.SIGTERM, signal.SIG_DFL)
+    # Importing the app creates its Mongo/Redis clients, so each worker gets its own
+    from main import app
+    model_registry.warm_up(worker_models)
+    config = uvicorn.Config(app, log_level=args.log_level)
+    uvicorn.Server(config).run(sockets=[sock])
+
+
+def spawn(sock, args, worker_models, torch_threads):
+    pid = os.fork()
+    if pid == 0:
+        try:
+            run_worker(sock, args, worker_models, torch_threads)
+        finally:
+            os._exit(0)
+    return pid
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Serve main:app with models shared across forked workers")
+    parser.add_argument("--host", default="0.0.0.0")
+    parser.add_argument("--port", type=int, default=8000)
+    parser.add_argument("--workers", type=int, default=int(os.getenv("WEB_CONCURRENCY", 2)))
+    parser.add_argument("--models", default=None, help='Comma-separated models to preload (default: MODEL_WARMUP, else "all")')
+    parser.add_argument("--torch-threads", type=int, default=int(os.getenv("WORKER_TORCH_THREADS", 0)))
+    parser.add_argument("--log-level", default="info")
+    parser.add_argument("--report-memory", action="store_true", help="Print shared/private memory per worker after start")
+    args = parser.parse_args()
+
+    # Load the models before forking so every worker inherits them
+    names = warmup_names(args.models if args.models is not None else (os.getenv("MODEL_WARMUP") or "all"))
+    parent_models, worker_models = split_preload(names)
+    start = time.perf_counter()
+    torch_threads = preload_single_threaded(parent_models)
+    print(f"[📦] Models loaded in parent in {time.perf_counter() - start:.1f}s: {model_registry.metrics()}")
+    if worker_models:
+        print(f"[📦] Loaded per worker (not fork-safe): {', '.join(worker_models)}")
+
+    # Move everything allocated so far out of the GC's reach: collections would
+    # otherwise write to every object header and un-share those pages
+    gc.collect()
+    gc.freeze()
+
+    sock = bind_socket(args.host, args.port)
+    workers = {spawn(sock, args, worker_models, torch_threads) for _ in range(args.workers)}
+    print(f"[🚀] Serving on {args.host}:{args.port} with {len(workers)} preforked workers (parent pid {os.getpid()})")
+
+    stopping = False
+
+    def stop(signum, frame):
+        nonlocal stopping
+        stopping = True
+        for pid in workers:
+            try:
+                os.kill(pid, signal.SIGTERM)
+            except ProcessLookupError:
+                pass
+
+    signal.signal(signal.SIGINT, stop)
+    signal.signal(signal.SIGTERM, stop)
+
+    if args.report_memory:
+        time.sleep(5)
+        for pid in sorted(workers):
+            print(f"[🧠] worker {pid}: {memory_breakdown(pid)}")
+
+    # Replace workers that die; exit once all are gone after a stop signal
+    while workers:
+        try:
+            pid, status = os.wait()
+        except ChildProcessError:
+            break
+        except InterruptedError:
+            continue
+        workers.discard(pid)
+        if not stopping:
+            print(f"[⚠️] Worker {pid} exited with status {status}, restarting")
+            time.sleep(RESTART_DELAY_SECONDS)
+            workers.add(spawn(sock, args, worker_models, torch_threads))
+
+    sock.close()
+    sys.exit(0)
+
+
+if __name__ == "__main__":
+    main()
@@ -0,0 +1,211 @@
+# services/analytics.py
+
+import asyncio
+import math
+import os
+import threading
+from datetime import datetime, timedelta
+
+from mongo.models import mongo_db
+from mongo.sentiment_trend import flush_sentiment_rollups
+
+ANALYTICS_FLUSH_INTERVAL = float(os.getenv("ANALYTICS_FLUSH_INTERVAL", 10))  # seconds
+
+# Log-spaced latency buckets: each bucket is ~5% wider than the previous one,
+# covering 1 ms .. ~2 min in a fixed number of slots (HDR-style histogram)
+LATENCY_PRECISION = 0.05
+LATENCY_MAX_MS = 120_000
+_LOG_BASE = math.log(1 + LATENCY_PRECISION)
+LATENCY_BUCKETS = int(math.log(LATENCY_MAX_MS) / _LOG_BASE) + 1
+
+SENTIMENT_SCORES = {"positive": 1.0, "neutral": 0.0, "negative": -1.0}
+
+# One document per scope per UTC hour, so the dashboard can show recent activity
+analytics_col = mongo_db["analytics_hourly"]
+ANALYTICS_SCOPE = "global"
+ANALYTICS_WINDOW_HOURS = int(os.getenv("ANALYTICS_WINDOW_HOURS", 24))
+HOUR_FORMAT = "%Y-%m-%dT%H"
+
+
+def latency_bucket(latency_ms):
+    if latency_ms <= 1:
+        return 0
+    return min(int(math.log(latency_ms) / _LOG_BASE), LATENCY_BUCKETS - 1)
+
+
+def bucket_upper_ms(bucket):
+    return (1 + LATENCY_PRECISION) ** (bucket + 1)
+
+
+def percentile_from_histogram(histogram, q):
+    """
+    Returns the latency (ms) at quantile `q` (0..1) from {bucket: count}.
+    Runs over a fixed number of buckets, independent of traffic volume.
+    """
+    total = sum(histogram.values())
+    if not total:
+        return None
+    rank = q * total
+    seen = 0
+    for bucket in sorted(histogram):
+        seen += histogram[bucket]
+        if seen >= rank:
+            return round(bucket_upper_ms(bucket), 1)
+    return round(bucket_upper_ms(max(histogram)), 1)
+
+
+def _empty_delta():
+    return {"latency": {}, "counters": {}, "sentiment_sum": 0.0, "sentiment_count": 0}
+
+
+def _merge_delta(into, delta):
+    for field in ("latency", "counters"):
+        for key, count in delta[field].items():
+            into[field][key] = into[field].get(key, 0) + count
+    into["sentiment_sum"] += delta["sentiment_sum"]
+    into["sentiment_count"] += delta["sentiment_count"]
+
+
+class AnalyticsAggregator:
+    """
+    Collects chat metrics in memory and periodically folds them into one
+    Mongo document per UTC hour with $inc, so many workers can flush into
+    the same counters and the dashboard reads a fixed number of documents.
+    """
+
+    def __init__(self, collection=analytics_col, scope=ANALYTICS_SCOPE):
+        self.collection = collection
+        self.scope = scope
+        self._lock = threading.Lock()
+        self._pending = {}      # hour -> delta
+
+    def _delta(self):
+        # Caller holds the lock
+        hour = datetime.utcnow().strftime(HOUR_FORMAT)
+        delta = self._pending.get(hour)
+        if delta is None:
+            delta = self._pending[hour] = _empty_delta()
+        return delta
+
+    def record_chat(self, latency_ms, sentiment=None, resolved=True):
+        with self._lock:
+            delta = self._delta()
+            bucket = latency_bucket(latency_ms)
+            delta["latency"][bucket] = delta["latency"].get(bucket, 0) + 1
+            outcome = "resolved" if resolved else "unresolved"
+            delta["counters"][outcome] = delta["counters"].get(outcome, 0) + 1
+            if sentiment in SENTIMENT_SCORES:
+                delta["sentiment_sum"] += SENTIMENT_SCORES[sentiment]
+                delta["sentiment_count"] += 1
+
+    def record_outcome(self, outcome, count=1):
+        with self._lock:
+            counters = self._delta()["counters"]
+            counters[outcome] = counters.get(outcome, 0) + count
+
+    def flush(self):
+        """
+        Push pending deltas to Mongo. Deltas are swapped out under the lock
+        and written outside it, so recording never waits on the network;
+        a delta whose write fails is merged back and retried next flush.
+        """
+        with self._lock:
+            pending, self._pending = self._pending, {}
+
+        flushed, error = False, None
+        for hour, delta in pending.items():
+            inc = {f"latency.{bucket}": count for bucket, count in delta["latency"].items()}
+            inc.update({f"counters.{name}": count for name, count in delta["counters"].items()})
+            if delta["sentiment_count"]:
+                inc["sentiment_sum"] = delta["sentiment_sum"]
+                inc["sentiment_count"] = delta["sentiment_count"]
+            if not inc:
+                continue
+            try:
+                self.collection.update_one(
+                    {"_id": f"{self.scope}:{hour}"},
+                    {
+                        "$inc": inc,
+                        "$set": {"updated_at": datetime.utcnow()},
+                        "$setOnInsert": {"scope": self.scope, "hour": hour},
+                    },
+                    upsert=True
+                )
+                flushed = True
+            except Exception as e:
+                with self._lock:
+                    _merge_delta(self._pending.setdefault(hour, _empty_delta()), delta)
+                error = e
+        if error:
+            raise error
+        return flushed
+
+    def snapshot(self, hours=ANALYTICS_WINDOW_HOURS):
+        """
+        Dashboard numbers for the last `hours` UTC hours (current one included),
+        merged from at most `hours` hourly documents.
+        """
+        since = (datetime.utcnow() - timedelta(hours=hours - 1)).strftime(HOUR_FORMAT)
+        totals = _empty_delta()
+        updated_at = None
+        for doc in self.collection.find({"_id": {"$gte": f"{self.scope}:{since}", "$lte": f"{self.scope}:~"}}):
+            _merge_delta(totals, {
+                "latency": doc.get("latency", {}),
+                "counters": doc.get("counters", {}),
+                "sentiment_sum": doc.get("sentiment_sum", 0.0),
+                "sentiment_count": doc.get("sentiment_count", 0),
+            })
+            if doc.get("updated_at") and (updated_at is None or doc["updated_at"] > updated_at):
+                updated_at = doc["updated_at"]
+
+        histogram = {int(bucket): count for bucket, count in totals["latency"].items()}
+        counters = totals["counters"]
+
+        sentiment_count = totals["sentiment_count"]
+        sentiment_score = totals["sentiment_sum"] / sentiment_count if sentiment_count else 0.0
+        if sentiment_score > 0.2:
+            sentiment_avg = "positive"
+        elif sentiment_score < -0.2:
+            sentiment_avg = "negative"
+        else:
+            sentiment_avg = "neutral"
+
+        return {
+            "window_hours": hours,
+            "response_time": percentile_from_histogram(histogram, 0.5),
+            "response_time_percentiles": {
+                "p50": percentile_from_histogram(histogram, 0.5),
+                "p90": percentile_from_histogram(histogram, 0.9),
+                "p99": percentile_from_histogram(histogram, 0.99),
+            },
+            "unresolved_count": counters.get("unresolved", 0) + counters.get("ticket", 0),
+            "sentiment_avg": sentiment_avg,
+            "sentiment_score": round(sentiment_score, 3),
+            "updated_at": updated_at,
+        }
+
+
+analytics = AnalyticsAggregator()
+
+
+async def run_analytics_flusher(interval=ANALYTICS_FLUSH_INTERVAL, stop=None):
+    """
+    Background task: flush aggregates and sentiment rollups every `interval`
+    seconds. Setting `stop` (an asyncio.Event) ends the task after one last
+    flush; a flush already running in its thread is finished first, so the
+    final one never overlaps it.
+    """
+    stop = stop or asyncio.Event()
+    while not stop.is_set():
+        try:
+            await asyncio.wait_for(stop.wait(), interval)
+        except asyncio.TimeoutError:
+            pass
+        try:
+            await asyncio.to_thread(analytics.flush)
+        except Exception as e:
+            print(f"❌ Analytics flush failed: {e}")
+        try:
+            await asyncio.to_thread(flush_sentiment_rollups)
+        except Exception as e:
+            print(f"❌ Sentiment rollup flush failed: {e}")
@@ -0,0 +1,118 @@
+# services/batching.py
+
+import asyncio
+from abc import ABC, abstractmethod
+from collections import OrderedDict
+
+
+class LRUCache:
+    def __init__(self, max_size):
+        self.max_size = max_size
+        self._items = OrderedDict()
+
+    def get(self, key):
+        value = self._items.get(key)
+        if value is not None:
+            self._items.move_to_end(key)
+        return value
+
+    def put(self, key, value):
+        if self.max_size <= 0:
+            return
+        self._items[key] = value
+        self._items.move_to_end(key)
+        while len(self._items) > self.max_size:
+            self._items.popitem(last=False)
+
+
+def cache_key(text: str) -> str:
+    return " ".join(text.split())
+
+
+class CoalescingBatcher(ABC):
+    """
+    Async micro-batcher keyed on normalised text. Requests arriving within
+    `batch_wait_ms` go into one `process_batch` call, identical keys share a
+    single in-flight request, and results are kept in an LRU cache.
+    Subclasses implement `async process_batch(keys) -> results`.
+    """
+
+    def __init__(self, batch_max, batch_wait_ms, cache_size):
+        self.batch_max = batch_max
+        self.batch_wait = batch_wait_ms / 1000
+        self.cache = LRUCache(cache_size)
+        self._pending = {}      # key -> future, queued or in flight
+        self._queue = []
+        self._flush_handle = None
+
+    @abstractmethod
+    async def process_batch(self, keys):
+        """
+        One result per key, in order.
+        """
+
+    async def submit_many(self, texts) -> list:
+        keys = [cache_key(t) for t in texts]
+        results, waiting = {}, {}
+        for key in keys:
+            if key in results or key in waiting:
+                continue
+            cached = self.cache.get(key)
+            if cached is not None:
+                results[key] = cached
+                continue
+            future = self._pending.get(key)
+            if future is None:
+                future = self._pending[key] = asyncio.get_running_loop().create_future()
+                self._queue.append(key)
+            waiting[key] = future
+        if self._queue:
+            self._schedule_flush()
+        # shield: one caller being cancelled must not fail the others sharing the request;
+        # every future is collected so a failed batch leaves no exception unretrieved
+        values = await asyncio.gather(*(asyncio.shield(f) for f in waiting.values()), return_exceptions=True)
+        for key, value in zip(waiting, values):
+            if isinstance(value, BaseException):
+                raise value
+            results[key] = value
+        return [results[key] for key in keys]
+
+    async def submit(self, text):
+        return (await self.submit_many([text]))[0]
+
+    def _schedule_flush(self):
+        if len(self._queue) >= self.batch_max:
+            self._start_flush()
+        elif self._flush_handle is None:
+            self._flush_handle = asyncio.get_running_loop().call_later(self.batch_wait, self._start_flush)
+
+    def _start_flush(self):
+        if self._flush_handle is not None:
+            self._flush_handle.cancel()
+            self._flush_handle = None
+        while self._queue:
+            batch, self._queue = self._queue[:self.batch_max], self._queue[self.batch_max:]
+            asyncio.ensure_future(self._run_batch(batch))
+
+    async def _run_batch(self, batch):
+        error = None
+        try:
+            values = await self.process_batch(batch)
+            if len(values) != len(batch):
+                raise RuntimeError(f"process_batch returned {len(values)} results for {len(batch)} keys")
+            for key, value in zip(batch, values):
+                self.cache.put(key, value)
+                future = self._pending.pop(key, None)
+                if future and not future.done():
+                    future.set_result(value)
+        except asyncio.CancelledError:
+            error = RuntimeError("Batch was cancelled")
+            raise
+        except Exception as e:
+            error = e
+        finally:
+            # Nothing may be left waiting on a future this batch owned
+            for key in batch:
+                future = self._pending.pop(key, None)
+                if future and not future.done():
+                    future.set_exception(error or RuntimeError("Batch ended without a result"))
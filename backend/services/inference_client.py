@@ -0,0 +1,191 @@
+# services/inference_client.py
+#
+# API-side access to inference. With INFERENCE_SOCKET set, requests go to the
+# inference daemon (services/inference_server.py) over its Unix socket;
+# otherwise the same model calls run in-process on a worker thread, so the
+# event loop is never blocked either way.
+
+import asyncio
+import itertools
+import os
+import threading
+
+import numpy as np
+
+from services import inference_protocol as proto
+from services.inference_protocol import PRIORITY_HIGH, PRIORITY_NORMAL, PRIORITY_LOW
+
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET")
+
+
+class InferenceError(RuntimeError):
+    pass
+
+
+class InferenceClient:
+    """
+    One multiplexed connection per event loop. Each request gets an id; the
+    reader task resolves the matching future. Cancelling the awaiting task
+    sends a CANCEL frame so the daemon drops or stops the work.
+    """
+
+    def __init__(self, socket_path):
+        self.socket_path = socket_path
+        self._ids = itertools.count(1)
+        self._pending = {}
+        self._writer = None
+        self._reader_task = None
+        self._connect_lock = asyncio.Lock()
+        self._write_lock = asyncio.Lock()
+
+    async def _ensure_connected(self):
+        if self._writer is not None and not self._writer.is_closing():
+            return
+        async with self._connect_lock:
+            if self._writer is not None and not self._writer.is_closing():
+                return
+            reader, self._writer = await asyncio.open_unix_connection(self.socket_path)
+            self._reader_task = asyncio.create_task(self._read_loop(reader))
+
+    async def _read_loop(self, reader):
+        error = InferenceError("Inference server closed the connection")
+        try:
+            while True:
+                msg_type, _, request_id, body = await proto.read_frame(reader)
+                future = self._pending.pop(request_id, None)
+                if future is None or future.done():
+                    continue
+                if msg_type == proto.RESULT_ARRAY:
+                    future.set_result(proto.decode_array(body))
+                elif msg_type == proto.RESULT_ANALYSIS:
+                    future.set_result(proto.decode_analysis(body))
+                elif msg_type == proto.RESULT_JSON:
+                    future.set_result(proto.decode_json(body))
+                elif msg_type == proto.CANCELLED:
+                    future.set_exception(InferenceError("Request was cancelled by the inference server"))
+                else:
+                    future.set_exception(InferenceError((proto.decode_json(body) or {}).get("error", "Inference failed")))
+        except (asyncio.IncompleteReadError, ConnectionError, proto.ProtocolError) as e:
+            error = InferenceError(f"Inference server connection lost: {e}")
+        finally:
+            if self._writer is not None:
+                self._writer.close()
+            self._writer = None
+        for future in self._pending.values():
+            if not future.done():
+                future.set_exception(error)
+        self._pending.clear()
+
+    async def _send(self, frame, request_id=None):
+        """
+        Write one frame; with `request_id`, register and return the future
+        its reply resolves. Raises ConnectionResetError when the connection
+        dropped since _ensure_connected().
+        """
+        async with self._write_lock:
+            writer = self._writer
+            if writer is None or writer.is_closing():
+                raise ConnectionResetError("Inference server connection is closed")
+            future = None
+            if request_id is not None:
+                future = self._pending[request_id] = asyncio.get_running_loop().create_future()
+            try:
+                writer.write(frame)
+                await writer.drain()
+            except ConnectionError:
+                self._pending.pop(request_id, None)
+                writer.close()
+                raise
+            return future
+
+    async def _send_request(self, frame, request_id):
+        # The connection can drop between connect and send: reconnect once, then give up
+        try:
+            await self._ensure_connected()
+            return await self._send(frame, request_id)
+        except ConnectionError:
+            pass
+        try:
+            await self._ensure_connected()
+            return await self._send(frame, request_id)
+        except ConnectionError as e:
+            raise InferenceError(f"Inference server unreachable: {e}") from e
+
+    async def request(self, kind, payload, priority=PRIORITY_NORMAL):
+        request_id = next(self._ids) & 0xFFFFFFFF
+        future = await self._send_request(proto.encode_json(kind, request_id, payload, priority), request_id)
+        try:
+            return await future
+        except asyncio.CancelledError:
+            try:
+                await asyncio.shield(self._send(proto.encode_frame(proto.CANCEL, request_id)))
+            except ConnectionError:
+                pass    # connection gone: the server drops the connection's jobs itself
+            raise
+        finally:
+            self._pending.pop(request_id, None)
+
+    async def embed(self, texts, priority=PRIORITY_NORMAL) -> np.ndarray:
+        return await self.request(proto.EMBED, {"texts": list(texts)}, priority)
+
+    async def sentiment(self, texts, priority=PRIORITY_NORMAL) -> list:
+        return await self.request(proto.SENTIMENT, {"texts": list(texts)}, priority)
+
+    async def analyze(self, texts, priority=PRIORITY_NORMAL):
+        return await self.request(proto.ANALYZE, {"texts": list(texts)}, priority)
+
+    async def generate(self, prompt, model="qa_llm", priority=PRIORITY_NORMAL, **kwargs) -> str:
+        result = await self.request(proto.GENERATE, {"prompt": prompt, "model": model, **kwargs}, priority)
+        return result["text"]
+
+
+_clients = {}
+
+
+def get_inference_client():
+    """
+    The client for the running event loop, or None when no daemon is configured.
+    """
+    if not INFERENCE_SOCKET:
+        return None
+    loop = asyncio.get_running_loop()
+    client = _clients.get(loop)
+    if client is None:
+        client = _clients[loop] = InferenceClient(INFERENCE_SOCKET)
+    return client
+
+
+# ------------------------------
+# Daemon if configured, else in-process
+# ------------------------------
+async def embed_texts(texts, priority=PRIORITY_NORMAL) -> np.ndarray:
+    client = get_inference_client()
+    if client:
+        return await client.embed(texts, priority)
+    from services.inference_server import embed
+    return await asyncio.to_thread(embed, list(texts))
+
+
+async def analyze_texts(texts, priority=PRIORITY_NORMAL):
+    """
+    (embeddings, sentiment predictions) from one shared tokenization.
+    """
+    client = get_inference_client()
+    if client:
+        return await client.analyze(texts, priority)
+    from services.inference_server import analyze
+    return await asyncio.to_thread(analyze, list(texts))
+
+
+async def generate_text(prompt, model="qa_llm", priority=PRIORITY_NORMAL, **kwargs) -> str:
+    client = get_inference_client()
+    if client:
+        return await client.generate(prompt, model, priority, **kwargs)
+    from services.inference_server import generate
+    cancelled = threading.Event()
+    try:
+        return await asyncio.to_thread(generate, prompt, model, cancelled, **kwargs)
+    except asyncio.CancelledError:
+        # The thread cannot be interrupted; stop generation at the next token instead
+        cancelled.set()
+        raise
@@ -0,0 +1,93 @@
+# services/inference_protocol.py
+#
+# Framing for the inference daemon's Unix socket.
+#
+#   frame  = length:uint32 | header | body         (big-endian, length excludes itself)
+#   header = type:uint8 | priority:uint8 | request_id:uint32
+#
+# Requests carry a UTF-8 JSON body. Embedding results are sent as raw
+# float32 rows (rows:uint32 | cols:uint32 | data) instead of JSON numbers;
+# analysis results are the same rows followed by a JSON list of predictions.
+
+import asyncio
+import json
+import struct
+
+import numpy as np
+
+LENGTH = struct.Struct(">I")
+HEADER = struct.Struct(">BBI")
+SHAPE = struct.Struct(">II")
+MAX_FRAME_BYTES = 64 * 1024 * 1024
+
+# Request types
+GENERATE = 1
+EMBED = 2
+SENTIMENT = 3
+CANCEL = 4
+ANALYZE = 5         # embedding + sentiment in one pass
+
+# Response types
+RESULT_JSON = 16
+RESULT_ARRAY = 17
+ERROR = 18
+CANCELLED = 19
+RESULT_ANALYSIS = 20
+
+# Lower value is served first
+PRIORITY_HIGH = 0
+PRIORITY_NORMAL = 5
+PRIORITY_LOW = 9
+
+
+class ProtocolError(Exception):
+    pass
+
+
+def encode_frame(msg_type: int, request_id: int, body: bytes = b"", priority: int = PRIORITY_NORMAL) -> bytes:
+    header = HEADER.pack(msg_type, priority, request_id)
+    return LENGTH.pack(len(header) + len(body)) + header + body
+
+
+def encode_json(msg_type, request_id, payload, priority=PRIORITY_NORMAL) -> bytes:
+    return encode_frame(msg_type, request_id, json.dumps(payload, separators=(",", ":")).encode("utf-8"), priority)
+
+
+def encode_array(request_id, array) -> bytes:
+    array = np.ascontiguousarray(array, dtype="<f4")
+    if array.ndim == 1:
+        array = array.reshape(1, -1)
+    return encode_frame(RESULT_ARRAY, request_id, SHAPE.pack(*array.shape) + array.tobytes())
+
+
+def decode_array(body: bytes) -> np.ndarray:
+    rows, cols = SHAPE.unpack_from(body)
+    return np.frombuffer(body, dtype="<f4", offset=SHAPE.size, count=rows * cols).reshape(rows, cols)
+
+
+def encode_analysis(request_id, array, predictions) -> bytes:
+    array = np.ascontiguousarray(array, dtype="<f4").reshape(len(predictions), -1)
+    body = SHAPE.pack(*array.shape) + array.tobytes() + json.dumps(predictions, separators=(",", ":")).encode("utf-8")
+    return encode_frame(RESULT_ANALYSIS, request_id, body)
+
+
+def decode_analysis(body: bytes):
+    array = decode_array(body)
+    return array, decode_json(body[SHAPE.size + array.nbytes:])
+
+
+def decode_json(body: bytes):
+    return json.loads(body.decode("utf-8")) if body else None
+
+
+async def read_frame(reader: asyncio.StreamReader):
+    """
+    Returns (msg_type, priority, request_id, body); raises
+    asyncio.IncompleteReadError when the peer closes the connection.
+    """
+    (length,) = LENGTH.unpack(await reader.readexactly(LENGTH.size))
+    if length < HEADER.size or length > MAX_FRAME_BYTES:
+        raise ProtocolError(f"Bad frame length {length}")
+    frame = await reader.readexactly(length)
+    msg_type, priority, request_id = HEADER.unpack_from(frame)
+    return msg_type, priority, request_id, frame[HEADER.size:]
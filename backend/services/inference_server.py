@@ -0,0 +1,411 @@
+# services/inference_server.py
+#
+# Standalone inference daemon: generation, embeddings and sentiment served
+# over a Unix socket (framing in services/inference_protocol.py), so model
+# compute runs outside the API processes and can be pinned to its own cores.
+#
+#   python -m services.inference_server --cpus 4-7 --torch-threads 4
+#
+# Embedding and sentiment requests that arrive close together are batched
+# into one model call. Generation runs in its own lane, so a long completion
+# never holds up encoder batches. Lower priority values are served first; a
+# CANCEL frame (or the client disconnecting) drops queued work and stops a
+# running generation at the next token.
+
+import argparse
+import asyncio
+import heapq
+import itertools
+import logging
+import os
+import threading
+from concurrent.futures import ThreadPoolExecutor
+
+from services import inference_protocol as proto
+from services.model_registry import model_registry, warmup_names
+
+logger = logging.getLogger(__name__)
+
+INFERENCE_SOCKET = os.getenv("INFERENCE_SOCKET") or "/tmp/appg-inference.sock"
+BATCH_MAX = int(os.getenv("INFERENCE_BATCH_MAX", 32))
+BATCH_WAIT_MS = float(os.getenv("INFERENCE_BATCH_WAIT_MS", 5))
+MAX_NEW_TOKENS_LIMIT = int(os.getenv("INFERENCE_MAX_NEW_TOKENS", 512))
+
+BATCHABLE = (proto.EMBED, proto.SENTIMENT, proto.ANALYZE)
+# Dispatch lanes, each with its own model thread
+LANES = {"encoder": BATCHABLE, "generate": (proto.GENERATE,)}
+GENERATION_MODELS = ("qa_llm", "mistral")
+GENERATION_KWARGS = ("max_new_tokens", "do_sample", "top_k", "top_p", "temperature", "repetition_penalty", "no_repeat_ngram_size")
+
+
+class Job:
+    def __init__(self, kind, priority, request_id, payload, connection):
+        self.kind = kind
+        self.priority = priority
+        self.request_id = request_id
+        self.payload = payload
+        self.connection = connection
+        self.cancelled = threading.Event()   # read from the model thread during generation
+
+
+class Connection:
+    def __init__(self, writer):
+        self.writer = writer
+        self.jobs = {}          # request_id -> Job, while queued or running
+        self.lock = asyncio.Lock()
+
+    async def send(self, frame: bytes):
+        async with self.lock:
+            if self.writer.is_closing():
+                return
+            self.writer.write(frame)
+            await self.writer.drain()
+
+
+# ------------------------------
+# Model calls (run on the model thread, or in-process by the client fallback)
+# ------------------------------
+def embed(texts):
+    return model_registry.get("embedder").encode(texts, batch_size=BATCH_MAX, convert_to_numpy=True)
+
+
+def classify(texts):
+    outputs = model_registry.get("sentiment_classifier")(texts, batch_size=BATCH_MAX, truncation=True)
+    return [{"label": o["label"].lower(), "score": float(o["score"])} for o in outputs]
+
+
+# ------------------------------
+# Message analysis: one tokenization feeds both encoders
+# ------------------------------
+_shared_vocab = {}
+
+
+def _tokenizer_of(model):
+    return model.tokenizer
+
+
+def shares_vocabulary(embedder, classifier) -> bool:
+    """
+    MiniLM and DistilBERT (uncased) both use the bert-base-uncased WordPiece
+    vocabulary, so ids from one tokenizer are valid input for the other.
+    Checked once per model pair; a different sentiment model falls back to
+    separate tokenization.
+    """
+    key = (id(embedder), id(classifier))
+    if key not in _shared_vocab:
+        a, b = _tokenizer_of(embedder), _tokenizer_of(classifier)
+        probe = "Héllo WORLD, order #42 isn't here!"
+        _shared_vocab[key] = a.get_vocab() == b.get_vocab() and a(probe)["input_ids"] == b(probe)["input_ids"]
+    return _shared_vocab[key]
+
+
+def _max_length(model):
+    if hasattr(model, "max_seq_length"):            # SentenceTransformer
+        return model.max_seq_length
+    if hasattr(model, "max_length"):                # ONNX backend
+        return model.max_length
+    return min(model.tokenizer.model_max_length, 512)   # transformers pipeline
+
+
+def _truncate_encoded(encoded, max_length, sep_token_id):
+    """
+    Cut a right-padded batch to `max_length` tokens, ending each cut row
+    with [SEP] as the tokenizer's own truncation would, so each encoder
+    sees the ids it would have tokenized itself.
+    """
+    lengths = encoded["attention_mask"].sum(axis=1)
+    if lengths.max(initial=0) <= max_length:
+        return encoded
+    cut = {k: v[:, :max_length].copy() for k, v in encoded.items()}
+    cut["input_ids"][lengths > max_length, max_length - 1] = sep_token_id
+    return cut
+
+
+def _embed_encoded(embedder, encoded):
+    if hasattr(embedder, "embed_encoded"):
+        return embedder.embed_encoded(encoded)
+    import torch
+    features = {k: torch.as_tensor(v).to(embedder.device) for k, v in encoded.items()}
+    with torch.no_grad():
+        return embedder(features)["sentence_embedding"].cpu().numpy()
+
+
+def _classify_encoded(classifier, encoded):
+    if hasattr(classifier, "classify_encoded"):
+        return [{"label": p["label"].lower(), "score": p["score"]} for p in classifier.classify_encoded(encoded)]
+    import torch
+    model = classifier.model
+    with torch.no_grad():
+        logits = model(input_ids=torch.as_tensor(encoded["input_ids"]).to(model.device),
+                       attention_mask=torch.as_tensor(encoded["attention_mask"]).to(model.device)).logits
+    probs = torch.softmax(logits.float(), dim=-1).cpu().numpy()
+    return [{"label": model.config.id2label[int(p.argmax())].lower(), "score": float(p.max())} for p in probs]
+
+
+def analyze(texts):
+    """
+    (embeddings, sentiment predictions) for a batch of messages. The batch is
+    tokenized once, at the longer of the two models' windows; each encoder
+    then runs on those ids cut to its own window (MiniLM 256, DistilBERT
+    512), one after the other, each with the full intra-op thread pool.
+    """
+    embedder = model_registry.get("embedder")
+    classifier = model_registry.get("sentiment_classifier")
+    if not shares_vocabulary(embedder, classifier):
+        return embed(texts), classify(texts)
+
+    tokenizer = _tokenizer_of(embedder)
+    embed_length, classify_length = _max_length(embedder), _max_length(classifier)
+    encoded = dict(tokenizer(texts, padding=True, truncation=True, max_length=max(embed_length, classify_length), return_tensors="np"))
+    # DistilBERT has no segment embeddings
+    predictions = _classify_encoded(
+        classifier, _truncate_encoded({k: v for k, v in encoded.items() if k != "token_type_ids"}, classify_length, tokenizer.sep_token_id)
+    )
+    vectors = _embed_encoded(embedder, _truncate_encoded(encoded, embed_length, tokenizer.sep_token_id))
+    return vectors.astype("float32"), predictions
+
+
+def generate(prompt, model_name="qa_llm", cancelled=None, **kwargs):
+    """
+    Full decoded output (prompt included, as callers expect). Generation
+    stops at the next token once `cancelled` (a threading.Event) is set.
+    """
+    import torch
+    from transformers import StoppingCriteria, StoppingCriteriaList
+
+    class StopWhenCancelled(StoppingCriteria):
+        def __call__(self, input_ids, scores, **kw):
+            return cancelled is not None and cancelled.is_set()
+
+    if model_name not in GENERATION_MODELS:
+        raise ValueError(f"Unknown generation model: {model_name}")
+    loaded = model_registry.get(model_name)
+    tokenizer, model = loaded[0], loaded[1]
+    device = loaded[2] if len(loaded) > 2 else torch.device("cpu")
+
+    kwargs = {k: v for k, v in kwargs.items() if k in GENERATION_KWARGS}
+    kwargs["max_new_tokens"] = min(int(kwargs.get("max_new_tokens", 100)), MAX_NEW_TOKENS_LIMIT)
+    inputs = tokenizer(prompt, return_tensors="pt").to(device)
+    with torch.no_grad():
+        output = model.generate(
+            **inputs,
+            pad_token_id=tokenizer.eos_token_id,
+            stopping_criteria=StoppingCriteriaList([StopWhenCancelled()]),
+            **kwargs,
+        )
+    return tokenizer.decode(output[0], skip_special_tokens=True)
+
+
+def validate_payload(kind, payload):
+    """
+    Error message for a request body the model calls cannot take, else None.
+    Checked per job on arrival, so one bad job never fails a whole batch.
+    """
+    if not isinstance(payload, dict):
+        return "Request body must be a JSON object"
+    if kind in BATCHABLE:
+        texts = payload.get("texts")
+        if not isinstance(texts, list) or not all(isinstance(t, str) for t in texts):
+            return '"texts" must be a list of strings'
+    elif kind == proto.GENERATE:
+        if not isinstance(payload.get("prompt"), str):
+            return '"prompt" must be a string'
+        if payload.get("model", "qa_llm") not in GENERATION_MODELS:
+            return f"Unknown generation model: {payload.get('model')}"
+    return None
+
+
+def _split(values, jobs):
+    results, start = [], 0
+    for job in jobs:
+        end = start + len(job.payload["texts"])
+        results.append(values[start:end])
+        start = end
+    return results
+
+
+def run_embed(jobs):
+    return _split(embed([text for job in jobs for text in job.payload["texts"]]), jobs)
+
+
+def run_sentiment(jobs):
+    return _split(classify([text for job in jobs for text in job.payload["texts"]]), jobs)
+
+
+def run_analyze(jobs):
+    vectors, predictions = analyze([text for job in jobs for text in job.payload["texts"]])
+    return list(zip(_split(vectors, jobs), _split(predictions, jobs)))
+
+
+def run_generate(job):
+    payload = dict(job.payload)
+    prompt = payload.pop("prompt")
+    model_name = payload.pop("model", "qa_llm")
+    return {"text": generate(prompt, model_name, cancelled=job.cancelled, **payload)}
+
+
+# ------------------------------
+# Server
+# ------------------------------
+class InferenceServer:
+    def __init__(self, socket_path=INFERENCE_SOCKET, batch_max=BATCH_MAX, batch_wait_ms=BATCH_WAIT_MS):
+        self.socket_path = socket_path
+        self.batch_max = batch_max
+        self.batch_wait = batch_wait_ms / 1000
+        self.queues = {kind: [] for kind in (proto.GENERATE, proto.EMBED, proto.SENTIMENT, proto.ANALYZE)}
+        self.seq = itertools.count()
+        self.work = {}
+        # One model thread per lane: calls in a lane are serialised, torch
+        # parallelises inside each call
+        self.executors = {lane: ThreadPoolExecutor(max_workers=1, thread_name_prefix=f"inference-{lane}") for lane in LANES}
+
+    async def serve(self):
+        self.work = {lane: asyncio.Event() for lane in LANES}
+        if os.path.exists(self.socket_path):
+            os.remove(self.socket_path)
+        server = await asyncio.start_unix_server(self.handle_connection, path=self.socket_path)
+        os.chmod(self.socket_path, 0o660)
+        logger.info(f"🧠 Inference server listening on {self.socket_path}")
+        async with server:
+            await asyncio.gather(server.serve_forever(), *(self.dispatch(lane) for lane in LANES))
+
+    # ---- connections ----
+    async def handle_connection(self, reader, writer):
+        conn = Connection(writer)
+        try:
+            while True:
+                msg_type, priority, request_id, body = await proto.read_frame(reader)
+                if msg_type == proto.CANCEL:
+                    job = conn.jobs.get(request_id)
+                    if job:
+                        job.cancelled.set()
+                    continue
+                if msg_type not in self.queues:
+                    await conn.send(proto.encode_json(proto.ERROR, request_id, {"error": f"Unknown request type {msg_type}"}))
+                    continue
+                try:
+                    payload = proto.decode_json(body)
+                except ValueError as e:     # bad JSON or UTF-8; the framing itself is intact
+                    payload, error = None, f"Malformed request body: {e}"
+                else:
+                    error = validate_payload(msg_type, payload)
+                if error:
+                    await conn.send(proto.encode_json(proto.ERROR, request_id, {"error": error}))
+                    continue
+                job = Job(msg_type, priority, request_id, payload, conn)
+                conn.jobs[request_id] = job
+                heapq.heappush(self.queues[msg_type], (priority, next(self.seq), job))
+                self.work[self.lane_of(msg_type)].set()
+        except (asyncio.IncompleteReadError, ConnectionError):
+            pass
+        except proto.ProtocolError as e:
+            logger.warning(f"Closing inference connection: {e}")
+        finally:
+            # Nobody is left to read these results
+            for job in conn.jobs.values():
+                job.cancelled.set()
+            writer.close()
+
+    # ---- scheduling ----
+    @staticmethod
+    def lane_of(kind):
+        return next(lane for lane, kinds in LANES.items() if kind in kinds)
+
+    def _next_kind(self, kinds):
+        heads = [(self.queues[kind][0][0], self.queues[kind][0][1], kind) for kind in kinds if self.queues[kind]]
+        return min(heads)[2] if heads else None
+
+    def _take(self, kind, limit):
+        queue, jobs = self.queues[kind], []
+        while queue and len(jobs) < limit:
+            job = heapq.heappop(queue)[2]
+            if job.cancelled.is_set():
+                self._finish(job)
+                asyncio.ensure_future(job.connection.send(proto.encode_frame(proto.CANCELLED, job.request_id)))
+            else:
+                jobs.append(job)
+        return jobs
+
+    def _finish(self, job):
+        job.connection.jobs.pop(job.request_id, None)
+
+    async def dispatch(self, lane):
+        loop = asyncio.get_running_loop()
+        executor, work = self.executors[lane], self.work[lane]
+        while True:
+            kind = self._next_kind(LANES[lane])
+            if kind is None:
+                work.clear()
+                await work.wait()
+                continue
+
+            if kind in BATCHABLE and len(self.queues[kind]) < self.batch_max and self.batch_wait:
+                # Give requests arriving right behind this one a chance to share the call
+                await asyncio.sleep(self.batch_wait)
+            jobs = self._take(kind, self.batch_max if kind in BATCHABLE else 1)
+            if not jobs:
+                continue
+
+            try:
+                if kind == proto.EMBED:
+                    results = await loop.run_in_executor(executor, run_embed, jobs)
+                elif kind == proto.SENTIMENT:
+                    results = await loop.run_in_executor(executor, run_sentiment, jobs)
+                elif kind == proto.ANALYZE:
+                    results = await loop.run_in_executor(executor, run_analyze, jobs)
+                else:
+                    results = [await loop.run_in_executor(executor, run_generate, jobs[0])]
+            except Exception as e:
+                logger.error(f"Inference batch failed: {e}")
+                for job in jobs:
+                    self._finish(job)
+                    await job.connection.send(proto.encode_json(proto.ERROR, job.request_id, {"error": str(e)}))
+                continue
+
+            for job, result in zip(jobs, results):
+                self._finish(job)
+                if job.cancelled.is_set():
+                    frame = proto.encode_frame(proto.CANCELLED, job.request_id)
+                elif kind == proto.EMBED:
+                    frame = proto.encode_array(job.request_id, result)
+                elif kind == proto.ANALYZE:
+                    frame = proto.encode_analysis(job.request_id, *result)
+                else:
+                    frame = proto.encode_json(proto.RESULT_JSON, job.request_id, result)
+                await job.connection.send(frame)
+
+
+def parse_cpus(spec):
+    cpus = set()
+    for part in spec.split(","):
+        if "-" in part:
+            lo, hi = part.split("-")
+            cpus.update(range(int(lo), int(hi) + 1))
+        elif part.strip():
+            cpus.add(int(part))
+    return cpus
+
+
+def main():
+    parser = argparse.ArgumentParser(description="Local inference daemon")
+    parser.add_argument("--socket", default=INFERENCE_SOCKET)
+    parser.add_argument("--cpus", default=None, help="Pin the daemon to these cores, e.g. 4-7")
+    parser.add_argument("--torch-threads", type=int, default=0)
+    parser.add_argument("--models", default="embedder,sentiment_classifier,qa_llm", help='Models to load before serving, or "all"')
+    parser.add_argument("--batch-max", type=int, default=BATCH_MAX)
+    parser.add_argument("--batch-wait-ms", type=float, default=BATCH_WAIT_MS)
+    args = parser.parse_args()
+
+    logging.basicConfig(level=logging.INFO)
+    if args.cpus:
+        os.sched_setaffinity(0, parse_cpus(args.cpus))
+    if args.torch_threads:
+        import torch
+        torch.set_num_threads(args.torch_threads)
+
+    model_registry.warm_up(warmup_names(args.models))
+    asyncio.run(InferenceServer(args.socket, args.batch_max, args.batch_wait_ms).serve())
+
+
+if __name__ == "__main__":
+    main()
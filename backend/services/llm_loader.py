@@ -0,0 +1,168 @@
+# services/llm_loader.py
+#
+# Causal LM loading with a configurable CPU precision:
+#   LLM_PRECISION=fp32   full weights (default)
+#   LLM_PRECISION=int8   dynamic int8 quantization of the Linear layers
+#   LLM_PRECISION=bf16   bfloat16 weights, where the CPU has native bf16 support
+#
+# Converted models are cached next to the source weights, e.g.
+# vector_stores/falcon-rw-1b -> vector_stores/falcon-rw-1b-int8, so the
+# conversion only happens once per model and torch/transformers version.
+# A cache that fails to load is rebuilt rather than raised.
+
+import json
+import logging
+import os
+import shutil
+from pathlib import Path
+
+logger = logging.getLogger(__name__)
+
+LLM_PRECISION = os.getenv("LLM_PRECISION", "fp32").lower()
+LLM_QUANTIZED_DIR = os.getenv("LLM_QUANTIZED_DIR", "vector_stores")  # used for hub ids without a local dir
+PRECISIONS = ("fp32", "int8", "bf16")
+
+INT8_WEIGHTS_FILE = "model_int8.pt"
+META_FILE = "precision.json"
+
+
+def bf16_supported() -> bool:
+    import torch
+    try:
+        return bool(torch.ops.mkldnn._is_mkldnn_bf16_supported())
+    except (AttributeError, RuntimeError):
+        return False
+
+
+def cache_dir_for(model_path, precision) -> Path:
+    """
+    vector_stores/falcon-rw-1b -> vector_stores/falcon-rw-1b-int8; hub ids
+    (tiiuae/falcon-rw-1b) are cached under LLM_QUANTIZED_DIR.
+    """
+    path = Path(model_path)
+    if path.is_dir():
+        return path.parent / f"{path.name}-{precision}"
+    return Path(LLM_QUANTIZED_DIR) / f"{str(model_path).replace('/', '--')}-{precision}"
+
+
+def _cache_valid(cache_dir: Path, model_path, precision) -> bool:
+    meta_path = cache_dir / META_FILE
+    if not meta_path.exists():
+        return False
+    try:
+        with open(meta_path) as f:
+            meta = json.load(f)
+    except ValueError:
+        return False
+    return meta == _meta(model_path, precision)
+
+
+def _meta(model_path, precision):
+    import torch
+    import transformers
+    source = Path(model_path)
+    # A retrained local model (new weights) must not reuse an old conversion
+    source_mtime = max((p.stat().st_mtime for p in source.iterdir()), default=None) if source.is_dir() else None
+    # The int8 cache is a pickled module: it only unpickles against the same torch and transformers classes
+    return {"source": str(model_path), "source_mtime": source_mtime, "precision": precision,
+            "torch": torch.__version__, "transformers": transformers.__version__}
+
+
+def _staging_dir(cache_dir: Path) -> Path:
+    staging = cache_dir.parent / f".{cache_dir.name}.{os.getpid()}.tmp"
+    shutil.rmtree(staging, ignore_errors=True)
+    staging.mkdir(parents=True)
+    return staging
+
+
+def _publish(staging: Path, cache_dir: Path, model_path, precision):
+    """
+    Write the meta into the fully written staging dir and swap it in for
+    `cache_dir`, so a crash mid-save never leaves a cache whose meta claims
+    weights that are not all there.
+    """
+    with open(staging / META_FILE, "w") as f:
+        json.dump(_meta(model_path, precision), f)
+    retired = cache_dir.parent / f".{cache_dir.name}.{os.getpid()}.old"
+    if cache_dir.exists():
+        os.replace(cache_dir, retired)
+    os.replace(staging, cache_dir)
+    shutil.rmtree(retired, ignore_errors=True)
+
+
+def quantize_int8(model):
+    import torch
+    model.eval()
+    return torch.ao.quantization.quantize_dynamic(model, {torch.nn.Linear}, dtype=torch.qint8)
+
+
+def _load_int8(model_path, cache_dir: Path):
+    import torch
+    from transformers import AutoModelForCausalLM
+
+    if _cache_valid(cache_dir, model_path, "int8"):
+        # The quantized module is pickled whole: dynamic-quantized Linear layers
+        # cannot be rebuilt from a plain state_dict without the fp32 weights
+        try:
+            return torch.load(cache_dir / INT8_WEIGHTS_FILE, weights_only=False)
+        except Exception as e:
+            logger.warning(f"⚠️ int8 cache {cache_dir} failed to load ({e}); re-quantizing")
+
+    logger.info(f"⚙️ Quantizing {model_path} to int8 (one-time, cached in {cache_dir})")
+    model = quantize_int8(AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=torch.float32))
+    staging = _staging_dir(cache_dir)
+    torch.save(model, staging / INT8_WEIGHTS_FILE)
+    _publish(staging, cache_dir, model_path, "int8")
+    return model
+
+
+def _load_bf16(model_path, cache_dir: Path):
+    import torch
+    from transformers import AutoModelForCausalLM
+
+    if _cache_valid(cache_dir, model_path, "bf16"):
+        try:
+            return AutoModelForCausalLM.from_pretrained(cache_dir, torch_dtype=torch.bfloat16)
+        except Exception as e:
+            logger.warning(f"⚠️ bf16 cache {cache_dir} failed to load ({e}); converting again")
+
+    model = AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=torch.bfloat16)
+    # Half-size weights on disk also halve later load times
+    staging = _staging_dir(cache_dir)
+    model.save_pretrained(staging)
+    _publish(staging, cache_dir, model_path, "bf16")
+    return model
+
+
+def resolve_precision(precision=None) -> str:
+    precision = (precision or LLM_PRECISION).lower()
+    if precision not in PRECISIONS:
+        raise ValueError(f"LLM_PRECISION must be one of {PRECISIONS}, got {precision!r}")
+    if precision == "bf16" and not bf16_supported():
+        logger.warning("bf16 requested but this CPU has no native bf16 support; using fp32")
+        return "fp32"
+    return precision
+
+
+def load_causal_lm(model_path, precision=None):
+    """
+    (tokenizer, model) for `model_path` (local dir or hub id) in the
+    configured precision, in eval mode.
+    """
+    import torch
+    from transformers import AutoTokenizer, AutoModelForCausalLM
+
+    precision = resolve_precision(precision)
+    tokenizer = AutoTokenizer.from_pretrained(model_path)
+    cache_dir = cache_dir_for(model_path, precision)
+
+    if precision == "int8":
+        model = _load_int8(model_path, cache_dir)
+    elif precision == "bf16":
+        model = _load_bf16(model_path, cache_dir)
+    else:
+        model = AutoModelForCausalLM.from_pretrained(model_path, torch_dtype=torch.float32)
+
+    model.eval()
+    logger.info(f"✅ Loaded {model_path} ({precision})")
+    return tokenizer, model
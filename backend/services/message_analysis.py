@@ -0,0 +1,33 @@
+# services/message_analysis.py
+#
+# Sentiment label and embedding for a chat message from one analysis call
+# (services/inference_server.analyze): the message is tokenized once and
+# both encoders run on the same ids, each cut to its own window. Concurrent
+# messages are batched, identical texts share one request, and recent
+# results are cached.
+
+import os
+
+from services.batching import CoalescingBatcher
+from services.inference_client import analyze_texts
+from services.sentiment import SENTIMENT_BATCH_MAX, SENTIMENT_BATCH_WAIT_MS, to_label
+
+MESSAGE_ANALYSIS_CACHE_SIZE = int(os.getenv("MESSAGE_ANALYSIS_CACHE_SIZE", 2_000))
+
+
+class MessageAnalysisService(CoalescingBatcher):
+    def __init__(self, batch_max=SENTIMENT_BATCH_MAX, batch_wait_ms=SENTIMENT_BATCH_WAIT_MS, cache_size=MESSAGE_ANALYSIS_CACHE_SIZE):
+        super().__init__(batch_max, batch_wait_ms, cache_size)
+
+    async def process_batch(self, keys):
+        vectors, predictions = await analyze_texts(keys)
+        return [(to_label(p), v.tolist()) for p, v in zip(predictions, vectors)]
+
+    async def analyze(self, text: str):
+        """
+        -> (sentiment label, embedding as a list of floats)
+        """
+        return await self.submit(text)
+
+
+message_analysis = MessageAnalysisService()
@@ -0,0 +1,153 @@
+# services/model_registry.py
+#
+# Models are loaded on first use instead of at import, so a worker only pays
+# for the models behind the routes it actually serves. Heavy libraries
+# (torch, transformers, sentence-transformers) are imported inside the
+# loaders for the same reason.
+
+import asyncio
+import logging
+import os
+import threading
+import time
+
+logger = logging.getLogger(__name__)
+
+EMBED_MODEL_NAME = os.getenv("EMBED_MODEL_NAME", "all-MiniLM-L6-v2")
+QA_LLM_MODEL = os.getenv("QA_LLM_MODEL", "tiiuae/falcon-rw-1b")
+SENTIMENT_MODEL_NAME = os.getenv("SENTIMENT_MODEL_NAME", "distilbert-base-uncased-finetuned-sst-2-english")
+# "onnx" serves the embedder and sentiment classifier through ONNX Runtime
+# (export first with scripts/export_onnx.py)
+ENCODER_BACKEND = os.getenv("ENCODER_BACKEND", "torch").lower()
+
+# Comma-separated model names to load at startup, or "all"
+MODEL_WARMUP = os.getenv("MODEL_WARMUP", "")
+
+
+class ModelRegistry:
+    """
+    name -> loader. get(name) runs the loader once (concurrent callers wait
+    for the same load) and records how long it took.
+    """
+
+    def __init__(self):
+        self._loaders = {}
+        self._models = {}
+        self._locks = {}
+        self._metrics = {}
+        self._registry_lock = threading.Lock()
+
+    def register(self, name, loader):
+        with self._registry_lock:
+            self._loaders[name] = loader
+            self._locks[name] = threading.Lock()
+            self._metrics[name] = {"loaded": False, "load_seconds": None, "loaded_at": None, "error": None}
+
+    def get(self, name):
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        if name not in self._loaders:
+            raise KeyError(f"Unknown model: {name}")
+
+        with self._locks[name]:
+            if name in self._models:
+                return self._models[name]
+            logger.info(f"📦 Loading model '{name}'...")
+            start = time.perf_counter()
+            try:
+                model = self._loaders[name]()
+            except Exception as e:
+                self._metrics[name]["error"] = str(e)
+                raise
+            elapsed = time.perf_counter() - start
+            self._models[name] = model
+            self._metrics[name].update(loaded=True, load_seconds=round(elapsed, 3), loaded_at=time.time(), error=None)
+            logger.info(f"✅ Model '{name}' loaded in {elapsed:.2f}s")
+            return model
+
+    async def aget(self, name):
+        """
+        get() for async callers: a model that is not loaded yet is loaded in
+        a worker thread, so the event loop keeps serving during the load.
+        """
+        model = self._models.get(name)
+        if model is not None:
+            return model
+        return await asyncio.to_thread(self.get, name)
+
+    def names(self):
+        return list(self._loaders)
+
+    def is_loaded(self, name):
+        return name in self._models
+
+    def warm_up(self, names=None):
+        """
+        Load the given models (all registered ones if None) up front.
+        Failures are logged and recorded, not raised, so one bad model does
+        not keep the worker from serving the others.
+        """
+        for name in names if names is not None else self.names():
+            try:
+                self.get(name)
+            except Exception as e:
+                logger.error(f"Warm-up of model '{name}' failed: {e}")
+
+    def metrics(self):
+        return {name: dict(m) for name, m in self._metrics.items()}
+
+
+def warmup_names(setting=MODEL_WARMUP):
+    setting = setting.strip()
+    if not setting:
+        return []
+    if setting == "all":
+        return model_registry.names()
+    return [name.strip() for name in setting.split(",") if name.strip()]
+
+
+# ------------------------------
+# Loaders
+# ------------------------------
+def _load_embedder():
+    if ENCODER_BACKEND == "onnx":
+        from services.onnx_backend import OnnxSentenceEncoder, onnx_dir_for
+        return OnnxSentenceEncoder(onnx_dir_for(EMBED_MODEL_NAME))
+    from sentence_transformers import SentenceTransformer
+    return SentenceTransformer(EMBED_MODEL_NAME)
+
+
+def _load_qa_llm():
+    from services.llm_loader import load_causal_lm
+    return load_causal_lm(QA_LLM_MODEL)
+
+
+def _load_mistral():
+    import torch
+    from config import MODEL_NAME, OUTPUT_DIR
+    from services.llm_loader import load_causal_lm, resolve_precision
+
+    # Use local directory only
+    model_path = OUTPUT_DIR if os.path.exists(OUTPUT_DIR) else MODEL_NAME
+    precision = resolve_precision()
+    tokenizer, model = load_causal_lm(model_path, precision)
+    # Reduced-precision modes are CPU kernels
+    use_cuda = torch.cuda.is_available() and precision == "fp32"
+    device = torch.device("cuda" if use_cuda else "cpu")
+    return tokenizer, model.to(device), device
+
+
+def _load_sentiment_classifier():
+    if ENCODER_BACKEND == "onnx":
+        from services.onnx_backend import OnnxTextClassifier, onnx_dir_for
+        return OnnxTextClassifier(onnx_dir_for(SENTIMENT_MODEL_NAME))
+    from transformers import pipeline
+    return pipeline("sentiment-analysis", model=SENTIMENT_MODEL_NAME)
+
+
+model_registry = ModelRegistry()
+model_registry.register("embedder", _load_embedder)
+model_registry.register("qa_llm", _load_qa_llm)
+model_registry.register("mistral", _load_mistral)
+model_registry.register("sentiment_classifier", _load_sentiment_classifier)
@@ -0,0 +1,138 @@
+# services/onnx_backend.py
+#
+# ONNX Runtime versions of the sentence embedder and the sentiment classifier,
+# exported by scripts/export_onnx.py. They expose the subset of the
+# SentenceTransformer / transformers pipeline API the app uses, so the model
+# registry can hand out either backend (ENCODER_BACKEND=torch|onnx).
+
+import json
+import os
+from pathlib import Path
+
+import numpy as np
+
+ONNX_MODEL_DIR = Path(os.getenv("ONNX_MODEL_DIR", "vector_stores/onnx"))
+ONNX_QUANTIZED = os.getenv("ONNX_QUANTIZED", "0") == "1"
+ONNX_BATCH_SIZE = int(os.getenv("ONNX_BATCH_SIZE", 32))
+
+MODEL_FILE = "model.onnx"
+QUANTIZED_MODEL_FILE = "model.int8.onnx"
+META_FILE = "export.json"
+
+
+def onnx_dir_for(model_name) -> Path:
+    return ONNX_MODEL_DIR / model_name.replace("/", "--")
+
+
+def default_threads() -> int:
+    # Cores this process may run on (respects taskset/cgroup pinning)
+    try:
+        return len(os.sched_getaffinity(0))
+    except AttributeError:
+        return os.cpu_count() or 1
+
+
+def make_session(model_path, intra_threads=None):
+    import onnxruntime as ort
+
+    options = ort.SessionOptions()
+    options.graph_optimization_level = ort.GraphOptimizationLevel.ORT_ENABLE_ALL
+    options.execution_mode = ort.ExecutionMode.ORT_SEQUENTIAL
+    # One request's matmuls use all assigned cores; parallel graph branches
+    # barely exist in these encoders, so inter-op threads only add contention
+    options.intra_op_num_threads = intra_threads or int(os.getenv("ONNX_INTRA_THREADS", 0)) or default_threads()
+    options.inter_op_num_threads = 1
+    return ort.InferenceSession(str(model_path), options, providers=["CPUExecutionProvider"])
+
+
+class _OnnxModel:
+    def __init__(self, model_dir, quantized=None, intra_threads=None):
+        from transformers import AutoTokenizer
+
+        self.model_dir = Path(model_dir)
+        with open(self.model_dir / META_FILE) as f:
+            self.meta = json.load(f)
+        quantized = ONNX_QUANTIZED if quantized is None else quantized
+        model_file = QUANTIZED_MODEL_FILE if quantized and (self.model_dir / QUANTIZED_MODEL_FILE).exists() else MODEL_FILE
+        self.session = make_session(self.model_dir / model_file, intra_threads)
+        self.input_names = {i.name for i in self.session.get_inputs()}
+        self.tokenizer = AutoTokenizer.from_pretrained(self.model_dir)
+        self.max_length = self.meta.get("max_length", 512)
+
+    def _run(self, texts):
+        encoded = self.tokenizer(texts, padding=True, truncation=True, max_length=self.max_length, return_tensors="np")
+        return self._run_encoded(encoded)
+
+    def _run_encoded(self, encoded):
+        # Inputs tokenized elsewhere (same vocabulary) can be fed directly
+        feeds = {k: np.asarray(v).astype(np.int64) for k, v in encoded.items() if k in self.input_names}
+        return self.session.run(None, feeds)[0], np.asarray(encoded["attention_mask"])
+
+    def _batched(self, texts, batch_size, fn):
+        # Length-sorted batches keep padding (and wasted compute) small
+        order = sorted(range(len(texts)), key=lambda i: len(texts[i]))
+        results = [None] * len(texts)
+        for start in range(0, len(order), batch_size):
+            idx = order[start:start + batch_size]
+            for i, value in zip(idx, fn([texts[i] for i in idx])):
+                results[i] = value
+        return results
+
+
+class OnnxSentenceEncoder(_OnnxModel):
+    """
+    encode() compatible with SentenceTransformer.encode for str / list[str].
+    """
+
+    def _embed(self, texts):
+        return self._pool(*self._run(texts))
+
+    def embed_encoded(self, encoded):
+        return self._pool(*self._run_encoded(encoded))
+
+    def _pool(self, hidden, mask):
+        if self.meta.get("pooling", "mean") == "cls":
+            pooled = hidden[:, 0]
+        else:
+            mask = mask[..., None].astype(hidden.dtype)
+            pooled = (hidden * mask).sum(axis=1) / np.clip(mask.sum(axis=1), 1e-9, None)
+        if self.meta.get("normalize", True):
+            pooled = pooled / np.clip(np.linalg.norm(pooled, axis=1, keepdims=True), 1e-12, None)
+        return pooled
+
+    def encode(self, sentences, batch_size=ONNX_BATCH_SIZE, convert_to_numpy=True, normalize_embeddings=False, **kwargs):
+        single = isinstance(sentences, str)
+        texts = [sentences] if single else list(sentences)
+        if not texts:
+            return np.zeros((0, self.meta.get("dim", 0)), dtype=np.float32)
+        vectors = np.stack(self._batched(texts, batch_size, self._embed)).astype(np.float32)
+        if normalize_embeddings:
+            vectors /= np.clip(np.linalg.norm(vectors, axis=1, keepdims=True), 1e-12, None)
+        return vectors[0] if single else vectors
+
+
+class OnnxTextClassifier(_OnnxModel):
+    """
+    Callable like a transformers "sentiment-analysis" pipeline:
+    classifier(texts) -> [{"label": "POSITIVE", "score": 0.99}, ...]
+    """
+
+    def __init__(self, model_dir, quantized=None, intra_threads=None):
+        super().__init__(model_dir, quantized, intra_threads)
+        self.id2label = {int(k): v for k, v in self.meta["id2label"].items()}
+
+    def _classify(self, texts):
+        return self._predict(self._run(texts)[0])
+
+    def classify_encoded(self, encoded):
+        return self._predict(self._run_encoded(encoded)[0])
+
+    def _predict(self, logits):
+        logits = logits - logits.max(axis=1, keepdims=True)
+        probs = np.exp(logits) / np.exp(logits).sum(axis=1, keepdims=True)
+        best = probs.argmax(axis=1)
+        return [{"label": self.id2label[int(b)], "score": float(p[b])} for b, p in zip(best, probs)]
+
+    def __call__(self, texts, batch_size=ONNX_BATCH_SIZE, **kwargs):
+        texts = [texts] if isinstance(texts, str) else list(texts)
+        return self._batched(texts, batch_size, self._classify)
@@ -0,0 +1,22 @@
+# services/sentiment.py
+#
+# Label mapping and batching settings for chat-message sentiment from the
+# SST-2 classifier. Chat messages are classified together with their
+# embedding by services/message_analysis.py; this module holds what that
+# path and the blocking helpers in utils/nlp.py share.
+
+import os
+
+SENTIMENT_BATCH_MAX = int(os.getenv("SENTIMENT_BATCH_MAX", 32))
+SENTIMENT_BATCH_WAIT_MS = float(os.getenv("SENTIMENT_BATCH_WAIT_MS", 3))
+# SST-2 only knows positive/negative; low-confidence predictions are stored as neutral
+SENTIMENT_NEUTRAL_THRESHOLD = float(os.getenv("SENTIMENT_NEUTRAL_THRESHOLD", 0.7))
+
+
+def to_label(prediction) -> str:
+    """
+    {"label": "positive", "score": 0.98} -> "positive" / "negative" / "neutral"
+    """
+    if prediction["score"] < SENTIMENT_NEUTRAL_THRESHOLD:
+        return "neutral"
+    return prediction["label"].lower()
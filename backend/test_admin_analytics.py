@@ -0,0 +1,27 @@
+from fastapi.testclient import TestClient
+
+from main import app
+from services import analytics as analytics_module
+
+# Without the `with` block TestClient skips startup, so no flusher or Mongo index setup runs
+client = TestClient(app)
+
+
+def test_analytics_endpoint_is_mounted(monkeypatch):
+    calls = []
+
+    def fake_snapshot(hours):
+        calls.append(hours)
+        return {"window_hours": hours, "latency_ms": {"p50": 12.0}}
+
+    monkeypatch.setattr(analytics_module.analytics, "snapshot", fake_snapshot)
+
+    response = client.get("/api/admin/analytics", params={"hours": 6})
+    assert response.status_code == 200
+    assert response.json() == {"window_hours": 6, "latency_ms": {"p50": 12.0}}
+    assert calls == [6]
+
+
+def test_analytics_endpoint_rejects_bad_window():
+    response = client.get("/api/admin/analytics", params={"hours": 0})
+    assert response.status_code == 422
@@ -23,6 +23,7 @@ from fastapi import FastAPI, WebSocket, WebSocketDisconnect, Request
 from fastapi.responses import JSONResponse
 from threading import Thread
 from langchain.memory import RedisChatMessageHistory
+from utils.tabular import read_columns, iter_table_chunks, write_jsonl
 
 # Logging setup
 logging.basicConfig(level=logging.INFO)
@@ -71,37 +72,56 @@ def auto_detect_fields(df):
     return text_cols[0], response_cols[0] if response_cols else None
 
 
+_summarizer = None
+
+
 def summarize_response(text):
-    summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
-    result = summarizer(text[:1024], max_length=60, min_length=20, do_sample=False)
+    global _summarizer
+    if _summarizer is None:
+        _summarizer = pipeline("summarization", model="facebook/bart-large-cnn")
+    result = _summarizer(text[:1024], max_length=60, min_length=20, do_sample=False)
     return result[0]['summary_text']
 
 
 def convert_to_jsonl(file_path, output_path):
+    """
+    Stream a CSV/XLSX/JSON export into prompt/response JSONL.
+    The file is read chunk by chunk and rows are converted with column
+    operations rather than iterrows(). Rows without a prompt are dropped;
+    rows without a response get a summary of the whole row.
+    """
     log.info(f"Converting {file_path} to {output_path}")
     ext = file_path.split('.')[-1]
-    if ext == "csv":
-        df = pd.read_csv(file_path)
-    elif ext == "xlsx":
-        df = pd.read_excel(file_path)
-    elif ext == "json":
-        df = pd.read_json(file_path)
-    else:
+    if ext not in ("csv", "xlsx", "json", "jsonl"):
         raise ValueError("Unsupported format")
 
-    prompt_col, response_col = auto_detect_fields(df)
+    columns = read_columns(file_path)
+    prompt_col, response_col = auto_detect_fields(pd.DataFrame(columns=columns))
     log.info(f"Auto-detected prompt: {prompt_col}, response: {response_col}")
 
-    records = []
-    for _, row in df.iterrows():
-        prompt = row[prompt_col]
-        response = row[response_col] if response_col and pd.notna(row[response_col]) else summarize_response(str(row))
-        records.append({"prompt": str(prompt), "response": str(response)})
+    # All columns are read: the summary fallback needs the full row
+    dtypes = {col: "string" for col in (prompt_col, response_col) if col}
+    dropped = 0
 
     with open(output_path, "w") as f:
-        for r in records:
-            json.dump(r, f)
-            f.write("\n")
+        for df in iter_table_chunks(file_path, dtypes=dtypes):
+            prompts = df[prompt_col].str.strip()
+            has_prompt = prompts.notna() & (prompts != "")
+            dropped += int((~has_prompt).sum())
+            df = df[has_prompt]
+
+            out = pd.DataFrame({"prompt": df[prompt_col].astype(str)})
+            out["response"] = df[response_col] if response_col else pd.Series(pd.NA, index=df.index, dtype="string")
+
+            # Rows without a response fall back to a summary of the row
+            missing = out["response"].isna()
+            if missing.any():
+                out.loc[missing, "response"] = [summarize_response(str(row)) for _, row in df[missing].iterrows()]
+
+            out["response"] = out["response"].astype(str)
+            write_jsonl(out, f)
+    if dropped:
+        log.info(f"Dropped {dropped} rows without a prompt")
     log.info("Conversion complete")
     return output_path
 
@@ -0,0 +1,58 @@
+# training/incremental.py
+#
+# Shared helpers for running the session analysis jobs incrementally:
+# a per-session content hash stored next to the analysis, and a per-job
+# watermark so nightly runs only look at sessions touched since last time.
+
+import hashlib
+import json
+from datetime import datetime
+
+WATERMARK_COLLECTION = "analysis_watermarks"
+
+
+def session_content_hash(chat):
+    """
+    Stable hash of the parts of a chat that feed the analysis.
+    """
+    payload = [(msg.get("sender"), msg.get("message")) for msg in chat]
+    return hashlib.sha1(json.dumps(payload, ensure_ascii=False).encode("utf-8")).hexdigest()
+
+
+def needs_analysis(session, job_name):
+    """
+    True when the session has never been analysed by `job_name` or its
+    content changed since the stored analysis.
+    """
+    chat = session.get("chat") or []
+    stored = (session.get("analysis_hash") or {}).get(job_name)
+    return bool(chat) and stored != session_content_hash(chat)
+
+
+def incremental_query(watermark, job_name):
+    """
+    Mongo filter for sessions that may have changed since `watermark`:
+    never analysed, or carrying a message / update newer than the watermark.
+    Sessions without timestamps are only picked up again by a full run.
+    """
+    if watermark is None:
+        return {}
+    return {"$or": [
+        {f"analysis_hash.{job_name}": {"$exists": False}},
+        {"chat.timestamp": {"$gt": watermark}},
+        {"updated_at": {"$gt": watermark}},
+    ]}
+
+
+def load_watermark(db, job_name):
+    doc = db[WATERMARK_COLLECTION].find_one({"_id": job_name})
+    return doc.get("last_run_at") if doc else None
+
+
+def save_watermark(db, job_name, run_started_at):
+    # Use the run start so sessions written during the run are picked up next time
+    db[WATERMARK_COLLECTION].update_one(
+        {"_id": job_name},
+        {"$set": {"last_run_at": run_started_at, "updated_at": datetime.utcnow()}},
+        upsert=True
+    )
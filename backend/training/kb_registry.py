@@ -0,0 +1,116 @@
+# training/kb_registry.py
+#
+# Knowledge-base articles used to classify chat sessions, loaded from the KB
+# files on disk. Their normalised embedding matrix is cached by content hash,
+# so it is only re-encoded when the articles (or the model) change.
+
+import csv
+import hashlib
+import json
+import os
+
+import numpy as np
+
+KB_ARTICLES_DIR = os.getenv("KB_ARTICLES_DIR", "uploaded_kbs")
+KB_CACHE_DIR = os.getenv("KB_CACHE_DIR", "vector_stores/kb_registry")
+
+# Used when no KB files are present
+DEFAULT_KB_ARTICLES = [
+    "How to reset your password",
+    "Steps to cancel your subscription",
+    "How to update billing details",
+    "Installation instructions for the mobile app",
+    "How to connect to your smart device",
+    "How are you?"
+]
+
+TITLE_FIELDS = ("title", "question", "prompt", "text")
+
+
+def _article_from_record(record):
+    if isinstance(record, str):
+        return record.strip()
+    if isinstance(record, dict):
+        for field in TITLE_FIELDS:
+            if record.get(field):
+                return str(record[field]).strip()
+    return None
+
+
+def load_kb_articles(directory=KB_ARTICLES_DIR):
+    """
+    Collect article titles from .txt (one per line), .json (list), .jsonl and
+    .csv (title/question column, else the first column) files in `directory`.
+    Duplicates are dropped; order follows sorted file names.
+    """
+    articles = []
+    if os.path.isdir(directory):
+        for name in sorted(os.listdir(directory)):
+            path = os.path.join(directory, name)
+            ext = os.path.splitext(name)[1].lower()
+            try:
+                with open(path, "r", encoding="utf-8") as f:
+                    if ext == ".txt":
+                        records = f.read().splitlines()
+                    elif ext == ".json":
+                        data = json.load(f)
+                        records = data if isinstance(data, list) else [data]
+                    elif ext == ".jsonl":
+                        records = [json.loads(line) for line in f if line.strip()]
+                    elif ext == ".csv":
+                        rows = list(csv.DictReader(f))
+                        records = [
+                            next((row[k] for k in TITLE_FIELDS if row.get(k)), next(iter(row.values()), None))
+                            for row in rows
+                        ]
+                    else:
+                        continue
+            except (OSError, ValueError, UnicodeDecodeError) as e:
+                print(f"[⚠️] Skipping KB file {path}: {e}")
+                continue
+            articles.extend(a for a in map(_article_from_record, records) if a)
+
+    articles = list(dict.fromkeys(articles))
+    return articles or list(DEFAULT_KB_ARTICLES)
+
+
+class KBRegistry:
+    """
+    Article list plus its L2-normalised embedding matrix (n_articles x dim).
+    """
+
+    def __init__(self, articles, embedder, model_name="all-MiniLM-L6-v2", cache_dir=KB_CACHE_DIR):
+        self.articles = articles
+        self.content_hash = hashlib.sha256(
+            json.dumps([model_name, articles], ensure_ascii=False).encode("utf-8")
+        ).hexdigest()[:16]
+        self.matrix = self._load_or_encode(embedder, cache_dir)
+
+    def _load_or_encode(self, embedder, cache_dir):
+        cache_path = os.path.join(cache_dir, f"kb_{self.content_hash}.npy")
+        if os.path.exists(cache_path):
+            print(f"[📚] Loaded cached KB matrix ({len(self.articles)} articles, {self.content_hash})")
+            return np.load(cache_path)
+
+        print(f"[📚] Encoding {len(self.articles)} knowledge base articles...")
+        matrix = embedder.encode(self.articles, batch_size=64, normalize_embeddings=True, convert_to_numpy=True)
+        matrix = np.asarray(matrix, dtype=np.float32)
+        os.makedirs(cache_dir, exist_ok=True)
+        tmp_path = f"{cache_path}.tmp.npy"
+        np.save(tmp_path, matrix)
+        os.replace(tmp_path, cache_path)
+        return matrix
+
+    def best_matches(self, session_embeddings):
+        """
+        Cosine similarity of many sessions against every article in one matmul.
+        `session_embeddings` must be L2-normalised (n_sessions x dim).
+        Returns (best_article_index, best_score) arrays of length n_sessions.
+        """
+        scores = np.asarray(session_embeddings, dtype=np.float32) @ self.matrix.T
+        best = scores.argmax(axis=1)
+        return best, scores[np.arange(len(best)), best]
+
+
+def load_kb_registry(embedder, directory=KB_ARTICLES_DIR, model_name="all-MiniLM-L6-v2"):
+    return KBRegistry(load_kb_articles(directory), embedder, model_name=model_name)
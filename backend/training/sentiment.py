@@ -1,9 +1,18 @@
-from pymongo import MongoClient
+from pymongo import MongoClient, UpdateOne
 from transformers import AutoTokenizer, AutoModelForSequenceClassification, pipeline
 from transformers import AutoModelForSeq2SeqLM
 from pymongo.errors import PyMongoError
+from bson import ObjectId
+from datetime import datetime
 import numpy as np
+import argparse
 import json
+import os
+import sys
+import torch
+
+sys.path.append(os.path.join(os.path.dirname(__file__), '..'))
+from training.incremental import needs_analysis, session_content_hash, incremental_query, load_watermark, save_watermark
 
 print("[🔌] Connecting to MongoDB...")
 
@@ -29,22 +38,45 @@ summarizer_tokenizer = AutoTokenizer.from_pretrained(summarizer_model_name)
 
 print("[✅] All models loaded.")
 
+# Batch settings
+SESSION_BATCH_SIZE = int(os.getenv("SENTIMENT_SESSION_BATCH", 32))    # sessions pulled per Mongo batch
+SENTIMENT_BATCH_SIZE = int(os.getenv("SENTIMENT_CHUNK_BATCH", 64))    # chunks per sentiment forward pass
+SUMMARY_BATCH_SIZE = int(os.getenv("SUMMARY_BATCH", 8))               # sessions per summarizer generate()
+SUMMARY_NUM_BEAMS = int(os.getenv("SUMMARY_NUM_BEAMS", 4))
+
+# Final output
+output_path = "fine_tune.jsonl"
+checkpoint_path = f"{output_path}.checkpoint"
+JOB_NAME = "sentiment"
+
 # Helpers
 def format_chat_session(chat):
     return " [SEP] ".join([f"{msg['sender'].upper()}: {msg['message']}" for msg in chat])
 
-def chunk_text_by_tokens(text, max_tokens=512):
-    tokens = sentiment_tokenizer.encode(text, add_special_tokens=False)
-    chunks = []
-    for i in range(0, len(tokens), max_tokens):
-        chunk = sentiment_tokenizer.decode(tokens[i:i+max_tokens])
-        chunks.append(chunk)
-    return chunks
+def chunk_texts_by_tokens(texts, max_tokens=510):
+    """
+    Tokenize many texts in one call and split each into <= max_tokens pieces.
+    Returns a list of chunk lists, one per text.
+    """
+    encoded = sentiment_tokenizer(texts, add_special_tokens=False)["input_ids"]
+    return [
+        [sentiment_tokenizer.decode(ids[i:i + max_tokens]) for i in range(0, len(ids), max_tokens)] or [""]
+        for ids in encoded
+    ]
 
-def summarize_chat(text):
-    inputs = summarizer_tokenizer([text], max_length=1024, return_tensors="pt", truncation=True)
-    summary_ids = summarizer_model.generate(inputs["input_ids"], max_length=150, min_length=30, length_penalty=2.0, num_beams=4, early_stopping=True)
-    return summarizer_tokenizer.decode(summary_ids[0], skip_special_tokens=True)
+def summarize_chats(texts):
+    summaries = []
+    for i in range(0, len(texts), SUMMARY_BATCH_SIZE):
+        batch = texts[i:i + SUMMARY_BATCH_SIZE]
+        inputs = summarizer_tokenizer(batch, max_length=1024, return_tensors="pt", truncation=True, padding=True)
+        with torch.no_grad():
+            summary_ids = summarizer_model.generate(
+                inputs["input_ids"], attention_mask=inputs["attention_mask"],
+                max_length=150, min_length=30, length_penalty=2.0,
+                num_beams=SUMMARY_NUM_BEAMS, early_stopping=True
+            )
+        summaries.extend(summarizer_tokenizer.batch_decode(summary_ids, skip_special_tokens=True))
+    return summaries
 
 def convert_to_three_level_sentiment(star):
     try:
@@ -58,73 +90,172 @@ def convert_to_three_level_sentiment(star):
     except Exception:
         return "neutral"
 
-# Final output
-output_path = "fine_tune.jsonl"
+def analyze_sessions(sessions):
+    """
+    Sentiment + summary for a batch of sessions.
+    All chunks of the batch go through the sentiment model together.
+    Returns a list of (session_id, analysis) tuples.
+    """
+    texts = [format_chat_session(s["chat"]) for s in sessions]
+    chunks_per_session = chunk_texts_by_tokens(texts)
 
-print("[🚀] Starting analysis and training example creation...")
+    flat_chunks = [chunk for chunks in chunks_per_session for chunk in chunks]
+    flat_results = sentiment_pipeline(flat_chunks, batch_size=SENTIMENT_BATCH_SIZE, truncation=True)
+    summaries = summarize_chats(texts)
 
-total, processed, skipped = 0, 0, 0
+    analyses, offset = [], 0
+    for session, chunks, summary in zip(sessions, chunks_per_session, summaries):
+        results = flat_results[offset:offset + len(chunks)]
+        offset += len(chunks)
+        labels = [r["label"] for r in results]
+        analyses.append((session["_id"], {
+            "overall_sentiment": max(set(labels), key=labels.count),
+            "sentiment_score": float(np.mean([r["score"] for r in results])),
+            "chat_summary": summary,
+            f"analysis_hash.{JOB_NAME}": session_content_hash(session["chat"]),
+        }))
+    return analyses
 
-for session in collection.find():
-    total += 1
-    session_id = session["_id"]
-    chat = session.get("chat", [])
+def iter_session_batches(after_id=None, batch_size=SESSION_BATCH_SIZE, base_query=None):
+    query = dict(base_query or {})
+    if after_id is not None:
+        query = {"$and": [query, {"_id": {"$gt": after_id}}]}
+    cursor = collection.find(query, {"chat": 1, "analysis_hash": 1}).sort("_id", 1).batch_size(batch_size)
+    batch = []
+    for session in cursor:
+        batch.append(session)
+        if len(batch) == batch_size:
+            yield batch
+            batch = []
+    if batch:
+        yield batch
 
-    print(f"\n---\n🧾 Session ID: {session_id}")
+def load_checkpoint():
+    if not os.path.exists(checkpoint_path):
+        return {}
+    with open(checkpoint_path, "r") as f:
+        state = json.load(f)
+    last_id = state.get("last_id")
+    if last_id and ObjectId.is_valid(last_id):
+        state["last_id"] = ObjectId(last_id)
+    return state
 
-    if not chat:
-        print("⚠️ Skipped: Empty chat session.")
-        skipped += 1
-        continue
+def save_checkpoint(state):
+    tmp_path = f"{checkpoint_path}.tmp"
+    with open(tmp_path, "w") as f:
+        json.dump({**state, "last_id": str(state["last_id"])}, f)
+    os.replace(tmp_path, checkpoint_path)
 
-    try:
-        chat_text = format_chat_session(chat)
-        chunks = chunk_text_by_tokens(chat_text)
-
-        all_scores, all_labels = [], []
-
-        for i, chunk in enumerate(chunks):
-            result = sentiment_pipeline(chunk)[0]
-            print(f"[🔍] Chunk {i+1}: {result['label']} ({result['score']:.2f})")
-            all_scores.append(result["score"])
-            all_labels.append(result["label"])
-
-        final_label = max(set(all_labels), key=all_labels.count)
-        avg_score = float(np.mean(all_scores))
-        summary = summarize_chat(chat_text)
-
-        # Save to MongoDB
-        collection.update_one(
-            {"_id": session_id},
-            {"$set": {
-                "overall_sentiment": final_label,
-                "sentiment_score": avg_score,
-                "chat_summary": summary
-            }}
-        )
-
-        # Build training data
+def save_analyses(sessions, out):
+    """
+    Analyse `sessions`, store the results in one bulk write and append the
+    training examples. Returns the number of sessions analysed.
+    """
+    analyses = analyze_sessions(sessions)
+
+    # Save to MongoDB in one round trip
+    collection.bulk_write(
+        [UpdateOne({"_id": session_id}, {"$set": analysis}) for session_id, analysis in analyses],
+        ordered=False
+    )
+
+    # Build training data
+    for _, analysis in analyses:
         sentiment_example = {
-            "prompt": summary,
+            "prompt": analysis["chat_summary"],
             "response": "Let me help you with that. Please try resetting your password.",  # You can improve this with Ollama if needed
-            "sentiment": convert_to_three_level_sentiment(final_label),
+            "sentiment": convert_to_three_level_sentiment(analysis["overall_sentiment"]),
         }
+        out.write(json.dumps(sentiment_example) + "\n")
+    out.flush()
+    return len(analyses)
+
+def save_analyses_one_by_one(sessions, out):
+    """
+    Fallback after a failed batch: each session on its own, so one bad
+    session does not take the rest of the batch with it.
+    Returns (analysed, failed).
+    """
+    analysed, failed = 0, 0
+    for session in sessions:
+        try:
+            analysed += save_analyses([session], out)
+        except PyMongoError as db_err:
+            print(f"❌ MongoDB Error: {db_err}")
+            failed += 1
+        except Exception as e:
+            print(f"❌ Error processing session {session['_id']}: {e}")
+            failed += 1
+    return analysed, failed
+
+def run(resume=True, incremental=True):
+    state = load_checkpoint() if resume else {}
+    total = state.get("total", 0)
+    processed = state.get("processed", 0)
+    skipped = state.get("skipped", 0)
+    unchanged = state.get("unchanged", 0)
+    failed = state.get("failed", 0)
+    if state.get("last_id") is not None:
+        print(f"[↩️] Resuming after session {state['last_id']} ({total} already seen)")
+
+    # A resumed run keeps the watermark it started with
+    run_started_at = datetime.fromisoformat(state["run_started_at"]) if state.get("run_started_at") else datetime.utcnow()
+    watermark = load_watermark(db, JOB_NAME) if incremental else None
+    if watermark:
+        print(f"[⏱️] Incremental run: sessions changed since {watermark}")
+
+    print("[🚀] Starting analysis and training example creation...")
+
+    with open(output_path, "a", encoding="utf-8", buffering=1024 * 1024) as out:
+        # Examples written after the last checkpoint are from an interrupted run
+        if "output_offset" in state:
+            out.truncate(state["output_offset"])
+            out.seek(state["output_offset"])
+
+        for batch in iter_session_batches(state.get("last_id"), base_query=incremental_query(watermark, JOB_NAME)):
+            total += len(batch)
+            non_empty = [s for s in batch if s.get("chat")]
+            skipped += len(batch) - len(non_empty)
+            # Sessions whose content hash matches their stored analysis are left alone
+            sessions = [s for s in non_empty if needs_analysis(s, JOB_NAME)] if incremental else non_empty
+            unchanged += len(non_empty) - len(sessions)
+            analysed = 0
+
+            if sessions:
+                try:
+                    analysed = save_analyses(sessions, out)
+                except Exception as e:
+                    print(f"❌ Batch ending at {batch[-1]['_id']} failed ({e}); retrying session by session")
+                    analysed, batch_failed = save_analyses_one_by_one(sessions, out)
+                    failed += batch_failed
+            processed += analysed
 
-        # Save to file
-        with open(output_path, "a", encoding="utf-8") as f:
-            f.write(json.dumps(sentiment_example) + "\n")
+            save_checkpoint({
+                "last_id": batch[-1]["_id"], "total": total, "processed": processed,
+                "skipped": skipped, "unchanged": unchanged, "failed": failed,
+                "run_started_at": run_started_at.isoformat(), "output_offset": out.tell()
+            })
+            print(f"[📦] Batch done: {analysed} analysed, {total} seen so far")
 
-        print(f"✅ Training example saved with sentiment: {sentiment_example['sentiment']}")
-        processed += 1
+    # Run finished; the next run starts from scratch. Sessions that failed
+    # keep the old watermark so the next incremental run looks at them again
+    # (their hashes were not updated, so they still count as changed).
+    if failed:
+        print(f"[⚠️] {failed} sessions failed; watermark left at {watermark}")
+    else:
+        save_watermark(db, JOB_NAME, run_started_at)
+    if os.path.exists(checkpoint_path):
+        os.remove(checkpoint_path)
 
-    except PyMongoError as db_err:
-        print(f"❌ MongoDB Error: {db_err}")
-        skipped += 1
-    except Exception as e:
-        print(f"❌ Error processing session {session_id}: {e}")
-        skipped += 1
+    print("\n---\n🎯 Summary")
+    print(f"Total sessions: {total}")
+    print(f"Processed: {processed}")
+    print(f"Skipped: {skipped + failed} ({failed} failed)")
+    print(f"Unchanged: {unchanged}")
 
-print("\n---\n🎯 Summary")
-print(f"Total sessions: {total}")
-print(f"Processed: {processed}")
-print(f"Skipped: {skipped}")
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description="Analyse chat sessions and build training examples")
+    parser.add_argument("--restart", action="store_true", help="Ignore any checkpoint and start over")
+    parser.add_argument("--full", action="store_true", help="Re-analyse every session, ignoring hashes and watermark")
+    args = parser.parse_args()
+    run(resume=not args.restart, incremental=not args.full)
@@ -0,0 +1,223 @@
+# training/vector_sink.py
+#
+# Destinations for session summary vectors. Sinks buffer vectors and write
+# them in batches; the local FAISS sink needs no network at all. Vector ids
+# are unique per sink: adding an id that already exists replaces it.
+
+import json
+import os
+import pickle
+from abc import ABC, abstractmethod
+from concurrent.futures import ThreadPoolExecutor
+
+import faiss
+import numpy as np
+
+from utils.versioned_index import VersionedIndex, INDEX_FILE, DOCS_FILE
+
+VECTOR_SINK = os.getenv("VECTOR_SINK", "pinecone")            # "pinecone" or "faiss"
+VECTOR_SINK_BATCH = int(os.getenv("VECTOR_SINK_BATCH", 100))   # vectors per upsert
+VECTOR_SINK_CONCURRENCY = int(os.getenv("VECTOR_SINK_CONCURRENCY", 4))
+LOCAL_VECTOR_DIR = os.getenv("LOCAL_VECTOR_DIR", "vector_stores/session_summaries")
+
+
+class VectorSink(ABC):
+    """
+    Buffers (id, vector, metadata) tuples and hands them to `_write_batch`
+    in groups of `batch_size`; ids passed to delete() go to `_delete_batch`
+    on the same flush, ahead of the writes. Use as a context manager so the
+    tail is flushed.
+    """
+
+    def __init__(self, batch_size=VECTOR_SINK_BATCH):
+        self.batch_size = batch_size
+        self._buffer = []
+        self._deletes = []
+        self.written = 0
+
+    def add(self, vector_id, vector, metadata=None):
+        self._buffer.append((vector_id, list(vector), metadata or {}))
+        if len(self._buffer) + len(self._deletes) >= self.batch_size:
+            self.flush()
+
+    def delete(self, vector_id):
+        self._deletes.append(vector_id)
+        if len(self._buffer) + len(self._deletes) >= self.batch_size:
+            self.flush()
+
+    def flush(self):
+        if self._deletes:
+            deletes, self._deletes = self._deletes, []
+            self._delete_batch(deletes)
+        if not self._buffer:
+            return
+        batch, self._buffer = self._buffer, []
+        self._write_batch(batch)
+        self.written += len(batch)
+
+    def close(self):
+        self.flush()
+
+    @abstractmethod
+    def _write_batch(self, batch):
+        ...
+
+    @abstractmethod
+    def _delete_batch(self, vector_ids):
+        ...
+
+    def __enter__(self):
+        return self
+
+    def __exit__(self, *exc):
+        self.close()
+
+
+class PineconeSink(VectorSink):
+    """
+    Upserts batches to a Pinecone index, up to `concurrency` requests in flight.
+    """
+
+    def __init__(self, index, batch_size=VECTOR_SINK_BATCH, concurrency=VECTOR_SINK_CONCURRENCY):
+        super().__init__(batch_size)
+        self.index = index
+        self._pool = ThreadPoolExecutor(max_workers=concurrency)
+        self._pending = []
+        self.concurrency = concurrency
+
+    def _submit(self, fn, **kwargs):
+        self._pending.append(self._pool.submit(fn, **kwargs))
+        if len(self._pending) >= self.concurrency:
+            # Surface errors and keep the number of in-flight requests bounded
+            self._pending.pop(0).result()
+
+    def _write_batch(self, batch):
+        # Upsert replaces any vector already stored under the same id
+        self._submit(self.index.upsert, vectors=batch)
+
+    def _delete_batch(self, vector_ids):
+        self._submit(self.index.delete, ids=vector_ids)
+
+    def close(self):
+        super().close()
+        for future in self._pending:
+            future.result()
+        self._pending = []
+        self._pool.shutdown()
+
+
+class LocalFaissSink(VectorSink):
+    """
+    Offline sink: vectors go into a FAISS inner-product index and their
+    metadata into a list row-aligned with it. The pair is published on
+    close() as one version of a VersionedIndex (utils/versioned_index.py),
+    so a crash at any point leaves the previous version live and aligned.
+    Existing data in `directory` is appended to; an id that is already
+    indexed has its old row removed first.
+    """
+
+    def __init__(self, directory=LOCAL_VECTOR_DIR, dim=384, batch_size=VECTOR_SINK_BATCH):
+        super().__init__(batch_size)
+        self.directory = directory
+        self.store = VersionedIndex(directory)
+        self.index, self.metadata = self._load_existing(dim)
+        self._rows = {row["id"]: i for i, row in enumerate(self.metadata)}
+
+    def _load_existing(self, dim):
+        version = self.store.current_version()
+        if version:
+            return _read_version(self.store, version)
+        legacy_index, legacy_meta = self._legacy_paths()
+        if os.path.exists(legacy_index):
+            # Layout before versioning: vectors.index + metadata.jsonl, metadata
+            # possibly longer than the index after a crash between the renames
+            index = faiss.read_index(legacy_index)
+            with open(legacy_meta, "r", encoding="utf-8") as f:
+                metadata = [json.loads(line) for line in f][:index.ntotal]
+            if len(metadata) < index.ntotal:
+                raise RuntimeError(f"{legacy_meta} has {len(metadata)} rows for {index.ntotal} vectors; rebuild {self.directory}")
+            return index, metadata
+        return faiss.IndexFlatIP(dim), []
+
+    def _legacy_paths(self):
+        return os.path.join(self.directory, "vectors.index"), os.path.join(self.directory, "metadata.jsonl")
+
+    def _remove(self, vector_ids):
+        rows = sorted({self._rows[i] for i in vector_ids if i in self._rows})
+        if not rows:
+            return
+        # Flat indexes compact in order, so the remaining rows stay aligned with the list
+        self.index.remove_ids(np.asarray(rows, dtype=np.int64))
+        dropped = set(rows)
+        self.metadata = [row for i, row in enumerate(self.metadata) if i not in dropped]
+        self._rows = {row["id"]: i for i, row in enumerate(self.metadata)}
+
+    def _write_batch(self, batch):
+        latest = {vector_id: (vector, metadata) for vector_id, vector, metadata in batch}
+        self._remove(latest)
+        vectors = np.asarray([vector for vector, _ in latest.values()], dtype=np.float32)
+        faiss.normalize_L2(vectors)
+        self.index.add(vectors)
+        for vector_id, (_, metadata) in latest.items():
+            self._rows[vector_id] = len(self.metadata)
+            self.metadata.append({"id": vector_id, **metadata})
+
+    def _delete_batch(self, vector_ids):
+        self._remove(vector_ids)
+
+    def close(self):
+        super().close()
+        self.store.publish(self.index, self.metadata)
+        for path in self._legacy_paths():
+            if os.path.exists(path):
+                os.remove(path)
+
+
+def _read_version(store, version, mmap=False):
+    path = store.versions_dir / version
+    flags = faiss.IO_FLAG_MMAP | faiss.IO_FLAG_READ_ONLY if mmap else 0
+    index = faiss.read_index(str(path / INDEX_FILE), flags)
+    with open(path / DOCS_FILE, "rb") as f:
+        metadata = pickle.load(f)
+    return index, metadata
+
+
+def load_local_vectors(directory=LOCAL_VECTOR_DIR):
+    """
+    Open the live version of a LocalFaissSink directory read-only; the index
+    is memory-mapped. Returns (index, metadata list).
+    """
+    store = VersionedIndex(directory)
+    version = store.current_version()
+    if version is None:
+        raise FileNotFoundError(f"No vectors published under {directory}")
+    return _read_version(store, version, mmap=True)
+
+
+def make_vector_sink(kind=VECTOR_SINK, dim=384):
+    """
+    Build the configured sink. Pinecone is imported only when selected, so the
+    FAISS sink works on machines without the client or network access.
+    """
+    if kind == "faiss":
+        print(f"[💾] Using local FAISS vector sink at {LOCAL_VECTOR_DIR}")
+        return LocalFaissSink(dim=dim)
+
+    from pinecone import Pinecone, ServerlessSpec
+
+    print("[🌐] Connecting to Pinecone...")
+    pc = Pinecone(api_key=os.getenv("PINECONE_API_KEY", "***"))
+    index_name = os.getenv("PINECONE_INDEX", "pdf-rag-index")
+
+    if index_name not in pc.list_indexes().names():
+        print(f"[📦] Index '{index_name}' not found. Creating...")
+        pc.create_index(
+            name=index_name,
+            dimension=dim,
+            metric="cosine",
+            spec=ServerlessSpec(cloud="aws", region="us-east-1")
+        )
+    else:
+        print(f"[📦] Index '{index_name}' found.")
+
+    return PineconeSink(pc.Index(index_name))
@@ -0,0 +1,230 @@
+# utils/blob_store.py
+#
+# Content-addressed storage for uploaded files. Each distinct content is kept
+# once under its SHA-256; a per-namespace catalog (SQLite, shared by every
+# worker process) maps upload names to blobs, and the name is materialised in
+# the upload directory as its own copy (a reflink where the filesystem allows
+# it), so existing readers of uploads/ and uploaded_kbs/ keep working.
+
+import fcntl
+import hashlib
+import json
+import os
+import shutil
+import sqlite3
+import tempfile
+import threading
+import time
+from contextlib import contextmanager
+from pathlib import Path
+from typing import Optional
+
+BLOB_STORE_DIR = Path(os.getenv("BLOB_STORE_DIR", "blob_store"))
+UPLOAD_READ_BLOCK = 1024 * 1024
+# Earlier versions kept per name; older ones (and metadata no name uses any more) are pruned
+BLOB_HISTORY_LIMIT = int(os.getenv("BLOB_HISTORY_LIMIT", 10))
+CATALOG_BUSY_TIMEOUT = 30
+FICLONE = 0x40049409  # Linux ioctl: share the source's extents instead of copying (btrfs, xfs)
+
+# Catalog namespaces, one per upload directory
+UPLOADS_NAMESPACE = "uploads"
+KB_NAMESPACE = "kb"
+
+_SCHEMA = """
+CREATE TABLE IF NOT EXISTS files (
+    namespace TEXT NOT NULL, name TEXT NOT NULL, blob TEXT NOT NULL,
+    size INTEGER NOT NULL, uploaded_at REAL NOT NULL,
+    PRIMARY KEY (namespace, name)
+);
+CREATE INDEX IF NOT EXISTS files_blob ON files (namespace, blob);
+CREATE TABLE IF NOT EXISTS file_history (
+    namespace TEXT NOT NULL, name TEXT NOT NULL, blob TEXT NOT NULL, uploaded_at REAL NOT NULL
+);
+CREATE INDEX IF NOT EXISTS file_history_name ON file_history (namespace, name, uploaded_at);
+CREATE INDEX IF NOT EXISTS file_history_blob ON file_history (namespace, blob);
+CREATE TABLE IF NOT EXISTS blobs (
+    namespace TEXT NOT NULL, blob TEXT NOT NULL, meta TEXT NOT NULL,
+    PRIMARY KEY (namespace, blob)
+);
+"""
+
+
+class UploadTooLarge(ValueError):
+    pass
+
+
+def blob_key(digest: str, ext: str = "") -> str:
+    """
+    Catalog key of a blob. Parsing depends on the extension, so the same bytes
+    uploaded as .csv and as .txt get separate metadata, previews and indexes.
+    """
+    return f"{digest}{ext.lower()}"
+
+
+class BlobStore:
+    """
+    blobs/<ab>/<sha256><ext>      one file per distinct content
+    catalog.sqlite3               files, file_history and blobs tables, per namespace
+
+    `files` holds the current blob of every name and `file_history` its
+    earlier versions; `blobs` holds per-content metadata keyed by blob_key()
+    and shared by every name with that content (size, parse preview, whether
+    it has been indexed and into how many chunks). Lookups are indexed point
+    queries and each update touches only its own rows; SQLite's file locking
+    serialises writers across the prefork workers.
+    """
+
+    def __init__(self, root: Path = BLOB_STORE_DIR):
+        self.root = Path(root)
+        self.blob_dir = self.root / "blobs"
+        self.tmp_dir = self.root / "tmp"
+        for d in (self.blob_dir, self.tmp_dir):
+            d.mkdir(parents=True, exist_ok=True)
+        self.catalog_path = self.root / "catalog.sqlite3"
+        # sqlite3 connections must cross neither threads nor forks: one per (process, thread)
+        self._local = threading.local()
+        db = self._db()
+        db.execute("PRAGMA journal_mode=WAL")
+        db.executescript(_SCHEMA)
+
+    # ------------------------------
+    # Blobs
+    # ------------------------------
+    def blob_path(self, digest: str, ext: str = "") -> Path:
+        return self.blob_dir / digest[:2] / blob_key(digest, ext)
+
+    async def put_upload(self, upload, max_bytes: Optional[int] = None):
+        """
+        Stream a FastAPI UploadFile into the store, hashing while writing.
+        Returns (digest, blob_path, size, is_new). Raises UploadTooLarge as
+        soon as `max_bytes` is exceeded, without buffering the whole body.
+        """
+        digest = hashlib.sha256()
+        size = 0
+        fd, tmp_name = tempfile.mkstemp(dir=self.tmp_dir)
+        try:
+            with os.fdopen(fd, "wb") as out:
+                while True:
+                    block = await upload.read(UPLOAD_READ_BLOCK)
+                    if not block:
+                        break
+                    size += len(block)
+                    if max_bytes is not None and size > max_bytes:
+                        raise UploadTooLarge(f"Upload exceeds {max_bytes} bytes")
+                    digest.update(block)
+                    out.write(block)
+            return self._commit_blob(tmp_name, digest.hexdigest(), Path(upload.filename).suffix, size)
+        finally:
+            if os.path.exists(tmp_name):
+                os.remove(tmp_name)
+
+    def _commit_blob(self, tmp_name, digest, ext, size):
+        path = self.blob_path(digest, ext)
+        if path.exists():
+            return digest, path, size, False
+        path.parent.mkdir(parents=True, exist_ok=True)
+        os.replace(tmp_name, path)
+        return digest, path, size, True
+
+    # ------------------------------
+    # Catalog
+    # ------------------------------
+    def _db(self) -> sqlite3.Connection:
+        db = getattr(self._local, "db", None)
+        if db is None or self._local.pid != os.getpid():
+            db = sqlite3.connect(self.catalog_path, timeout=CATALOG_BUSY_TIMEOUT, isolation_level=None)
+            self._local.db, self._local.pid = db, os.getpid()
+        return db
+
+    @contextmanager
+    def _write(self):
+        # BEGIN IMMEDIATE takes the write lock up front, so read-modify-write
+        # sequences cannot interleave between workers
+        db = self._db()
+        db.execute("BEGIN IMMEDIATE")
+        try:
+            yield db
+        except BaseException:
+            db.execute("ROLLBACK")
+            raise
+        db.execute("COMMIT")
+
+    def register(self, namespace: str, filename: str, key: str, size: int) -> dict:
+        """
+        Point `filename` at the blob `key`, keeping the previous one in its
+        history (the newest BLOB_HISTORY_LIMIT versions).
+        """
+        now = time.time()
+        with self._write() as db:
+            row = db.execute(
+                "SELECT blob, uploaded_at FROM files WHERE namespace = ? AND name = ?", (namespace, filename)
+            ).fetchone()
+            if row and row[0] != key:
+                db.execute("INSERT INTO file_history VALUES (?, ?, ?, ?)", (namespace, filename, *row))
+                self._prune_history(db, namespace, filename)
+            db.execute(
+                "INSERT OR REPLACE INTO files VALUES (?, ?, ?, ?, ?)", (namespace, filename, key, size, now)
+            )
+            db.execute(
+                "INSERT OR IGNORE INTO blobs VALUES (?, ?, ?)", (namespace, key, json.dumps({"size": size}))
+            )
+        return {"blob": key, "size": size, "uploaded_at": now}
+
+    def _prune_history(self, db, namespace: str, filename: str):
+        dropped = db.execute(
+            "SELECT rowid, blob FROM file_history WHERE namespace = ? AND name = ? "
+            "ORDER BY uploaded_at DESC LIMIT -1 OFFSET ?",
+            (namespace, filename, BLOB_HISTORY_LIMIT),
+        ).fetchall()
+        for rowid, key in dropped:
+            db.execute("DELETE FROM file_history WHERE rowid = ?", (rowid,))
+            db.execute(
+                "DELETE FROM blobs WHERE namespace = ?1 AND blob = ?2 "
+                "AND NOT EXISTS (SELECT 1 FROM files WHERE namespace = ?1 AND blob = ?2) "
+                "AND NOT EXISTS (SELECT 1 FROM file_history WHERE namespace = ?1 AND blob = ?2)",
+                (namespace, key),
+            )
+
+    def resolve(self, namespace: str, filename: str) -> Optional[str]:
+        row = self._db().execute(
+            "SELECT blob FROM files WHERE namespace = ? AND name = ?", (namespace, filename)
+        ).fetchone()
+        return row[0] if row else None
+
+    def blob_meta(self, namespace: str, key: str) -> dict:
+        row = self._db().execute(
+            "SELECT meta FROM blobs WHERE namespace = ? AND blob = ?", (namespace, key)
+        ).fetchone()
+        return json.loads(row[0]) if row else {}
+
+    def update_blob_meta(self, namespace: str, key: str, **fields):
+        with self._write() as db:
+            row = db.execute("SELECT meta FROM blobs WHERE namespace = ? AND blob = ?", (namespace, key)).fetchone()
+            meta = {**(json.loads(row[0]) if row else {}), **fields}
+            db.execute("INSERT OR REPLACE INTO blobs VALUES (?, ?, ?)", (namespace, key, json.dumps(meta)))
+
+    # ------------------------------
+    # Named copies
+    # ------------------------------
+    def materialize(self, blob_path: Path, target: Path):
+        """
+        Make `target` a copy of the blob: a reflink where the filesystem
+        supports it, otherwise a plain copy. Never a hard link, so writing to
+        `target` in place cannot change the shared blob. Replaces any
+        existing file atomically.
+        """
+        target.parent.mkdir(parents=True, exist_ok=True)
+        tmp_target = target.with_name(f".{target.name}.{os.getpid()}.tmp")
+        try:
+            with open(blob_path, "rb") as src, open(tmp_target, "wb") as dst:
+                try:
+                    fcntl.ioctl(dst.fileno(), FICLONE, src.fileno())
+                except OSError:
+                    shutil.copyfileobj(src, dst)
+            os.replace(tmp_target, target)
+        finally:
+            if os.path.exists(tmp_target):
+                os.remove(tmp_target)
+
+
+blob_store = BlobStore()
@@ -0,0 +1,154 @@
+# utils/chunker.py
+
+from typing import Iterable, List
+import json
+
+from nltk.tokenize import sent_tokenize
+
+# all-MiniLM-L6-v2 truncates at 256 tokens, two of which are [CLS]/[SEP]
+MAX_TOKENS = 254
+OVERLAP_TOKENS = 32
+TOKENIZER_NAME = "sentence-transformers/all-MiniLM-L6-v2"
+IMAGE_TYPES = {"png", "jpg", "jpeg", "gif", "bmp"}
+
+_tokenizer = None
+
+
+def get_tokenizer():
+    """
+    Tokenizer of the embedding model, loaded on first use.
+    """
+    global _tokenizer
+    if _tokenizer is None:
+        from transformers import AutoTokenizer
+        _tokenizer = AutoTokenizer.from_pretrained(TOKENIZER_NAME)
+    return _tokenizer
+
+
+# ------------------------------
+# Token-level helpers
+# ------------------------------
+def _split_long_unit(text: str, tokenizer, max_tokens: int, overlap: int) -> List[str]:
+    """
+    Cut a single oversized sentence/record at token boundaries, slicing the
+    original string with the tokenizer's character offsets.
+    """
+    offsets = tokenizer(text, add_special_tokens=False, return_offsets_mapping=True)["offset_mapping"]
+    step = max(max_tokens - overlap, 1)
+    pieces = []
+    for start in range(0, len(offsets), step):
+        window = offsets[start:start + max_tokens]
+        pieces.append(text[window[0][0]:window[-1][1]].strip())
+        if start + max_tokens >= len(offsets):
+            break
+    return [p for p in pieces if p]
+
+
+def pack_units(units: List[str], tokenizer=None, max_tokens: int = MAX_TOKENS,
+               overlap: int = OVERLAP_TOKENS, separator: str = " ") -> List[str]:
+    """
+    Greedily pack text units (sentences, rows, records) into chunks of at most
+    `max_tokens` tokens. Consecutive chunks share up to `overlap` tokens of
+    trailing units. All units are tokenized in one batch call and each unit is
+    visited once, so the cost is linear in the input.
+    """
+    units = [u.strip() for u in units if u and u.strip()]
+    if not units:
+        return []
+    tokenizer = tokenizer or get_tokenizer()
+    lengths = [len(ids) for ids in tokenizer(units, add_special_tokens=False)["input_ids"]]
+    # The separator costs roughly one token between units
+    sep_cost = 1 if separator.strip() else 0
+
+    chunks = []
+    current, current_lengths, current_tokens = [], [], 0
+
+    def emit():
+        chunks.append(separator.join(current))
+
+    for unit, length in zip(units, lengths):
+        if length > max_tokens:
+            if current:
+                emit()
+                current, current_lengths, current_tokens = [], [], 0
+            chunks.extend(_split_long_unit(unit, tokenizer, max_tokens, overlap))
+            continue
+
+        if current and current_tokens + sep_cost + length > max_tokens:
+            emit()
+            # Carry trailing units forward as overlap
+            carried, carried_lengths, carried_tokens = [], [], 0
+            for prev, prev_length in zip(reversed(current), reversed(current_lengths)):
+                if carried_tokens + prev_length + sep_cost > overlap or carried_tokens + prev_length + length > max_tokens:
+                    break
+                carried.insert(0, prev)
+                carried_lengths.insert(0, prev_length)
+                carried_tokens += prev_length + sep_cost
+            current, current_lengths, current_tokens = carried, carried_lengths, carried_tokens
+
+        current.append(unit)
+        current_lengths.append(length)
+        current_tokens += length + (sep_cost if len(current) > 1 else 0)
+
+    if current:
+        emit()
+    return chunks
+
+
+# ------------------------------
+# Structure-aware entry points
+# ------------------------------
+def chunk_text(text: str, tokenizer=None, max_tokens: int = MAX_TOKENS, overlap: int = OVERLAP_TOKENS) -> List[str]:
+    """
+    Sentence-aligned chunks of plain text that fit the embedding model.
+    """
+    return pack_units(sent_tokenize(text), tokenizer, max_tokens, overlap)
+
+
+def record_to_text(record) -> str:
+    if isinstance(record, dict):
+        return "; ".join(f"{k}: {v}" for k, v in record.items() if v is not None and v == v)
+    if isinstance(record, (list, tuple)):
+        return "; ".join(str(v) for v in record)
+    return str(record)
+
+
+def chunk_records(records: Iterable, tokenizer=None, max_tokens: int = MAX_TOKENS, overlap: int = 0) -> List[str]:
+    """
+    Chunks of CSV rows / JSON records. A record is never split across chunks
+    unless it alone exceeds `max_tokens`. No overlap by default: rows are
+    self-contained.
+    """
+    return pack_units([record_to_text(r) for r in records], tokenizer, max_tokens, overlap, separator="\n")
+
+
+def chunk_pages(pages: Iterable[str], tokenizer=None, max_tokens: int = MAX_TOKENS,
+                overlap: int = OVERLAP_TOKENS) -> List[str]:
+    """
+    Chunks of PDF pages; chunks never span two pages.
+    """
+    chunks = []
+    for page_text in pages:
+        if page_text:
+            chunks.extend(chunk_text(page_text, tokenizer, max_tokens, overlap))
+    return chunks
+
+
+def chunk_parsed(parsed: dict, tokenizer=None, max_tokens: int = MAX_TOKENS) -> List[str]:
+    """
+    Chunk the output of utils.file_parser.parse_file according to its type.
+    """
+    file_type = parsed.get("type")
+    preview = parsed.get("preview")
+
+    if file_type in IMAGE_TYPES:
+        return []
+    if file_type in ("csv", "xlsx", "json"):
+        return chunk_records(preview or [], tokenizer, max_tokens)
+    if file_type == "pdf":
+        return chunk_pages([p.get("text", "") for p in preview or [] if p.get("text") != "[Empty]"], tokenizer, max_tokens)
+    if file_type == "txt":
+        return chunk_text("\n".join(p.get("line", "") for p in preview or []), tokenizer, max_tokens)
+    if isinstance(preview, (dict, list)):
+        return chunk_text(json.dumps(preview, default=str), tokenizer, max_tokens)
+    return chunk_text(str(preview or ""), tokenizer, max_tokens)
@@ -3,39 +3,45 @@
 import os
 import faiss
 import pickle
-from sentence_transformers import SentenceTransformer
 from typing import List, Tuple
 import numpy as np
-import nltk
-from nltk.tokenize import sent_tokenize
+from utils.chunker import chunk_text as token_chunk_text, MAX_TOKENS, OVERLAP_TOKENS
+from utils.blob_store import blob_store, UPLOADS_NAMESPACE
+from services.model_registry import model_registry
 
-# Load embedding model
-EMBED_MODEL = SentenceTransformer("all-MiniLM-L6-v2")
+# Embedding model (all-MiniLM-L6-v2), loaded on first use
+def get_embed_model():
+    return model_registry.get("embedder")
 
 # Output directory
 VECTOR_DIR = "vector_stores"
 os.makedirs(VECTOR_DIR, exist_ok=True)
 
 # ------------------------------
-# Text Chunking using NLTK
+# Text Chunking (token-aware, see utils/chunker.py)
 # ------------------------------
-def chunk_text(text: str, chunk_size=500) -> List[str]:
+def chunk_text(text: str, max_tokens: int = MAX_TOKENS, overlap: int = OVERLAP_TOKENS) -> List[str]:
     """
-    Split text into chunks using NLTK sentence tokenizer.
-    Each chunk tries not to exceed the given chunk size.
+    Split text into sentence-aligned chunks that fit the embedding model's
+    token window, measured with the model's own tokenizer.
     """
-    sentences = sent_tokenize(text)
-    chunks = []
-    current = ""
-    for sentence in sentences:
-        if len(current) + len(sentence) <= chunk_size:
-            current += sentence + " "
-        else:
-            chunks.append(current.strip())
-            current = sentence + " "
-    if current:
-        chunks.append(current.strip())
-    return chunks
+    return token_chunk_text(text, get_embed_model().tokenizer, max_tokens, overlap)
+
+# ------------------------------
+# Index ids
+# ------------------------------
+def resolve_file_id(file_id: str) -> str:
+    """
+    Indexes are stored under the blob key (content hash + extension) of the
+    uploaded file; clients still ask by file name, which the upload catalog
+    maps to that key.
+    """
+    return blob_store.resolve(UPLOADS_NAMESPACE, file_id) or file_id
+
+
+def index_exists(file_id: str) -> bool:
+    file_id = resolve_file_id(file_id)
+    return os.path.exists(f"{VECTOR_DIR}/{file_id}.index") and os.path.exists(f"{VECTOR_DIR}/{file_id}_chunks.pkl")
 
 # ------------------------------
 # Save Embeddings
@@ -44,7 +50,7 @@ def save_embeddings(file_id: str, chunks: List[str]):
     """
     Compute and store embeddings using FAISS and pickle.
     """
-    embeddings = EMBED_MODEL.encode(chunks)
+    embeddings = get_embed_model().encode(chunks)
     dim = embeddings.shape[1]
     index = faiss.IndexFlatL2(dim)
     index.add(embeddings)
@@ -63,6 +69,7 @@ def load_index(file_id: str) -> Tuple[faiss.IndexFlatL2, List[str]]:
     """
     Load FAISS index and corresponding text chunks.
     """
+    file_id = resolve_file_id(file_id)
     index = faiss.read_index(f"{VECTOR_DIR}/{file_id}.index")
     with open(f"{VECTOR_DIR}/{file_id}_chunks.pkl", "rb") as f:
         chunks = pickle.load(f)
@@ -75,7 +82,7 @@ def embed_question(question: str) -> np.ndarray:
     """
     Convert a single question into its embedding.
     """
-    return EMBED_MODEL.encode([question])
+    return get_embed_model().encode([question])
 
 # ------------------------------
 # Query Vector Store
@@ -84,6 +91,7 @@ def query_embeddings(file_id, query, top_k=5):
     """
     Search top-k most relevant text chunks for a query.
     """
+    file_id = resolve_file_id(file_id)
     index_path = f"{VECTOR_DIR}/{file_id}.index"
     data_path = f"{VECTOR_DIR}/{file_id}_chunks.pkl"
     print(f"[🔍] Searching in: {index_path}")
@@ -95,7 +103,7 @@ def query_embeddings(file_id, query, top_k=5):
     with open(data_path, "rb") as f:
         chunks = pickle.load(f)
 
-    query_vector = EMBED_MODEL.encode([query])
+    query_vector = get_embed_model().encode([query])
     D, I = index.search(query_vector, top_k)
 
     return [chunks[i] for i in I[0]]
@@ -1,12 +1,12 @@
 import pandas as pd
 import json
 from pathlib import Path
-import PyPDF2
-import base64
-from PIL import Image
-from io import BytesIO
 import math
+import re
 import numpy as np
+from itertools import islice
+from utils.pdf_extract import iter_pdf_pages
+from utils.image_preview import image_preview
 
 # ==========================================
 # 💡 Support Assistant Project .gitignore
@@ -28,15 +28,160 @@ def clean_json(obj):
         else:
             return obj
 
+JSON_READ_BLOCK = 64 * 1024
+# Outside strings: a whole string (possibly cut off by the block end) or a bracket
+_JSON_TOKEN = re.compile(r'"[^"\\]*(?:\\.[^"\\]*)*(?:"|(\\?)\Z)|[\[\]{}]', re.S)
+_JSON_STRING_REST = re.compile(r'[^"\\]*(?:\\.[^"\\]*)*(?:"|(\\?)\Z)', re.S)
+_JSON_SCALAR_END = re.compile(r'[,:\]}\s]')
+
+
+def _scan_json_value(text, i, state):
+    """
+    Advance the scan of one JSON value through `text` from index `i`.
+    `state` carries depth / string / escape / scalar flags across blocks, so
+    a value split over many blocks is scanned exactly once. Returns the end
+    index in `text`, or None if the value continues past it.
+    """
+    if state["scalar"]:
+        m = _JSON_SCALAR_END.search(text, i)
+        return m.start() if m else None
+    if state["in_string"]:
+        if state["escaped"]:
+            if i >= len(text):
+                return None
+            state["escaped"] = False
+            i += 1
+        m = _JSON_STRING_REST.match(text, i)
+        if m.group().endswith('"') and m.group(1) is None:
+            state["in_string"] = False
+            i = m.end()
+            if state["depth"] == 0:
+                return i
+        else:
+            state["escaped"] = m.group(1) == "\\"
+            return None
+    while True:
+        m = _JSON_TOKEN.search(text, i)
+        if not m:
+            return None
+        token, i = m.group(), m.end()
+        if token[0] == '"':
+            if m.group(1) is not None:
+                # String runs past the block end
+                state["in_string"] = True
+                state["escaped"] = m.group(1) == "\\"
+                return None
+            if state["depth"] == 0:
+                return i
+        elif token in "[{":
+            state["depth"] += 1
+        else:
+            state["depth"] -= 1
+            if state["depth"] == 0:
+                return i
+
+
+def iter_json_prefix(f, limit=None):
+    """
+    Incrementally parse a top-level JSON array or object, reading the file in
+    blocks and stopping after `limit` items. Yields array elements, or
+    {key: value} pairs for an object. Only the bytes up to the last item read
+    are consumed, so the cost does not depend on file size. Each element is
+    scanned once to find its end and decoded once, so a large element costs
+    time linear in its size however many blocks it spans.
+    """
+    decoder = json.JSONDecoder()
+    buf, pos, eof = "", 0, False
+
+    def fill():
+        nonlocal buf, pos, eof
+        block = f.read(JSON_READ_BLOCK)
+        if not block:
+            eof = True
+        buf = buf[pos:] + block
+        pos = 0
+
+    def skip_ws():
+        nonlocal pos
+        while True:
+            while pos < len(buf) and buf[pos] in " \t\r\n":
+                pos += 1
+            if pos < len(buf) or eof:
+                return
+            fill()
+
+    def expect(chars):
+        nonlocal pos
+        skip_ws()
+        if pos >= len(buf) or buf[pos] not in chars:
+            raise ValueError("Unsupported JSON structure")
+        pos += 1
+        return buf[pos - 1]
+
+    def value():
+        nonlocal buf, pos, eof
+        skip_ws()
+        if pos >= len(buf):
+            raise ValueError("Unexpected end of JSON")
+        first = buf[pos]
+        state = {"depth": 0, "in_string": False, "escaped": False, "scalar": first not in '"[{'}
+        # Blocks the value spans are collected and joined once, not re-concatenated per block
+        parts, text, i = [], buf[pos:], 0
+        while True:
+            end = _scan_json_value(text, i, state)
+            if end is not None or eof:
+                break
+            parts.append(text)
+            text = f.read(JSON_READ_BLOCK)
+            if not text:
+                eof = True
+            i = 0
+        buf = "".join(parts) + text if parts else text
+        obj, pos = decoder.raw_decode(buf, 0)
+        return obj
+
+    fill()
+    opening = expect("[{")
+    closing = "]" if opening == "[" else "}"
+    skip_ws()
+    if pos < len(buf) and buf[pos] == closing:
+        return
+
+    count = 0
+    while limit is None or count < limit:
+        if opening == "[":
+            yield value()
+        else:
+            key = value()
+            expect(":")
+            yield {key: value()}
+        count += 1
+        if expect("," + closing) == closing:
+            return
+
+
+def _read_xlsx_rows(file_path, limit=None):
+    # Read-only mode streams the first sheet; only `limit` rows are touched
+    from openpyxl import load_workbook
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(next(rows, ()))]
+        return [dict(zip(header, row)) for row in islice(rows, limit)]
+    finally:
+        wb.close()
+
+
 def parse_file(file_path: Path, limit: int = 10):
     """
     Parses files (.csv, .xlsx, .json, .txt, .pdf, image) and returns a preview of first `limit` records or metadata.
+    Only the first `limit` records are read from disk; pass limit=None for the full content.
     author: 
         shivam srivastav
         date: 2025-07-01
     Args:
         file_path (Path): Path to the uploaded file
-        limit (int): Max number of records or preview lines
+        limit (int | None): Max number of records or preview lines, None for all
 
     Returns:
         dict: {
@@ -49,51 +194,31 @@ def parse_file(file_path: Path, limit: int = 10):
 
     try:
         if ext == ".csv":
-            df = pd.read_csv(file_path)
-            preview_data = df.head(limit).to_dict(orient="records")
+            df = pd.read_csv(file_path, nrows=limit)
+            preview_data = df.to_dict(orient="records")
 
         elif ext == ".xlsx":
-            df = pd.read_excel(file_path)
-            preview_data = df.head(limit).to_dict(orient="records")
+            preview_data = _read_xlsx_rows(file_path, limit)
 
         elif ext == ".json":
             with open(file_path, "r", encoding="utf-8") as f:
-                data = json.load(f)
-                if isinstance(data, list):
-                    preview_data = data[:limit]
-                elif isinstance(data, dict):
-                    preview_data = [{k: data[k]} for k in list(data.keys())[:limit]]
-                else:
-                    raise ValueError("Unsupported JSON structure")
+                preview_data = list(iter_json_prefix(f, limit))
 
         elif ext == ".txt":
             with open(file_path, "r", encoding="utf-8") as f:
-                lines = f.readlines()
-                preview_data = [{"line": line.strip()} for line in lines[:limit]]
+                preview_data = [{"line": line.strip()} for line in islice(f, limit)]
 
         elif ext == ".pdf":
             preview_data = []
-            with open(file_path, "rb") as f:
-                reader = PyPDF2.PdfReader(f)
-                for page_num in range(min(limit, len(reader.pages))):
-                    page = reader.pages[page_num]
-                    text = page.extract_text()
-                    preview_data.append({
-                        "page": page_num + 1,
-                        "text": text.strip() if text else "[Empty]"
-                    })
+            for page_num, text in iter_pdf_pages(file_path, max_pages=limit):
+                preview_data.append({
+                    "page": page_num,
+                    "text": text.strip() if text else "[Empty]"
+                })
 
         elif ext in [".png", ".jpg", ".jpeg", ".gif", ".bmp"]:
-            with Image.open(file_path) as img:
-                buffered = BytesIO()
-                img.save(buffered, format=img.format)
-                encoded_image = base64.b64encode(buffered.getvalue()).decode("utf-8")
-                preview_data = {
-                    "format": img.format,
-                    "mode": img.mode,
-                    "size": img.size,
-                    "preview_base64": f"data:image/{img.format.lower()};base64,{encoded_image}"
-                }
+            # Responses carry a thumbnail URL instead of the inlined image
+            preview_data = image_preview(file_path)
 
         else:
             raise ValueError(f"Unsupported file type: {ext}")
@@ -0,0 +1,14 @@
+# utils/hashing.py
+
+import hashlib
+
+
+def file_sha256(file_path, block_size=1024 * 1024) -> str:
+    """
+    SHA-256 of a file, read in blocks so large files are never held in memory.
+    """
+    digest = hashlib.sha256()
+    with open(file_path, "rb") as f:
+        for block in iter(lambda: f.read(block_size), b""):
+            digest.update(block)
+    return digest.hexdigest()
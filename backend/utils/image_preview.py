@@ -0,0 +1,50 @@
+# utils/image_preview.py
+
+import os
+from pathlib import Path
+
+from PIL import Image
+
+from utils.hashing import file_sha256
+
+# Thumbnails live under the /uploads static mount so they are served by URL
+UPLOADS_ROOT = Path("uploads")
+THUMBNAIL_DIR = UPLOADS_ROOT / "thumbnails"
+THUMBNAIL_URL_PREFIX = "/uploads/thumbnails"
+THUMBNAIL_MAX_SIZE = int(os.getenv("THUMBNAIL_MAX_SIZE", 320))  # longest edge, px
+
+
+def image_preview(file_path: Path, max_size: int = THUMBNAIL_MAX_SIZE) -> dict:
+    """
+    Metadata plus a URL to a bounded-size thumbnail of the image.
+    The thumbnail is generated once per distinct file content (SHA-256) and
+    reused on every later call.
+    """
+    digest = file_sha256(file_path)
+
+    with Image.open(file_path) as img:
+        original_format, original_mode, original_size = img.format, img.mode, img.size
+
+        has_alpha = img.mode in ("RGBA", "LA", "P") and ("transparency" in img.info or img.mode != "P")
+        ext = "png" if has_alpha else "jpg"
+        thumb_name = f"{digest}_{max_size}.{ext}"
+        thumb_path = THUMBNAIL_DIR / thumb_name
+
+        if not thumb_path.exists():
+            # JPEG can decode straight at a reduced scale, skipping most of the pixels
+            img.draft("RGB", (max_size, max_size))
+            img.thumbnail((max_size, max_size))
+            thumb = img.convert("RGBA" if has_alpha else "RGB")
+
+            THUMBNAIL_DIR.mkdir(parents=True, exist_ok=True)
+            tmp_path = thumb_path.with_suffix(f".{os.getpid()}.tmp")
+            thumb.save(tmp_path, format="PNG" if has_alpha else "JPEG", quality=85, optimize=True)
+            os.replace(tmp_path, thumb_path)
+
+    return {
+        "format": original_format,
+        "mode": original_mode,
+        "size": original_size,
+        "sha256": digest,
+        "thumbnail_url": f"{THUMBNAIL_URL_PREFIX}/{thumb_name}",
+    }
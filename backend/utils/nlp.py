@@ -1,12 +1,11 @@
-from random import choice
-from sentence_transformers import SentenceTransformer
+from services.model_registry import model_registry
+from services.sentiment import to_label
 
-# Load BERT embedding model once
-embed_model = SentenceTransformer('all-MiniLM-L6-v2')
+# BERT embedding model (all-MiniLM-L6-v2) and the sentiment classifier are shared through the model registry
 
 def analyze_sentiment(text: str) -> str:
-    # Replace this with actual sentiment model
-    return choice(["positive", "neutral", "negative"])
+    # Blocking; async code should await services.message_analysis.message_analysis.analyze (batched + cached)
+    return to_label(model_registry.get("sentiment_classifier")(text, truncation=True)[0])
 
 def compute_embedding(text: str):
-    return embed_model.encode(text).tolist()
+    return model_registry.get("embedder").encode(text).tolist()
@@ -0,0 +1,118 @@
+# utils/pdf_extract.py
+
+import json
+import multiprocessing
+import os
+from collections import deque
+from concurrent.futures import ProcessPoolExecutor
+from pathlib import Path
+from typing import Iterator, Tuple
+
+import PyPDF2
+
+from utils.hashing import file_sha256
+
+PDF_TEXT_CACHE_DIR = Path(os.getenv("PDF_TEXT_CACHE_DIR", "vector_stores/pdf_text_cache"))
+PDF_WORKERS = int(os.getenv("PDF_WORKERS", os.cpu_count() or 1))
+# Each task opens and parses the whole PDF once, so a document is split into
+# at most PDF_WORKERS contiguous ranges of at least this many pages
+MIN_PAGES_PER_TASK = int(os.getenv("PDF_MIN_PAGES_PER_TASK", 16))
+
+_pool = None
+
+
+def _get_pool():
+    # One pool per process, created on first PDF. Workers are started with
+    # forkserver/spawn: forking a threaded server process can deadlock the
+    # child on a lock some other thread held at fork time.
+    global _pool
+    if _pool is None:
+        methods = multiprocessing.get_all_start_methods()
+        context = multiprocessing.get_context("forkserver" if "forkserver" in methods else "spawn")
+        _pool = ProcessPoolExecutor(max_workers=PDF_WORKERS, mp_context=context)
+    return _pool
+
+
+def _extract_page_range(file_path: str, start: int, end: int):
+    """
+    Runs in a worker process: text of pages [start, end).
+    """
+    with open(file_path, "rb") as f:
+        reader = PyPDF2.PdfReader(f)
+        return [(page_num + 1, reader.pages[page_num].extract_text() or "") for page_num in range(start, end)]
+
+
+def _page_ranges(page_count):
+    per_task = max(MIN_PAGES_PER_TASK, -(-page_count // PDF_WORKERS))
+    return deque((start, min(start + per_task, page_count)) for start in range(0, page_count, per_task))
+
+
+def _page_count(file_path) -> int:
+    with open(file_path, "rb") as f:
+        return len(PyPDF2.PdfReader(f).pages)
+
+
+def _read_cache(cache_path, max_pages=None):
+    with open(cache_path, "r", encoding="utf-8") as f:
+        for i, line in enumerate(f):
+            if max_pages is not None and i >= max_pages:
+                return
+            page = json.loads(line)
+            yield page["page"], page["text"]
+
+
+def iter_pdf_pages(file_path, max_pages: int = None, digest: str = None) -> Iterator[Tuple[int, str]]:
+    """
+    Yield (page_number, text) in page order.
+
+    Previews (`max_pages` set) read just those pages in-process; they use the
+    text cache only when the caller already knows the file's SHA-256
+    (`digest`), so a preview never hashes the whole file.
+
+    Full extractions are served from the cache when this exact file was
+    extracted before. Otherwise the pages are split into a few large ranges
+    extracted in a process pool, pages are yielded as soon as their range is
+    done, and the result is written to the cache.
+    """
+    file_path = str(file_path)
+    if max_pages is not None:
+        cache_path = PDF_TEXT_CACHE_DIR / f"{digest}.jsonl" if digest else None
+        if cache_path and cache_path.exists():
+            yield from _read_cache(cache_path, max_pages)
+            return
+        with open(file_path, "rb") as f:
+            reader = PyPDF2.PdfReader(f)
+            for page_num in range(min(max_pages, len(reader.pages))):
+                yield page_num + 1, reader.pages[page_num].extract_text() or ""
+        return
+
+    cache_path = PDF_TEXT_CACHE_DIR / f"{digest or file_sha256(file_path)}.jsonl"
+    if cache_path.exists():
+        yield from _read_cache(cache_path)
+        return
+
+    ranges = _page_ranges(_page_count(file_path))
+    PDF_TEXT_CACHE_DIR.mkdir(parents=True, exist_ok=True)
+    tmp_path = cache_path.with_suffix(f".{os.getpid()}.tmp")
+    cache_file = open(tmp_path, "w", encoding="utf-8")
+
+    pool = _get_pool()
+    pending = deque()
+    completed = False
+    try:
+        while ranges or pending:
+            while ranges and len(pending) < PDF_WORKERS:
+                start, end = ranges.popleft()
+                pending.append(pool.submit(_extract_page_range, file_path, start, end))
+            for page_num, text in pending.popleft().result():
+                cache_file.write(json.dumps({"page": page_num, "text": text}) + "\n")
+                yield page_num, text
+        completed = True
+    finally:
+        for future in pending:
+            future.cancel()
+        cache_file.close()
+        if completed:
+            os.replace(tmp_path, cache_path)
+        else:
+            os.remove(tmp_path)
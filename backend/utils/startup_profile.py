@@ -0,0 +1,99 @@
+# utils/startup_profile.py
+#
+# Import-time profile of worker startup. With STARTUP_PROFILE=1 every module
+# imported between start() and stop() is timed (inclusive and self time);
+# otherwise only the total is recorded.
+
+import os
+import sys
+import time
+from importlib.abc import MetaPathFinder
+
+STARTUP_PROFILE = os.getenv("STARTUP_PROFILE", "0") == "1"
+REPORT_TOP = int(os.getenv("STARTUP_PROFILE_TOP", 25))
+
+
+class _ImportTimer(MetaPathFinder):
+    """
+    Meta-path hook that lets the normal finders resolve each module and wraps
+    the resulting loader's exec_module with a timer.
+    """
+
+    def __init__(self):
+        self.timings = {}       # module -> [inclusive_s, self_s]
+        self._stack = []        # child time accumulated per active import
+        self._resolving = set()
+
+    def find_spec(self, fullname, path, target=None):
+        if fullname in self._resolving:
+            return None
+        self._resolving.add(fullname)
+        try:
+            for finder in sys.meta_path:
+                if finder is self or not hasattr(finder, "find_spec"):
+                    continue
+                spec = finder.find_spec(fullname, path, target)
+                if spec is not None:
+                    break
+            else:
+                return None
+        finally:
+            self._resolving.discard(fullname)
+
+        loader = spec.loader
+        # Builtin/frozen importers are classes shared by every module; leave them alone
+        if loader is None or isinstance(loader, type) or not hasattr(loader, "exec_module"):
+            return spec
+        loader.exec_module = self._timed(fullname, loader.exec_module)
+        return spec
+
+    def _timed(self, fullname, exec_module):
+        def timed_exec_module(module):
+            self._stack.append(0.0)
+            start = time.perf_counter()
+            try:
+                return exec_module(module)
+            finally:
+                elapsed = time.perf_counter() - start
+                children = self._stack.pop()
+                if self._stack:
+                    self._stack[-1] += elapsed
+                self.timings[fullname] = [elapsed, elapsed - children]
+        return timed_exec_module
+
+
+class StartupProfile:
+    def __init__(self, enabled=STARTUP_PROFILE):
+        self.enabled = enabled
+        self._timer = None
+        self._start = None
+        self.import_seconds = None
+
+    def start(self):
+        self._start = time.perf_counter()
+        if self.enabled and self._timer is None:
+            self._timer = _ImportTimer()
+            sys.meta_path.insert(0, self._timer)
+
+    def stop(self):
+        if self._start is not None and self.import_seconds is None:
+            self.import_seconds = time.perf_counter() - self._start
+        if self._timer is not None and self._timer in sys.meta_path:
+            sys.meta_path.remove(self._timer)
+
+    def report(self, top=REPORT_TOP):
+        modules = []
+        if self._timer is not None:
+            ranked = sorted(self._timer.timings.items(), key=lambda kv: kv[1][1], reverse=True)[:top]
+            modules = [
+                {"module": name, "self_ms": round(self_s * 1000, 1), "inclusive_ms": round(incl_s * 1000, 1)}
+                for name, (incl_s, self_s) in ranked
+            ]
+        return {
+            "import_seconds": round(self.import_seconds, 3) if self.import_seconds is not None else None,
+            "profiled": self._timer is not None,
+            "modules": modules,
+        }
+
+
+startup_profile = StartupProfile()
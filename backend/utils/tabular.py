@@ -0,0 +1,123 @@
+# utils/tabular.py
+
+from pathlib import Path
+from typing import Dict, Iterator, List, Optional
+
+import pandas as pd
+
+CHUNK_ROWS = 50_000
+
+
+# ------------------------------
+# Headers
+# ------------------------------
+def _xlsx_header(cells) -> List[str]:
+    # Blank header cells get pandas-style names so every column stays addressable
+    return [str(c) if c is not None else f"Unnamed: {i}" for i, c in enumerate(cells)]
+
+
+def read_columns(file_path) -> List[str]:
+    """
+    Column names without loading any data rows.
+    """
+    file_path = Path(file_path)
+    ext = file_path.suffix.lower()
+    if ext == ".csv":
+        return list(pd.read_csv(file_path, nrows=0).columns)
+    if ext == ".xlsx":
+        from openpyxl import load_workbook
+        wb = load_workbook(file_path, read_only=True, data_only=True)
+        try:
+            return _xlsx_header(next(wb.worksheets[0].iter_rows(max_row=1, values_only=True), ()))
+        finally:
+            wb.close()
+    if ext in (".json", ".jsonl"):
+        return list(next(iter_table_chunks(file_path, chunksize=1), pd.DataFrame()).columns)
+    raise ValueError(f"Unsupported tabular format: {ext}")
+
+
+# ------------------------------
+# Chunked readers
+# ------------------------------
+def _iter_xlsx_chunks(file_path, columns, chunksize) -> Iterator[pd.DataFrame]:
+    # openpyxl read-only mode streams rows instead of building the whole sheet
+    from openpyxl import load_workbook
+    wb = load_workbook(file_path, read_only=True, data_only=True)
+    try:
+        rows = wb.worksheets[0].iter_rows(values_only=True)
+        header = _xlsx_header(next(rows, ()))
+        wanted = [header.index(c) for c in columns] if columns else list(range(len(header)))
+        names = [header[i] for i in wanted]
+
+        batch = []
+        for row in rows:
+            batch.append([row[i] if i < len(row) else None for i in wanted])
+            if len(batch) == chunksize:
+                yield pd.DataFrame(batch, columns=names)
+                batch = []
+        if batch:
+            yield pd.DataFrame(batch, columns=names)
+    finally:
+        wb.close()
+
+
+def iter_table_chunks(file_path, columns: Optional[List[str]] = None,
+                      dtypes: Optional[Dict[str, str]] = None,
+                      chunksize: int = CHUNK_ROWS) -> Iterator[pd.DataFrame]:
+    """
+    Yield DataFrames of at most `chunksize` rows, reading only `columns`
+    (all if None) with the given dtypes. Memory stays bounded by one chunk.
+    JSON arrays cannot be streamed by pandas and are sliced after loading;
+    use .jsonl for large exports.
+    """
+    file_path = Path(file_path)
+    ext = file_path.suffix.lower()
+
+    if ext == ".csv":
+        yield from pd.read_csv(file_path, usecols=columns, dtype=dtypes, chunksize=chunksize)
+    elif ext == ".xlsx":
+        for df in _iter_xlsx_chunks(file_path, columns, chunksize):
+            yield df.astype(dtypes) if dtypes else df
+    elif ext == ".jsonl":
+        for df in pd.read_json(file_path, lines=True, dtype=dtypes, chunksize=chunksize):
+            yield df[columns] if columns else df
+    elif ext == ".json":
+        df = pd.read_json(file_path, dtype=dtypes)
+        if columns:
+            df = df[columns]
+        for start in range(0, len(df), chunksize):
+            yield df.iloc[start:start + chunksize]
+    else:
+        raise ValueError(f"Unsupported tabular format: {ext}")
+
+
+def iter_records(file_path, columns=None, dtypes=None, chunksize=CHUNK_ROWS) -> Iterator[dict]:
+    for df in iter_table_chunks(file_path, columns, dtypes, chunksize):
+        yield from df.to_dict(orient="records")
+
+
+# ------------------------------
+# Vectorized row conversion
+# ------------------------------
+def rows_to_text(df: pd.DataFrame, separator: str = "; ") -> pd.Series:
+    """
+    "col: value; col: value" per row, built column-wise with string ops
+    instead of a Python loop over rows. Empty cells are left out.
+    """
+    result = pd.Series("", index=df.index, dtype=object)
+    for col in df.columns:
+        values = df[col]
+        present = values.notna()
+        part = f"{col}: " + values[present].astype(str)
+        joined = result[present].where(result[present] == "", result[present] + separator)
+        result.loc[present] = joined + part
+    return result
+
+
+def write_jsonl(df: pd.DataFrame, f) -> None:
+    """
+    Append a DataFrame to an open JSONL file in one call.
+    """
+    if len(df):
+        text = df.to_json(orient="records", lines=True, force_ascii=False)
+        f.write(text if text.endswith("\n") else text + "\n")
@@ -0,0 +1,175 @@
+# utils/versioned_index.py
+#
+# FAISS index + documents published as immutable version directories, with a
+# CURRENT pointer file that is swapped atomically. Readers pin the version
+# they started with; new versions are loaded in the background and swapped in
+# for later readers, and old versions are removed once nothing holds them.
+
+import os
+import pickle
+import shutil
+import threading
+import time
+import uuid
+from contextlib import contextmanager
+from pathlib import Path
+
+import faiss
+
+INDEX_FILE = "index.faiss"
+DOCS_FILE = "docs.pkl"
+POINTER_FILE = "CURRENT"
+
+KEEP_VERSIONS = int(os.getenv("INDEX_KEEP_VERSIONS", 2))         # newest versions kept on disk
+RELOAD_CHECK_SECONDS = float(os.getenv("INDEX_RELOAD_CHECK_SECONDS", 2))
+
+
+class IndexVersion:
+    def __init__(self, version, index, documents):
+        self.version = version
+        self.index = index
+        self.documents = documents
+        self.readers = 0
+
+
+class VersionedIndex:
+    """
+    <root>/versions/<version>/{index.faiss, docs.pkl}
+    <root>/CURRENT                 name of the live version
+
+    Writers call publish(); readers use `with store.acquire() as kb:` and see
+    one consistent (index, documents) pair for the whole block.
+    """
+
+    def __init__(self, root):
+        self.root = Path(root)
+        self.versions_dir = self.root / "versions"
+        self.versions_dir.mkdir(parents=True, exist_ok=True)
+        self._lock = threading.Lock()
+        self._current = None
+        self._retired = {}          # version -> IndexVersion still pinned by readers
+        self._loading = None        # version being loaded in the background
+        self._last_check = 0.0
+
+    # ------------------------------
+    # Writer side
+    # ------------------------------
+    def publish(self, index, documents) -> str:
+        """
+        Write a new version to a staging directory, rename it into place and
+        then swap the CURRENT pointer. Readers never see a partial version.
+        """
+        version = f"{time.strftime('%Y%m%d%H%M%S')}{time.time_ns() // 1_000_000 % 1000:03d}-{uuid.uuid4().hex[:8]}"
+        staging = self.versions_dir / f".{version}.tmp"
+        staging.mkdir(parents=True)
+        faiss.write_index(index, str(staging / INDEX_FILE))
+        with open(staging / DOCS_FILE, "wb") as f:
+            pickle.dump(documents, f)
+        os.rename(staging, self.versions_dir / version)
+
+        pointer_tmp = self.root / f".{POINTER_FILE}.{os.getpid()}.tmp"
+        pointer_tmp.write_text(version)
+        os.replace(pointer_tmp, self.root / POINTER_FILE)
+
+        self.collect_garbage()
+        return version
+
+    def current_version(self):
+        try:
+            return (self.root / POINTER_FILE).read_text().strip() or None
+        except FileNotFoundError:
+            return None
+
+    # ------------------------------
+    # Reader side
+    # ------------------------------
+    def _load(self, version) -> IndexVersion:
+        path = self.versions_dir / version
+        index = faiss.read_index(str(path / INDEX_FILE))
+        with open(path / DOCS_FILE, "rb") as f:
+            documents = pickle.load(f)
+        return IndexVersion(version, index, documents)
+
+    def _swap(self, loaded: IndexVersion):
+        with self._lock:
+            previous = self._current
+            self._current = loaded
+            if previous is not None and previous.readers:
+                self._retired[previous.version] = previous
+
+    def _load_in_background(self, version):
+        try:
+            self._swap(self._load(version))
+        except Exception as e:
+            print(f"[⚠️] Failed to load index version {version}: {e}")
+        finally:
+            with self._lock:
+                self._loading = None
+        self.collect_garbage()
+
+    def _maybe_reload(self):
+        now = time.monotonic()
+        if self._current is not None and now - self._last_check < RELOAD_CHECK_SECONDS:
+            return
+        self._last_check = now
+
+        version = self.current_version()
+        if version is None:
+            raise FileNotFoundError(f"No index published under {self.root}")
+        if self._current is None:
+            # Nothing to serve yet: the first load has to block
+            self._swap(self._load(version))
+            return
+        with self._lock:
+            if version == self._current.version or self._loading:
+                return
+            self._loading = version
+        # Keep answering from the pinned version while the new one loads
+        threading.Thread(target=self._load_in_background, args=(version,), daemon=True).start()
+
+    @contextmanager
+    def acquire(self):
+        self._maybe_reload()
+        with self._lock:
+            pinned = self._current
+            pinned.readers += 1
+        try:
+            yield pinned
+        finally:
+            with self._lock:
+                pinned.readers -= 1
+                if pinned.readers == 0:
+                    self._retired.pop(pinned.version, None)
+
+    def reload(self):
+        """
+        Load the version CURRENT points to now, blocking until it is live.
+        """
+        version = self.current_version()
+        if version and (self._current is None or self._current.version != version):
+            self._swap(self._load(version))
+        self._last_check = time.monotonic()
+
+    # ------------------------------
+    # Garbage collection
+    # ------------------------------
+    def collect_garbage(self):
+        """
+        Delete version directories other than the live one, the newest
+        KEEP_VERSIONS, and any still pinned by a reader in this process.
+        Loaded versions live in memory, so the files are only needed while
+        another worker may still be switching to them; that is what the
+        KEEP_VERSIONS margin covers.
+        """
+        live = self.current_version()
+        with self._lock:
+            in_use = set(self._retired)
+            if self._current is not None:
+                in_use.add(self._current.version)
+            if self._loading:
+                in_use.add(self._loading)
+
+        versions = sorted(p.name for p in self.versions_dir.iterdir() if p.is_dir() and not p.name.startswith("."))
+        for version in versions[:-KEEP_VERSIONS] if KEEP_VERSIONS > 0 else versions:
+            if version != live and version not in in_use:
+                shutil.rmtree(self.versions_dir / version, ignore_errors=True)